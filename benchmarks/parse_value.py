@@ -0,0 +1,68 @@
+##
+#     Project: gLiveSNMP
+# Description: Detect information on various devices via SNMP
+#      Author: Fabio Castelli (Muflone) <muflone@vbsimple.net>
+#   Copyright: 2016 Fabio Castelli
+#     License: GPL-2+
+#  This program is free software; you can redistribute it and/or modify it
+#  under the terms of the GNU General Public License as published by the Free
+#  Software Foundation; either version 2 of the License, or (at your option)
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful, but WITHOUT
+#  ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+#  FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+#  more details.
+#  You should have received a copy of the GNU General Public License along
+#  with this program; if not, write to the Free Software Foundation, Inc.,
+#  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+##
+
+import os.path
+import sys
+import timeit
+
+# Use the package from the source directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from glivesnmp.snmp_types import iter_varbinds, parse_value   # noqa: E402
+
+# Values printed by snmpget for every data type
+SAMPLES = (
+    'STRING: "Linux router 4.4.0 #1 SMP x86_64"',
+    'INTEGER: up(1)',
+    'INTEGER: 1500',
+    'Counter32: 4294967295',
+    'Counter64: 18446744073709551615',
+    'Gauge32: 1000000000',
+    'Timeticks: (123456789) 14 days, 6:56:07.89',
+    'IpAddress: 192.168.1.1',
+    'OID: .1.3.6.1.4.1.8072.3.2.10',
+    'Hex-STRING: 00 1A 2B 3C 4D 5E ',
+    'No Such Instance currently exists at this OID',
+    )
+# Output of a snmpget request for 1000 OIDs with multi-line values
+OUTPUT = '\n'.join(
+    '.1.3.6.1.2.1.2.2.1.%d.%d = %s' % (
+        index % 22 + 1, index,
+        'Hex-STRING: 00 01 02 03 04 05 06 07 08 09 0A 0B 0C 0D 0E 0F\n'
+        '10 11 12 13 ' if index % 10 == 0 else SAMPLES[index % 9])
+    for index in xrange(1000))
+REPEAT = 5
+NUMBER = 100000
+
+
+def best(statement, number):
+    """Return the best time in nanoseconds for a single execution"""
+    times = timeit.repeat(statement, repeat=REPEAT, number=number)
+    return min(times) / number * 1e9
+
+
+if __name__ == '__main__':
+    for sample in SAMPLES:
+        elapsed = best(lambda: parse_value(sample), NUMBER)
+        print '%-50s %8.0f ns' % (sample[:50], elapsed)
+    elapsed = best(lambda: [parse_value(value) for oid, value
+                            in iter_varbinds(OUTPUT.split('\n'))], 100)
+    print '%-50s %8.0f us' % ('1000 varbinds output', elapsed / 1000)
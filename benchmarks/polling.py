@@ -0,0 +1,257 @@
+##
+#     Project: gLiveSNMP
+# Description: Detect information on various devices via SNMP
+#      Author: Fabio Castelli (Muflone) <muflone@vbsimple.net>
+#   Copyright: 2016 Fabio Castelli
+#     License: GPL-2+
+#  This program is free software; you can redistribute it and/or modify it
+#  under the terms of the GNU General Public License as published by the Free
+#  Software Foundation; either version 2 of the License, or (at your option)
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful, but WITHOUT
+#  ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+#  FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+#  more details.
+#  You should have received a copy of the GNU General Public License along
+#  with this program; if not, write to the Free Software Foundation, Inc.,
+#  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+##
+
+import collections
+import json
+import optparse
+import os
+import os.path
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+# Use the package from the source directory
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from glivesnmp.clock import monotonic                           # noqa: E402
+from glivesnmp.constants import APP_VERSION                     # noqa: E402
+import glivesnmp.snmp as snmp                                   # noqa: E402
+from glivesnmp.snmp_types import parse_value                    # noqa: E402
+
+DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       'data', 'router.snmprec')
+# OIDs requested to every simulated agent
+OIDS = ('.1.3.6.1.2.1.1.3.0',
+        '.1.3.6.1.2.1.1.5.0',
+        '.1.3.6.1.2.1.2.2.1.10.2',
+        '.1.3.6.1.2.1.2.2.1.16.2',
+        '.1.3.6.1.2.1.31.1.1.1.6.2')
+# Literal OIDs for the translations
+LITERAL_OIDS = ('SNMPv2-MIB::sysDescr.0',
+                'SNMPv2-MIB::sysUpTime.0',
+                'IF-MIB::ifInOctets.2',
+                'IF-MIB::ifHCInOctets.2')
+PARSE_SAMPLES = ('STRING: "Linux router 4.4.0 #1 SMP x86_64"',
+                 'Counter32: 4294967295',
+                 'Counter64: 18446744073709551615',
+                 'Timeticks: (123456789) 14 days, 6:56:07.89')
+SweepHost = collections.namedtuple(
+    'SweepHost', 'name protocol address port_number version community')
+
+
+def get_cpu_time():
+    """Return the user and system CPU seconds used by the process"""
+    times = os.times()
+    return times[0] + times[1]
+
+
+def get_max_rss():
+    """Return the peak resident memory in kilobytes"""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return usage // 1024 if sys.platform == 'darwin' else usage
+
+
+def get_percentile(latencies, percentile):
+    """Return a percentile from a sorted list of latencies"""
+    if not latencies:
+        return None
+    index = int(round(percentile / 100.0 * (len(latencies) - 1)))
+    return latencies[index]
+
+
+def get_results(operations, elapsed, cpu, latencies, errors=0):
+    """Return the measured results as a dictionary"""
+    latencies = sorted(latencies)
+    return collections.OrderedDict((
+        ('operations', operations),
+        ('errors', errors),
+        ('seconds', round(elapsed, 6)),
+        ('per second', round(operations / elapsed, 2) if elapsed else None),
+        ('p50 us', round(get_percentile(latencies, 50) * 1e6, 2)
+         if latencies else None),
+        ('p99 us', round(get_percentile(latencies, 99) * 1e6, 2)
+         if latencies else None),
+        ('cpu us per operation', round(cpu / operations * 1e6, 2)
+         if operations else None),
+        ('max rss kb', get_max_rss())))
+
+
+def measure(function, count):
+    """Call a function count times measuring every call"""
+    latencies = []
+    errors = 0
+    cpu = get_cpu_time()
+    started = monotonic()
+    for index in xrange(count):
+        call_started = monotonic()
+        try:
+            function(index)
+        except Exception:
+            errors += 1
+        latencies.append(monotonic() - call_started)
+    return get_results(count, monotonic() - started,
+                       get_cpu_time() - cpu, latencies, errors)
+
+
+def bench_parse_value(count):
+    """Parse the snmpget output for the most common types"""
+    return measure(
+        lambda index: parse_value(PARSE_SAMPLES[index % len(PARSE_SAMPLES)]),
+        count)
+
+
+def bench_translate(count, force_lookup):
+    """Translate literal OIDs from the cache or from the MIB index"""
+    client = snmp.SNMP()
+    results = measure(
+        lambda index: client.translate(
+            LITERAL_OIDS[index % len(LITERAL_OIDS)],
+            force_lookup=force_lookup,
+            use_tools=False),
+        count)
+    results['mibs'] = client.mibs.count()
+    return results
+
+
+def bench_get(count, port_number):
+    """Get the values from a single simulated agent"""
+    client = snmp.SNMP()
+    host = SweepHost('bench', 'udp', '127.0.0.1', port_number, 2, 'public')
+    return measure(lambda index: client.get_from_host(host, OIDS), count)
+
+
+def bench_sweep(hosts, port_number, timeout):
+    """Poll every simulated agent at the same time"""
+    client = snmp.SNMP()
+    condition = threading.Condition()
+    latencies = []
+    errors = []
+
+    def completed(started, results, error):
+        """Record the latency of a single host"""
+        with condition:
+            latencies.append(monotonic() - started)
+            if error:
+                errors.append(error)
+            if len(latencies) == hosts:
+                condition.notify()
+
+    cpu = get_cpu_time()
+    started = monotonic()
+    for index in xrange(hosts):
+        host = SweepHost('bench%d' % index, 'udp', '127.0.0.1',
+                         port_number + index, 2, 'public')
+        client.get_from_host_async(
+            host, OIDS,
+            lambda results, error, started=monotonic(): completed(
+                started, results, error))
+    with condition:
+        deadline = started + timeout
+        while len(latencies) < hosts and monotonic() < deadline:
+            condition.wait(deadline - monotonic())
+        completed_hosts = len(latencies)
+        results = get_results(completed_hosts, monotonic() - started,
+                              get_cpu_time() - cpu, list(latencies),
+                              len(errors) + hosts - completed_hosts)
+    client.stop()
+    results['hosts'] = hosts
+    return results
+
+
+def start_simulator(port_number, count, latency):
+    """Start the simulated agents in their own process"""
+    process = subprocess.Popen(
+        args=[sys.executable, '-u', '-m', 'glivesnmp.snmp_simulator',
+              '--dataset', DATASET,
+              '--port', str(port_number),
+              '--count', str(count),
+              '--latency', str(latency)],
+        cwd=ROOT_DIR,
+        stdout=subprocess.PIPE)
+    # Wait until every agent port is bound
+    if not process.stdout.readline():
+        raise RuntimeError('Unable to start the simulated agents')
+    return process
+
+
+def main():
+    """Run the benchmarks and write the results to a JSON file"""
+    parser = optparse.OptionParser(usage='usage: %prog [options]')
+    parser.add_option('-o', '--output', type='string',
+                      default='benchmark-%s.json' % APP_VERSION,
+                      help='results file [default: %default]')
+    parser.add_option('-s', '--sweeps', type='string',
+                      default='10,1000,10000',
+                      help='hosts for every group sweep [default: %default]')
+    parser.add_option('-n', '--number', type='int', default=2000,
+                      help='operations for the single request benchmarks '
+                           '[default: %default]')
+    parser.add_option('-p', '--port', type='int', default=20000,
+                      help='port of the first simulated agent '
+                           '[default: %default]')
+    parser.add_option('-l', '--latency', type='float', default=0.0,
+                      help='seconds of latency for the simulated agents '
+                           '[default: %default]')
+    parser.add_option('-t', '--timeout', type='float', default=120.0,
+                      help='seconds to wait for a group sweep '
+                           '[default: %default]')
+    (options, args) = parser.parse_args()
+    sweeps = [int(hosts) for hosts in options.sweeps.split(',') if hosts]
+    benchmarks = collections.OrderedDict()
+    benchmarks['parse_value'] = bench_parse_value(options.number * 50)
+    benchmarks['translate cached'] = bench_translate(options.number * 50,
+                                                     False)
+    benchmarks['translate index'] = bench_translate(options.number, True)
+    simulator = start_simulator(options.port, max(sweeps + [1]),
+                                options.latency)
+    try:
+        benchmarks['SNMP.get'] = bench_get(options.number, options.port)
+        for hosts in sweeps:
+            benchmarks['sweep %d hosts' % hosts] = bench_sweep(
+                hosts, options.port, options.timeout)
+    finally:
+        simulator.terminate()
+        simulator.wait()
+    for name, results in benchmarks.iteritems():
+        print '%-20s %12s/s  p50 %10s us  p99 %10s us  cpu %8s us' % (
+            name, results['per second'], results['p50 us'],
+            results['p99 us'], results['cpu us per operation'])
+    report = collections.OrderedDict((
+        ('version', APP_VERSION),
+        ('python', platform.python_version()),
+        ('platform', platform.platform()),
+        ('timestamp', round(time.time(), 3)),
+        ('oids per request', len(OIDS)),
+        ('simulator latency', options.latency),
+        ('benchmarks', benchmarks)))
+    with open(options.output, 'w') as output:
+        json.dump(report, output, indent=2)
+        output.write('\n')
+    print 'Results written to %s' % options.output
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -20,9 +20,18 @@
 #  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
 ##
 
-from glivesnmp.app import Application
+import sys
+
+from glivesnmp.settings import parse_options
 
 if __name__ == '__main__':
-    # Start the application
-    app = Application()
-    app.run(None)
+    (options, arguments) = parse_options()
+    if options.poll:
+        # Poll the hosts without importing the user interface
+        from glivesnmp.headless import HeadlessPoller
+        sys.exit(HeadlessPoller(options).run())
+    else:
+        # Start the application
+        from glivesnmp.app import Application
+        app = Application()
+        app.run(None)
@@ -18,6 +18,8 @@
 #  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
 ##
 
+import glivesnmp.requires
+
 from gi.repository import Gtk
 from gi.repository import Gdk
 from gi.repository import Gio
@@ -43,6 +45,10 @@ class Application(Gtk.Application):
         action = Gio.SimpleAction(name="settings_folder")
         action.connect("activate", self.on_app_settings_folder_activate)
         self.add_action(action)
+        # Add the poller statistics action to the app menu
+        action = Gio.SimpleAction(name="poller_stats")
+        action.connect("activate", self.on_app_poller_stats_activate)
+        self.add_action(action)
         # Add the about action to the app menu
         action = Gio.SimpleAction(name="about")
         action.connect("activate", self.on_app_about_activate)
@@ -63,6 +69,10 @@ class Application(Gtk.Application):
         """Open the settings folder from the app menu"""
         Gtk.show_uri(None, 'file://%s' % DIR_SETTINGS, Gdk.CURRENT_TIME)
 
+    def on_app_poller_stats_activate(self, action, data):
+        """Show the poller statistics from the app menu"""
+        self.ui.on_action_poller_stats_activate(action)
+
     def on_app_about_activate(self, action, data):
         """Show the about dialog from the app menu"""
         self.ui.on_action_about_activate(action)
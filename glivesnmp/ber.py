@@ -0,0 +1,277 @@
+##
+#     Project: gLiveSNMP
+# Description: Detect information on various devices via SNMP
+#      Author: Fabio Castelli (Muflone) <muflone@vbsimple.net>
+#   Copyright: 2016 Fabio Castelli
+#     License: GPL-2+
+#  This program is free software; you can redistribute it and/or modify it
+#  under the terms of the GNU General Public License as published by the Free
+#  Software Foundation; either version 2 of the License, or (at your option)
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful, but WITHOUT
+#  ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+#  FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+#  more details.
+#  You should have received a copy of the GNU General Public License along
+#  with this program; if not, write to the Free Software Foundation, Inc.,
+#  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+##
+
+from glivesnmp.snmp_exception import SNMPException
+
+# Universal types
+TAG_INTEGER = 0x02
+TAG_OCTET_STRING = 0x04
+TAG_NULL = 0x05
+TAG_OID = 0x06
+TAG_SEQUENCE = 0x30
+# Application types
+TAG_IPADDRESS = 0x40
+TAG_COUNTER32 = 0x41
+TAG_GAUGE32 = 0x42
+TAG_TIMETICKS = 0x43
+TAG_OPAQUE = 0x44
+TAG_COUNTER64 = 0x46
+# SNMPv2 exceptions in place of a value
+TAG_NO_SUCH_OBJECT = 0x80
+TAG_NO_SUCH_INSTANCE = 0x81
+TAG_END_OF_MIB_VIEW = 0x82
+# PDU types
+PDU_GET = 0xA0
+PDU_GET_NEXT = 0xA1
+PDU_RESPONSE = 0xA2
+PDU_SET = 0xA3
+PDU_GET_BULK = 0xA5
+
+# Error status names as reported in the responses
+ERROR_STATUS_NAMES = (
+    'noError', 'tooBig', 'noSuchName', 'badValue', 'readOnly', 'genErr',
+    'noAccess', 'wrongType', 'wrongLength', 'wrongEncoding', 'wrongValue',
+    'noCreation', 'inconsistentValue', 'resourceUnavailable', 'commitFailed',
+    'undoFailed', 'authorizationError', 'notWritable', 'inconsistentName')
+ERROR_TOO_BIG = 1
+ERROR_NO_SUCH_NAME = 2
+
+# Types whose value is an unsigned integer
+UNSIGNED_TAGS = (TAG_COUNTER32, TAG_GAUGE32, TAG_TIMETICKS, TAG_COUNTER64)
+
+
+class BERException(SNMPException):
+    """An exception raised for malformed BER data"""
+    pass
+
+
+def encode_length(length):
+    """Encode the length of a TLV in short or long form"""
+    if length < 0x80:
+        return bytearray((length, ))
+    result = bytearray()
+    while length:
+        result.insert(0, length & 0xFF)
+        length >>= 8
+    result.insert(0, 0x80 | len(result))
+    return result
+
+
+def encode(tag, payload):
+    """Encode a TLV with the tag and the already encoded payload"""
+    result = bytearray((tag, ))
+    result.extend(encode_length(len(payload)))
+    result.extend(payload)
+    return result
+
+
+def encode_integer(value, tag=TAG_INTEGER):
+    """Encode a signed or unsigned integer using two's complement"""
+    payload = bytearray()
+    while True:
+        payload.insert(0, value & 0xFF)
+        value >>= 8
+        # Stop when the sign bit of the last byte matches the residual value
+        if value in (0, -1) and (payload[0] & 0x80) == (value & 0x80):
+            break
+    return encode(tag, payload)
+
+
+def encode_octet_string(value, tag=TAG_OCTET_STRING):
+    """Encode an octet string"""
+    return encode(tag, bytearray(value))
+
+
+def encode_null(tag=TAG_NULL):
+    """Encode a NULL value"""
+    return bytearray((tag, 0))
+
+
+def encode_oid(oid):
+    """Encode a dotted numeric OID (with or without the leading dot)"""
+    try:
+        arcs = [int(arc) for arc in oid.strip('.').split('.')]
+    except ValueError:
+        raise BERException('Invalid numeric OID %s' % oid)
+    if len(arcs) < 2:
+        arcs.append(0)
+    payload = bytearray()
+    for arc in [arcs[0] * 40 + arcs[1]] + arcs[2:]:
+        chunk = bytearray((arc & 0x7F, ))
+        arc >>= 7
+        while arc:
+            chunk.insert(0, 0x80 | (arc & 0x7F))
+            arc >>= 7
+        payload.extend(chunk)
+    return encode(TAG_OID, payload)
+
+
+def encode_ipaddress(value):
+    """Encode a dotted IPv4 address"""
+    return encode(TAG_IPADDRESS,
+                  bytearray(int(part) for part in value.split('.')))
+
+
+def encode_value(tag, value):
+    """Encode a value of the requested type"""
+    if tag in (TAG_INTEGER, ) + UNSIGNED_TAGS:
+        return encode_integer(int(value), tag)
+    elif tag in (TAG_OCTET_STRING, TAG_OPAQUE):
+        return encode_octet_string(value, tag)
+    elif tag == TAG_OID:
+        return encode_oid(value)
+    elif tag == TAG_IPADDRESS:
+        return encode_ipaddress(value)
+    elif tag is None or tag in (TAG_NULL, TAG_NO_SUCH_OBJECT,
+                                TAG_NO_SUCH_INSTANCE, TAG_END_OF_MIB_VIEW):
+        return encode_null(tag or TAG_NULL)
+    else:
+        raise BERException('Unsupported data type 0x%02X' % tag)
+
+
+def encode_message(version, community, pdu_type, request_id, varbinds,
+                   error_status=0, error_index=0):
+    """Encode a whole SNMP v1/v2c message.
+    The varbinds are a list of (oid, tag, value) tuples, for the requests
+    the tag and the value are None to encode a NULL value.
+    For GETBULK requests error_status is the non-repeaters count and
+    error_index is the max-repetitions count."""
+    encoded_varbinds = bytearray()
+    for oid, tag, value in varbinds:
+        encoded_varbinds.extend(encode(TAG_SEQUENCE,
+                                       encode_oid(oid) +
+                                       encode_value(tag, value)))
+    pdu = encode(pdu_type,
+                 encode_integer(request_id) +
+                 encode_integer(error_status) +
+                 encode_integer(error_index) +
+                 encode(TAG_SEQUENCE, encoded_varbinds))
+    return bytes(encode(TAG_SEQUENCE,
+                        encode_integer(version) +
+                        encode_octet_string(community) +
+                        pdu))
+
+
+def encode_request(version, community, pdu_type, request_id, oids,
+                   non_repeaters=0, max_repetitions=0):
+    """Encode a request message for a list of numeric OIDs"""
+    return encode_message(version=version,
+                          community=community,
+                          pdu_type=pdu_type,
+                          request_id=request_id,
+                          varbinds=[(oid, None, None) for oid in oids],
+                          error_status=non_repeaters,
+                          error_index=max_repetitions)
+
+
+def decode_tlv(data, offset):
+    """Decode a TLV header returning the tag and the value boundaries"""
+    try:
+        tag = data[offset]
+        length = data[offset + 1]
+        offset += 2
+        if length & 0x80:
+            count = length & 0x7F
+            length = 0
+            for byte in data[offset:offset + count]:
+                length = (length << 8) | byte
+            offset += count
+    except IndexError:
+        raise BERException('Truncated BER data')
+    if offset + length > len(data):
+        raise BERException('Truncated BER data')
+    return tag, offset, offset + length
+
+
+def decode_integer(data, start, end, signed=True):
+    """Decode an integer value"""
+    value = 0
+    for byte in data[start:end]:
+        value = (value << 8) | byte
+    if signed and end > start and data[start] & 0x80:
+        value -= 1 << (8 * (end - start))
+    return value
+
+
+def decode_oid(data, start, end):
+    """Decode an OID value to its dotted numeric form with the leading dot"""
+    arcs = []
+    value = 0
+    for byte in data[start:end]:
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            arcs.append(value)
+            value = 0
+    if not arcs:
+        return '.'
+    first = arcs.pop(0)
+    if first < 80:
+        arcs[0:0] = (first // 40, first % 40)
+    else:
+        arcs[0:0] = (2, first - 80)
+    return '.' + '.'.join(str(arc) for arc in arcs)
+
+
+def decode_value(tag, data, start, end):
+    """Decode a value to the nearest Python type"""
+    if tag == TAG_INTEGER:
+        return decode_integer(data, start, end)
+    elif tag in UNSIGNED_TAGS:
+        return decode_integer(data, start, end, signed=False)
+    elif tag in (TAG_OCTET_STRING, TAG_OPAQUE):
+        return bytes(data[start:end])
+    elif tag == TAG_OID:
+        return decode_oid(data, start, end)
+    elif tag == TAG_IPADDRESS:
+        return '.'.join(str(byte) for byte in data[start:end])
+    else:
+        # NULL and exceptions have no value
+        return None
+
+
+def decode_message(data):
+    """Decode a whole SNMP v1/v2c message.
+    Returns a tuple with version, community, pdu type, request id,
+    error status, error index and the list of (oid, tag, value) varbinds"""
+    data = bytearray(data)
+    tag, start, end = decode_tlv(data, 0)
+    if tag != TAG_SEQUENCE:
+        raise BERException('Invalid SNMP message')
+    tag, start, offset = decode_tlv(data, start)
+    version = decode_integer(data, start, offset)
+    tag, start, offset = decode_tlv(data, offset)
+    community = bytes(data[start:offset])
+    pdu_type, offset, end = decode_tlv(data, offset)
+    fields = []
+    for index in range(3):
+        tag, start, offset = decode_tlv(data, offset)
+        fields.append(decode_integer(data, start, offset))
+    request_id, error_status, error_index = fields
+    tag, offset, end = decode_tlv(data, offset)
+    varbinds = []
+    while offset < end:
+        tag, start, offset = decode_tlv(data, offset)
+        tag, oid_start, value_offset = decode_tlv(data, start)
+        oid = decode_oid(data, oid_start, value_offset)
+        tag, value_start, value_end = decode_tlv(data, value_offset)
+        varbinds.append((oid, tag, decode_value(tag, data,
+                                                value_start, value_end)))
+    return (version, community, pdu_type, request_id,
+            error_status, error_index, varbinds)
@@ -0,0 +1,56 @@
+##
+#     Project: gLiveSNMP
+# Description: Detect information on various devices via SNMP
+#      Author: Fabio Castelli (Muflone) <muflone@vbsimple.net>
+#   Copyright: 2016 Fabio Castelli
+#     License: GPL-2+
+#  This program is free software; you can redistribute it and/or modify it
+#  under the terms of the GNU General Public License as published by the Free
+#  Software Foundation; either version 2 of the License, or (at your option)
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful, but WITHOUT
+#  ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+#  FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+#  more details.
+#  You should have received a copy of the GNU General Public License along
+#  with this program; if not, write to the Free Software Foundation, Inc.,
+#  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+##
+
+import ctypes
+import ctypes.util
+import time
+
+CLOCK_MONOTONIC = 1
+
+
+class timespec(ctypes.Structure):
+    _fields_ = [('tv_sec', ctypes.c_long),
+                ('tv_nsec', ctypes.c_long)]
+
+
+def get_monotonic():
+    """Return a monotonic clock function, falling back to the wall clock"""
+    try:
+        library = ctypes.CDLL(ctypes.util.find_library('rt') or
+                              ctypes.util.find_library('c'), use_errno=True)
+        clock_gettime = library.clock_gettime
+    except (OSError, AttributeError):
+        return time.time
+    clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+
+    def monotonic():
+        """Return the seconds from the monotonic clock"""
+        # The GIL is released during the call, every caller needs its own
+        # structure to avoid reading the values written by other threads
+        value = timespec()
+        if clock_gettime(CLOCK_MONOTONIC, ctypes.byref(value)) != 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, 'clock_gettime failed')
+        return value.tv_sec + value.tv_nsec * 1e-9
+    return monotonic
+
+
+# Seconds elapsed from an arbitrary point, never going backwards
+monotonic = get_monotonic()
@@ -59,11 +59,13 @@ try:
     DIR_SETTINGS = BaseDirectory.save_config_path(DOMAIN_NAME)
     DIR_HOSTS = BaseDirectory.save_config_path(
         os.path.join(DOMAIN_NAME, 'hosts'))
+    DIR_CACHE = BaseDirectory.save_cache_path(DOMAIN_NAME)
 except Exception:
     # Get the settings path without actually creating it
     DIR_SETTINGS = os.path.join(BaseDirectory.xdg_config_home, DOMAIN_NAME)
     DIR_HOSTS = os.path.join(BaseDirectory.xdg_config_home, DOMAIN_NAME,
                              'hosts')
+    DIR_CACHE = os.path.join(BaseDirectory.xdg_cache_home, DOMAIN_NAME)
 # Set the paths for the data files
 FILE_ICON = os.path.join(DIR_DATA, 'glivesnmp.png')
 FILE_CONTRIBUTORS = os.path.join(DIR_DOCS, 'contributors')
@@ -75,3 +77,10 @@ FILE_SETTINGS = os.path.join(DIR_SETTINGS, 'settings.conf')
 FILE_WINDOWS_POSITION = os.path.join(DIR_SETTINGS, 'windows.conf')
 FILE_SERVICES = os.path.join(DIR_SETTINGS, 'services.conf')
 FILE_DEVICES = os.path.join(DIR_SETTINGS, 'devices.conf')
+# Set the paths for cache files
+FILE_OIDS_CACHE = os.path.join(DIR_CACHE, 'oids.json')
+FILE_MIBS_INDEX = os.path.join(DIR_CACHE, 'mibs.index')
+FILE_RTT_STATS = os.path.join(DIR_CACHE, 'rtt.json')
+FILE_HOSTS_INDEX = os.path.join(DIR_CACHE, 'hosts.json')
+# Set the path for the time series store
+DIR_RRD = os.path.join(DIR_SETTINGS, 'rrd')
@@ -0,0 +1,264 @@
+##
+#     Project: gLiveSNMP
+# Description: Detect information on various devices via SNMP
+#      Author: Fabio Castelli (Muflone) <muflone@vbsimple.net>
+#   Copyright: 2016 Fabio Castelli
+#     License: GPL-2+
+#  This program is free software; you can redistribute it and/or modify it
+#  under the terms of the GNU General Public License as published by the Free
+#  Software Foundation; either version 2 of the License, or (at your option)
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful, but WITHOUT
+#  ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+#  FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+#  more details.
+#  You should have received a copy of the GNU General Public License along
+#  with this program; if not, write to the Free Software Foundation, Inc.,
+#  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+##
+
+import BaseHTTPServer
+import socket
+import sys
+import threading
+import time
+
+import glivesnmp.snmp as snmp
+from glivesnmp.snmp_stats import (
+    BUCKETS, BUCKETS_PER_OCTAVE, MIN_LATENCY, PHASES)
+from glivesnmp.snmp_types import export_value, RE_CONTROL
+import glivesnmp.worker_pool as worker_pool
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+METRICS_PATH = '/metrics'
+PREFIX = 'glivesnmp'
+
+exporter = None
+
+
+def start(port_number):
+    """Start the exporter on the local port, if any"""
+    global exporter
+    if not port_number:
+        return
+    try:
+        exporter = Exporter(port_number)
+        exporter.start()
+    except socket.error as error:
+        sys.stderr.write('Unable to start the exporter on port %d: %s\n' % (
+            port_number, error))
+
+
+def stop():
+    """Stop the exporter if it's running"""
+    global exporter
+    if exporter:
+        exporter.stop()
+        exporter = None
+
+
+def update(host, service, oid, value, rate=None, timestamp=None):
+    """Save the last value for a host service if the exporter is running"""
+    if exporter:
+        exporter.update(host, service, oid, value, rate, timestamp)
+
+
+def remove_host(host_name):
+    """Forget the values for a host if the exporter is running"""
+    if exporter:
+        exporter.remove_host(host_name)
+
+
+def rename_host(host_name, new_host_name):
+    """Move the values of a host to its new name if the exporter is
+    running"""
+    if exporter:
+        exporter.rename_host(host_name, new_host_name)
+
+
+def escape(value):
+    """Escape a label value, the binary values and the values with control
+    characters are written in hexadecimal format"""
+    try:
+        text = value.decode('utf-8')
+    except UnicodeDecodeError:
+        text = None
+    if text is None or RE_CONTROL.search(text):
+        value = ' '.join('%02X' % ord(byte) for byte in value)
+    return (value.replace('\\', '\\\\')
+                 .replace('"', '\\"')
+                 .replace('\n', '\\n'))
+
+
+def format_labels(labels):
+    """Format the labels for a sample"""
+    return '{%s}' % ','.join('%s="%s"' % (name, escape(str(value)))
+                             for name, value in labels)
+
+
+def format_number(value):
+    """Format a sample value"""
+    if isinstance(value, float):
+        return repr(value)
+    return long.__str__(long(value))
+
+
+class MetricsHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    def do_GET(self):
+        """Serve the metrics from the cached values"""
+        if self.path.split('?', 1)[0] != METRICS_PATH:
+            self.send_error(404)
+            return
+        body = self.server.exporter.render()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Don't log every scrape"""
+        pass
+
+
+class Exporter(object):
+    def __init__(self, port_number, address='127.0.0.1'):
+        """HTTP endpoint serving the last polled values and the poller
+        metrics in the OpenMetrics text format"""
+        self.lock = threading.Lock()
+        # Last (oid, value, rate, timestamp) for every (host, service)
+        self.values = {}
+        self.server = BaseHTTPServer.HTTPServer((address, port_number),
+                                                MetricsHandler)
+        self.server.exporter = self
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       name='exporter')
+        self.thread.daemon = True
+
+    def start(self):
+        """Start serving the requests"""
+        self.thread.start()
+
+    def stop(self):
+        """Stop serving the requests"""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def update(self, host, service, oid, value, rate=None, timestamp=None):
+        """Save the last value for a host service"""
+        with self.lock:
+            self.values[(host.name, service)] = (
+                host, oid, value, rate, timestamp or time.time())
+
+    def remove_host(self, host_name):
+        """Forget the values for a host"""
+        with self.lock:
+            for key in self.values.keys():
+                if key[0] == host_name:
+                    del self.values[key]
+
+    def rename_host(self, host_name, new_host_name):
+        """Move the values of a host to its new name"""
+        with self.lock:
+            for key in self.values.keys():
+                if key[0] == host_name:
+                    self.values[(new_host_name, key[1])] = self.values.pop(
+                        key)
+
+    def render(self):
+        """Return the OpenMetrics text for the values and the poller"""
+        lines = []
+        with self.lock:
+            values = sorted(self.values.iteritems())
+        numeric = []
+        texts = []
+        rates = []
+        updates = []
+        for (host_name, service), (host, oid, value, rate,
+                                   timestamp) in values:
+            labels = [('host', host_name),
+                      ('address', '%s:%d' % (host.address,
+                                             host.port_number)),
+                      ('service', service)]
+            updates.append((labels, timestamp))
+            labels = labels + [('oid', oid),
+                               ('type', getattr(value, 'syntax', ''))]
+            if isinstance(value, (int, long)):
+                numeric.append((labels, value))
+                if rate is not None:
+                    rates.append((labels, rate))
+            else:
+                # Binary strings are exported in hexadecimal format
+                texts.append((labels + [('value', export_value(
+                    value).encode('utf-8'))], 1))
+        self.render_family(lines, 'value', 'gauge',
+                           'Last polled numeric value', numeric)
+        self.render_family(lines, 'rate', 'gauge',
+                           'Per second rate of the counters', rates)
+        self.render_family(lines, 'text', 'info',
+                           'Last polled text value', texts, '_info')
+        self.render_family(lines, 'last_update_timestamp_seconds', 'gauge',
+                           'Time of the last polled value', updates)
+        self.render_poller(lines)
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def render_family(self, lines, name, metric_type, help_text, samples,
+                      suffix=''):
+        """Add a metric family with its samples"""
+        name = '%s_%s' % (PREFIX, name)
+        lines.append('# TYPE %s %s' % (name, metric_type))
+        lines.append('# HELP %s %s' % (name, help_text))
+        for labels, value in samples:
+            lines.append('%s%s%s %s' % (name, suffix,
+                                        format_labels(labels) if labels
+                                        else '',
+                                        format_number(value)))
+
+    def render_poller(self, lines):
+        """Add the poller metrics"""
+        summary = snmp.snmp.stats.get_summary()
+        hosts = [(key, snmp.snmp.stats.get_summary(key))
+                 for key in snmp.snmp.stats.get_hosts()]
+        for field in ('requests', 'timeouts', 'errors'):
+            samples = [((('address', '%s:%d' % key), ), host[field])
+                       for key, host in hosts if host]
+            samples.append(((), summary[field]))
+            self.render_family(lines, 'poller_%s' % field, 'counter',
+                               'SNMP %s' % field,
+                               samples, '_total')
+        self.render_family(lines, 'poller_in_flight', 'gauge',
+                           'SNMP requests waiting for a response',
+                           [((), summary['in flight'])])
+        # Latency histograms with a bucket for every octave
+        histograms = snmp.snmp.stats.get_histograms()
+        name = '%s_poller_phase_seconds' % PREFIX
+        lines.append('# TYPE %s histogram' % name)
+        lines.append('# HELP %s Duration of the SNMP requests phases' % name)
+        for phase in PHASES:
+            counts, count, total = histograms[phase]
+            cumulative = 0
+            # The last bucket has no upper bound and it's left to +Inf
+            for bucket in xrange(0, BUCKETS - BUCKETS_PER_OCTAVE,
+                                 BUCKETS_PER_OCTAVE):
+                cumulative += sum(counts[bucket:bucket + BUCKETS_PER_OCTAVE])
+                bound = MIN_LATENCY * 2 ** (
+                    bucket / BUCKETS_PER_OCTAVE + 1)
+                lines.append('%s_bucket%s %d' % (
+                    name, format_labels((('phase', phase),
+                                         ('le', repr(bound)))), cumulative))
+            lines.append('%s_bucket%s %d' % (
+                name, format_labels((('phase', phase), ('le', '+Inf'))),
+                count))
+            lines.append('%s_count%s %d' % (
+                name, format_labels((('phase', phase), )), count))
+            lines.append('%s_sum%s %r' % (
+                name, format_labels((('phase', phase), )), total))
+        if worker_pool.pool:
+            metrics = worker_pool.pool.get_metrics()
+            for field in ('busy', 'queue depth'):
+                self.render_family(lines,
+                                   'workers_%s' % field.replace(' ', '_'),
+                                   'gauge', 'Worker pool %s' % field,
+                                   [((), metrics[field])])
@@ -0,0 +1,206 @@
+##
+#     Project: gLiveSNMP
+# Description: Detect information on various devices via SNMP
+#      Author: Fabio Castelli (Muflone) <muflone@vbsimple.net>
+#   Copyright: 2016 Fabio Castelli
+#     License: GPL-2+
+#  This program is free software; you can redistribute it and/or modify it
+#  under the terms of the GNU General Public License as published by the Free
+#  Software Foundation; either version 2 of the License, or (at your option)
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful, but WITHOUT
+#  ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+#  FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+#  more details.
+#  You should have received a copy of the GNU General Public License along
+#  with this program; if not, write to the Free Software Foundation, Inc.,
+#  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+##
+
+import collections
+import csv
+import errno
+import functools
+import json
+import Queue
+import sys
+import time
+
+from glivesnmp.clock import monotonic
+from glivesnmp.constants import (
+    FILE_SETTINGS, FILE_SERVICES, FILE_DEVICES,
+    FILE_OIDS_CACHE, FILE_RTT_STATS, FILE_HOSTS_INDEX, DIR_RRD)
+import glivesnmp.exporter as exporter
+import glivesnmp.inventory as inventory
+import glivesnmp.preferences as preferences
+from glivesnmp.scheduler import get_phase
+import glivesnmp.settings as settings
+import glivesnmp.snmp as snmp
+from glivesnmp.snmp_rates import OID_SYSUPTIME
+from glivesnmp.snmp_types import export_value
+import glivesnmp.tsdb as tsdb
+
+FORMAT_JSON = 'json'
+FORMAT_CSV = 'csv'
+# Fields for every written record
+FIELDS = ('timestamp', 'group', 'host', 'service', 'oid', 'type', 'value',
+          'rate', 'error')
+
+
+class HeadlessPoller(object):
+    def __init__(self, options, output=sys.stdout):
+        """Poll the hosts without the user interface writing the values
+        to the output"""
+        self.options = options
+        self.output = output
+        # Load settings
+        settings.settings = settings.Settings(FILE_SETTINGS, False)
+        settings.services = settings.Settings(FILE_SERVICES, False)
+        settings.devices = settings.Settings(FILE_DEVICES, False)
+        preferences.preferences = preferences.Preferences()
+        snmp.snmp = snmp.SNMP()
+        snmp.snmp.rtt.load(FILE_RTT_STATS)
+        snmp.snmp.load_cache(FILE_OIDS_CACHE)
+        # Load the index of the hosts files
+        inventory.index = inventory.HostsIndex(FILE_HOSTS_INDEX)
+        inventory.index.load()
+        inventory.load_services()
+        inventory.load_devices()
+        tsdb.store = tsdb.SeriesStore(DIR_RRD)
+        exporter.start(preferences.get(preferences.EXPORTER_PORT))
+        # Load the hosts for the requested groups
+        self.hosts = []
+        for group in options.groups or inventory.get_groups():
+            for host in inventory.load_hosts(inventory.get_group_path(group)):
+                self.hosts.append((group, host))
+        # Repeated rounds send to every host at its own phase instead of
+        # to all the hosts at the same time
+        spread = options.interval if options.count != 1 else 0
+        self.schedule = sorted(
+            ((get_phase(host.name, spread) if spread else 0, group, host)
+             for group, host in self.hosts),
+            key=lambda item: item[0])
+        # Results are written only from the main thread
+        self.results = Queue.Queue()
+        if options.format == FORMAT_CSV:
+            self.writer = csv.writer(self.output)
+            self.writer.writerow(FIELDS)
+        else:
+            self.writer = None
+
+    def write(self, record):
+        """Write a single record"""
+        if self.writer:
+            self.writer.writerow([
+                '' if record[field] is None else
+                unicode(record[field]).encode('utf-8')
+                for field in FIELDS])
+        else:
+            self.output.write(json.dumps(
+                collections.OrderedDict((field, record[field])
+                                        for field in FIELDS)))
+            self.output.write('\n')
+
+    def completed(self, group, host, services, results, error):
+        """Queue the results for a host, called from the SNMP threads"""
+        self.results.put((group, host, services, results, error,
+                          time.time(), monotonic()))
+
+    def poll(self):
+        """Poll every host once and write the results, the requests are
+        spread over the interval at the same phase of every host"""
+        started = monotonic()
+        sent = 0
+        received = 0
+        for offset, group, host in self.schedule:
+            # Write the results received while waiting for the host phase
+            delay = started + offset - monotonic()
+            while delay > 0:
+                try:
+                    self.write_results(*self.results.get(timeout=delay))
+                    received += 1
+                except Queue.Empty:
+                    pass
+                delay = started + offset - monotonic()
+            services = inventory.get_host_oids(host)
+            if not services:
+                continue
+            oids = [oid for service, oid in services]
+            # The uptime is always requested to detect the reboots
+            oids.append(OID_SYSUPTIME)
+            snmp.snmp.get_from_host_async(
+                host=host,
+                oids=oids,
+                callback=functools.partial(self.completed, group, host,
+                                           services))
+            sent += 1
+        while received < sent:
+            self.write_results(*self.results.get())
+            received += 1
+        self.output.flush()
+
+    def write_results(self, group, host, services, results, error,
+                      timestamp, clock):
+        """Write the results received for a host"""
+        rates = {}
+        if not error:
+            rates = snmp.snmp.rates.update(
+                key=(host.address, host.port_number),
+                values=results,
+                timestamp=clock)
+        for service, oid in services:
+            value = results.get(oid)
+            if value is not None:
+                exporter.update(host, service, oid, value,
+                                rates.get(oid), timestamp)
+                # Counters are stored as rates on the disk
+                tsdb.store.add(group=group,
+                               host=host.name,
+                               service=service,
+                               timestamp=timestamp,
+                               value=rates.get(oid, value))
+            self.write({
+                'timestamp': round(timestamp, 3),
+                'group': group,
+                'host': host.name,
+                'service': service,
+                'oid': oid,
+                'type': getattr(value, 'syntax', None),
+                'value': export_value(value),
+                'rate': rates.get(oid),
+                'error': str(error.value) if error else None})
+
+    def run(self):
+        """Poll the hosts every interval for the requested rounds"""
+        rounds = 0
+        next_round = monotonic()
+        try:
+            while True:
+                self.poll()
+                rounds += 1
+                if self.options.count and rounds >= self.options.count:
+                    break
+                # Rounds start at a fixed rate, skipping the missed ones
+                next_round += self.options.interval
+                delay = next_round - monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_round = monotonic()
+        except KeyboardInterrupt:
+            pass
+        except IOError as error:
+            # Stop silently when the output is closed
+            if error.errno != errno.EPIPE:
+                raise
+        finally:
+            exporter.stop()
+            snmp.snmp.stop()
+            snmp.snmp.save_cache(FILE_OIDS_CACHE)
+            inventory.index.save()
+            tsdb.store.close()
+            snmp.snmp.rtt.save(FILE_RTT_STATS)
+            if self.options.stats:
+                snmp.snmp.stats.dump(sys.stderr)
+        return 0
@@ -0,0 +1,144 @@
+##
+#     Project: gLiveSNMP
+# Description: Detect information on various devices via SNMP
+#      Author: Fabio Castelli (Muflone) <muflone@vbsimple.net>
+#   Copyright: 2016 Fabio Castelli
+#     License: GPL-2+
+#  This program is free software; you can redistribute it and/or modify it
+#  under the terms of the GNU General Public License as published by the Free
+#  Software Foundation; either version 2 of the License, or (at your option)
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful, but WITHOUT
+#  ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+#  FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+#  more details.
+#  You should have received a copy of the GNU General Public License along
+#  with this program; if not, write to the Free Software Foundation, Inc.,
+#  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+##
+
+import array
+
+# Samples kept for every series when not specified
+DEFAULT_CAPACITY = 720
+
+history = None
+
+
+class SeriesBuffer(object):
+    """Fixed size ring buffer of (timestamp, value) samples"""
+    __slots__ = ('capacity', 'count', 'position', 'timestamps', 'values')
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.count = 0
+        # Index for the next sample to write
+        self.position = 0
+        self.timestamps = array.array('d', [0.0]) * capacity
+        self.values = array.array('d', [0.0]) * capacity
+
+    def __len__(self):
+        return self.count
+
+    def append(self, timestamp, value):
+        """Add a sample replacing the oldest one when full"""
+        self.timestamps[self.position] = timestamp
+        self.values[self.position] = value
+        self.position = (self.position + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def get_index(self, index):
+        """Return the buffer index for the index-th oldest sample"""
+        return (self.position - self.count + index) % self.capacity
+
+    def get_sample(self, index):
+        """Return the index-th oldest sample, negative from the newest"""
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError('sample index out of range')
+        index = self.get_index(index)
+        return self.timestamps[index], self.values[index]
+
+    def get_last(self):
+        """Return the newest sample or None"""
+        return self.get_sample(-1) if self.count else None
+
+    def bisect(self, timestamp, after=False):
+        """Return the index of the first sample not older than timestamp
+        or the first sample newer than timestamp if after is set"""
+        low = 0
+        high = self.count
+        while low < high:
+            middle = (low + high) // 2
+            sample = self.timestamps[self.get_index(middle)]
+            if sample < timestamp or (after and sample == timestamp):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def get_window(self, start=None, end=None):
+        """Return the samples between the start and end timestamps"""
+        first = 0 if start is None else self.bisect(start)
+        last = self.count if end is None else self.bisect(end, after=True)
+        return [(self.timestamps[index], self.values[index])
+                for index in (self.get_index(item)
+                              for item in xrange(first, last))]
+
+    def get_values(self, start=None, end=None):
+        """Return the values between the start and end timestamps"""
+        return [value for timestamp, value in self.get_window(start, end)]
+
+    def get_statistics(self, start=None, end=None):
+        """Return the (minimum, average, maximum) values between the start
+        and end timestamps or None if there are no samples"""
+        values = self.get_values(start, end)
+        if not values:
+            return None
+        return min(values), sum(values) / len(values), max(values)
+
+
+class History(object):
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        """Last samples for every (host, service) series"""
+        self.capacity = capacity
+        self.series = {}
+
+    def add(self, host, service, timestamp, value):
+        """Add a sample for a series, only numeric values are kept"""
+        if not isinstance(value, (int, long, float)):
+            return False
+        key = (host, service)
+        buffer = self.series.get(key)
+        if buffer is None:
+            buffer = SeriesBuffer(self.capacity)
+            self.series[key] = buffer
+        buffer.append(timestamp, value)
+        return True
+
+    def get(self, host, service):
+        """Return the SeriesBuffer for a series or None"""
+        return self.series.get((host, service))
+
+    def get_window(self, host, service, start=None, end=None):
+        """Return the samples of a series between two timestamps"""
+        buffer = self.series.get((host, service))
+        return buffer.get_window(start, end) if buffer else []
+
+    def remove_host(self, host):
+        """Remove every series for a host"""
+        for key in [key for key in self.series.iterkeys() if key[0] == host]:
+            del self.series[key]
+
+    def rename_host(self, host, new_host):
+        """Move every series of a host to its new name"""
+        for key in [key for key in self.series.iterkeys() if key[0] == host]:
+            self.series[(new_host, key[1])] = self.series.pop(key)
+
+    def get_memory_size(self):
+        """Return the bytes used by the samples of every series"""
+        return sum(buffer.timestamps.itemsize * buffer.capacity * 2
+                   for buffer in self.series.itervalues())
@@ -0,0 +1,274 @@
+##
+#     Project: gLiveSNMP
+# Description: Detect information on various devices via SNMP
+#      Author: Fabio Castelli (Muflone) <muflone@vbsimple.net>
+#   Copyright: 2016 Fabio Castelli
+#     License: GPL-2+
+#  This program is free software; you can redistribute it and/or modify it
+#  under the terms of the GNU General Public License as published by the Free
+#  Software Foundation; either version 2 of the License, or (at your option)
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful, but WITHOUT
+#  ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+#  FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+#  more details.
+#  You should have received a copy of the GNU General Public License along
+#  with this program; if not, write to the Free Software Foundation, Inc.,
+#  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+##
+
+import json
+import os
+import os.path
+import stat
+import time
+
+from glivesnmp.constants import DIR_HOSTS
+import glivesnmp.settings as settings
+import glivesnmp.snmp as snmp
+
+import glivesnmp.models.devices as model_devices
+import glivesnmp.models.services as model_services
+from glivesnmp.models.device_info import DeviceInfo
+from glivesnmp.models.host_info import HostInfo
+from glivesnmp.models.service_info import ServiceInfo
+
+# Options for services
+OPTION_SERVICE_DESCRIPTION = 'description'
+OPTION_SERVICE_INTERVAL = 'interval'
+# Options for devices
+OPTION_DEVICE_DESCRIPTION = 'description'
+OPTION_DEVICE_SERVICES = 'services'
+# Section and options for host
+SECTION_HOST = 'host'
+OPTION_HOST_NAME = 'name'
+OPTION_HOST_DESCRIPTION = 'description'
+OPTION_HOST_PROTOCOL = 'protocol'
+OPTION_HOST_ADDRESS = 'address'
+OPTION_HOST_PORT = 'port'
+OPTION_HOST_VERSION = 'version'
+OPTION_HOST_COMMUNITY = 'community'
+OPTION_HOST_DEVICE = 'device'
+# Fields of the hosts saved in the index
+HOST_FIELDS = ('name', 'description', 'protocol', 'address', 'port_number',
+               'version', 'community', 'device')
+HOSTS_INDEX_VERSION = 1
+# Files modified in the last seconds are parsed again the next time, as
+# another change in the same second would leave the same mtime
+MTIME_GRACE = 2
+
+index = None
+
+
+def load_services():
+    """Load services translating all the OIDs at once"""
+    descriptions = dict(
+        (key, settings.services.get(key, OPTION_SERVICE_DESCRIPTION))
+        for key in settings.services.get_sections())
+    numeric_oids = snmp.snmp.translate_many(descriptions.values())
+    for key in settings.services.get_sections():
+        model_services.services[key] = ServiceInfo(
+            name=key,
+            description=descriptions[key],
+            numeric_oid=numeric_oids[descriptions[key]],
+            interval=settings.services.get_int(key, OPTION_SERVICE_INTERVAL))
+
+
+def load_devices():
+    """Load devices"""
+    for key in settings.devices.get_sections():
+        model_devices.devices[key] = DeviceInfo(
+            name=key,
+            description=settings.devices.get(
+                key, OPTION_DEVICE_DESCRIPTION),
+            services=settings.devices.get_list(
+                key, OPTION_DEVICE_SERVICES))
+
+
+def get_groups():
+    """Return the names of the groups, the default group is empty"""
+    groups = ['']
+    for filename in sorted(os.listdir(DIR_HOSTS)):
+        if os.path.isdir(os.path.join(DIR_HOSTS, filename)):
+            groups.append(filename)
+    return groups
+
+
+def get_group_path(group_name):
+    """Return the path for the hosts of a group"""
+    return os.path.join(DIR_HOSTS, group_name) if group_name else DIR_HOSTS
+
+
+def get_host_filename(hosts_path, name):
+    """Return the settings file for a host"""
+    return os.path.join(hosts_path, '%s.conf' % name)
+
+
+def load_host(filename):
+    """Load a host from its settings file"""
+    settings_host = settings.Settings(filename=filename,
+                                      case_sensitive=True)
+    return HostInfo(
+        name=settings_host.get(SECTION_HOST, OPTION_HOST_NAME),
+        description=settings_host.get(SECTION_HOST, OPTION_HOST_DESCRIPTION),
+        protocol=settings_host.get(SECTION_HOST, OPTION_HOST_PROTOCOL),
+        address=settings_host.get(SECTION_HOST, OPTION_HOST_ADDRESS),
+        port_number=settings_host.get_int(SECTION_HOST, OPTION_HOST_PORT),
+        version=settings_host.get_int(SECTION_HOST, OPTION_HOST_VERSION),
+        community=settings_host.get(SECTION_HOST, OPTION_HOST_COMMUNITY),
+        device=settings_host.get(SECTION_HOST, OPTION_HOST_DEVICE))
+
+
+def get_hosts_files(hosts_path):
+    """Return the (mtime, size, host) for every host file in a group
+    folder"""
+    if index:
+        return index.get_hosts(hosts_path)
+    files = {}
+    if not os.path.isdir(hosts_path):
+        return files
+    for filename in os.listdir(hosts_path):
+        path = os.path.join(hosts_path, filename)
+        file_stat = os.stat(path)
+        # Skip folders, used for groups
+        if stat.S_ISDIR(file_stat.st_mode):
+            continue
+        files[filename] = (file_stat.st_mtime, file_stat.st_size,
+                           load_host(path))
+    return files
+
+
+def load_hosts(hosts_path):
+    """Load every host in a group folder"""
+    return [host for mtime, size, host in
+            get_hosts_files(hosts_path).itervalues()]
+
+
+def save_host(hosts_path, host):
+    """Save a host to its settings file"""
+    settings_host = settings.Settings(
+        filename=get_host_filename(hosts_path, host.name),
+        case_sensitive=True)
+    # Add host information
+    settings_host.set(SECTION_HOST, OPTION_HOST_NAME, host.name)
+    settings_host.set(SECTION_HOST, OPTION_HOST_DESCRIPTION,
+                      host.description)
+    settings_host.set(SECTION_HOST, OPTION_HOST_PROTOCOL, host.protocol)
+    settings_host.set(SECTION_HOST, OPTION_HOST_ADDRESS, host.address)
+    settings_host.set_int(SECTION_HOST, OPTION_HOST_PORT, host.port_number)
+    settings_host.set_int(SECTION_HOST, OPTION_HOST_VERSION, host.version)
+    settings_host.set(SECTION_HOST, OPTION_HOST_COMMUNITY, host.community)
+    settings_host.set(SECTION_HOST, OPTION_HOST_DEVICE, host.device)
+    # Save the settings to the file
+    settings_host.save()
+
+
+def get_host_oids(host):
+    """Return the (service, numeric OID) tuples for the host device"""
+    device = model_devices.devices.get(host.device)
+    if not device:
+        return []
+    return [(service, model_services.services[service].numeric_oid)
+            for service in device.services
+            if service in model_services.services]
+
+
+def decode_field(value):
+    """Return a field loaded from the index as it was read from a file"""
+    return value.encode('utf-8') if isinstance(value, unicode) else value
+
+
+class HostsIndex(object):
+    def __init__(self, filename):
+        """Index of the hosts files for every group, the files are always
+        the source of truth and are parsed again when their modification
+        time or size are changed"""
+        self.filename = filename
+        # Folders with their mtime and the files with (mtime, size, host)
+        self.groups = {}
+        self.modified = False
+
+    def load(self):
+        """Load the index from the cache file"""
+        try:
+            with open(self.filename, 'r') as file_index:
+                cache = json.load(file_index)
+        except (IOError, ValueError):
+            # Missing or invalid index file
+            return
+        if cache.get('version') != HOSTS_INDEX_VERSION:
+            return
+        for hosts_path, group in cache.get('groups', {}).iteritems():
+            try:
+                files = {}
+                for filename, (mtime, size, fields) in \
+                        group['files'].iteritems():
+                    files[filename.encode('utf-8')] = (
+                        mtime, size, HostInfo(*map(decode_field, fields)))
+                self.groups[hosts_path.encode('utf-8')] = (group['mtime'],
+                                                           files)
+            except (KeyError, TypeError, ValueError):
+                # Skip invalid groups
+                pass
+
+    def save(self):
+        """Save the index to the cache file"""
+        if not self.modified:
+            return
+        groups = {}
+        for hosts_path, (mtime, files) in self.groups.iteritems():
+            groups[hosts_path] = {
+                'mtime': mtime,
+                'files': dict((filename, (file_mtime, size, [
+                    getattr(host, field) for field in HOST_FIELDS]))
+                    for filename, (file_mtime, size, host)
+                    in files.iteritems())}
+        try:
+            with open(self.filename, 'w') as file_index:
+                json.dump({'version': HOSTS_INDEX_VERSION,
+                           'groups': groups}, file_index)
+            self.modified = False
+        except IOError as error:
+            # The index is optional, it will be saved the next time
+            print 'Unable to save the hosts index: %s' % error
+
+    def get_hosts(self, hosts_path):
+        """Return the (mtime, size, host) for every host file in a group
+        folder, parsing only the new or modified files"""
+        try:
+            path_mtime = os.stat(hosts_path).st_mtime
+        except OSError:
+            self.groups.pop(hosts_path, None)
+            return {}
+        cached_mtime, cached_files = self.groups.get(hosts_path, (None, {}))
+        # The files list changes only when the folder mtime changes
+        filenames = (cached_files.keys() if path_mtime == cached_mtime
+                     else os.listdir(hosts_path))
+        recent = time.time() - MTIME_GRACE
+        files = {}
+        for filename in filenames:
+            path = os.path.join(hosts_path, filename)
+            try:
+                file_stat = os.stat(path)
+            except OSError:
+                # The file was removed in the meanwhile
+                continue
+            # Skip folders, used for groups
+            if stat.S_ISDIR(file_stat.st_mode):
+                continue
+            cached = cached_files.get(filename)
+            if (cached and cached[0] == file_stat.st_mtime and
+                    cached[1] == file_stat.st_size and
+                    file_stat.st_mtime < recent):
+                files[filename] = cached
+            else:
+                files[filename] = (file_stat.st_mtime, file_stat.st_size,
+                                   load_host(path))
+                self.modified = True
+        if path_mtime != cached_mtime or len(files) != len(cached_files):
+            self.modified = True
+        # A recently modified folder is listed again the next time
+        self.groups[hosts_path] = (path_mtime if path_mtime < recent
+                                   else None, files)
+        return files
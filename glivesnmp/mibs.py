@@ -0,0 +1,320 @@
+##
+#     Project: gLiveSNMP
+# Description: Detect information on various devices via SNMP
+#      Author: Fabio Castelli (Muflone) <muflone@vbsimple.net>
+#   Copyright: 2016 Fabio Castelli
+#     License: GPL-2+
+#  This program is free software; you can redistribute it and/or modify it
+#  under the terms of the GNU General Public License as published by the Free
+#  Software Foundation; either version 2 of the License, or (at your option)
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful, but WITHOUT
+#  ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+#  FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+#  more details.
+#  You should have received a copy of the GNU General Public License along
+#  with this program; if not, write to the Free Software Foundation, Inc.,
+#  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+##
+
+import hashlib
+import marshal
+import os
+import os.path
+import re
+
+# Default MIB directories searched by net-snmp
+DEFAULT_MIB_DIRS = (
+    '~/.snmp/mibs',
+    '/usr/share/snmp/mibs',
+    '/usr/share/snmp/mibs/iana',
+    '/usr/share/snmp/mibs/ietf',
+    '/usr/share/mibs/site',
+    '/usr/share/mibs/iana',
+    '/usr/share/mibs/ietf',
+    '/usr/share/mibs/netsnmp',
+    '/usr/local/share/snmp/mibs')
+
+
+def get_mib_dirs():
+    """Return the list of the existing MIB directories"""
+    if os.environ.get('MIBDIRS'):
+        # Use the same directories of the net-snmp tools
+        directories = os.environ['MIBDIRS'].lstrip('+').split(os.pathsep)
+        if os.environ['MIBDIRS'].startswith('+'):
+            directories.extend(DEFAULT_MIB_DIRS)
+    else:
+        directories = DEFAULT_MIB_DIRS
+    result = []
+    for directory in directories:
+        directory = os.path.expanduser(directory)
+        if os.path.isdir(directory) and directory not in result:
+            result.append(directory)
+    return result
+
+
+def get_mibs_signature():
+    """Return a signature of the MIB set which changes every time a MIB
+    directory or a MIB file gets updated"""
+    result = [os.environ.get('MIBS', ''), os.environ.get('MIBDIRS', '')]
+    # Files replaced or edited in place don't change the directory mtime
+    files = hashlib.sha1()
+    for directory in get_mib_dirs():
+        result.append('%s:%d' % (directory, os.path.getmtime(directory)))
+        for filename in sorted(os.listdir(directory)):
+            try:
+                file_stat = os.stat(os.path.join(directory, filename))
+            except OSError:
+                # Skip broken links
+                continue
+            files.update('%s:%s:%d:%d\n' % (directory,
+                                            filename,
+                                            file_stat.st_mtime,
+                                            file_stat.st_size))
+    result.append(files.hexdigest())
+    return result
+
+
+# Version of the serialized index format
+INDEX_VERSION = 1
+# Tokens of a MIB module, comments are removed later
+TOKENS = re.compile(r'"[^"]*"|--.*?(?:--|$)|::=|[{}(),;]|'
+                    r'[A-Za-z0-9][-A-Za-z0-9_]*|\S', re.MULTILINE)
+# Macros defining an OID value
+MACROS = ('OBJECT-TYPE', 'MODULE-IDENTITY', 'OBJECT-IDENTITY',
+          'NOTIFICATION-TYPE', 'OBJECT-GROUP', 'NOTIFICATION-GROUP',
+          'MODULE-COMPLIANCE', 'AGENT-CAPABILITIES')
+# Clauses ending the SYNTAX clause of an OBJECT-TYPE
+SYNTAX_END = ('UNITS', 'MAX-ACCESS', 'ACCESS', 'STATUS', 'DISPLAY-HINT',
+              'DESCRIPTION', '{', '(', '::=')
+# Well known OID roots
+ROOTS = {'ccitt': '.0', 'iso': '.1', 'joint-iso-ccitt': '.2'}
+NUMERIC_OID = re.compile(r'^\.?\d+(\.\d+)*$')
+
+
+def parse_mib(text):
+    """Parse the text of a MIB module and return the module name and the
+    list of (name, components, syntax, units) definitions, the components
+    are (name, number) tuples with name or number set to None"""
+    tokens = [token for token in TOKENS.findall(text)
+              if not token.startswith('--')]
+    count = len(tokens)
+    module = None
+    definitions = []
+    index = 0
+    while index < count - 3:
+        token = tokens[index]
+        following = tokens[index + 1]
+        if following == 'DEFINITIONS' and module is None:
+            module = token
+        elif token[0].islower() and (
+                following in MACROS or
+                tokens[index + 1:index + 4] == ['OBJECT', 'IDENTIFIER',
+                                                '::=']):
+            syntax = None
+            units = None
+            position = index + 1
+            # Look for the SYNTAX and UNITS clauses up to the value
+            while position < count and tokens[position] != '::=':
+                if tokens[position] == 'SYNTAX' and syntax is None:
+                    end = position + 1
+                    while end < count and tokens[end] not in SYNTAX_END:
+                        end += 1
+                    syntax = ' '.join(tokens[position + 1:end])
+                elif tokens[position] == 'UNITS' and position + 1 < count:
+                    units = tokens[position + 1].strip('"')
+                position += 1
+            if position + 1 < count and tokens[position + 1] == '{' and \
+                    '}' in tokens[position + 2:]:
+                end = tokens.index('}', position + 2)
+                components = []
+                values = tokens[position + 2:end]
+                item = 0
+                while item < len(values):
+                    value = values[item]
+                    if value.isdigit():
+                        components.append((None, int(value)))
+                    elif values[item + 1:item + 2] == ['('] and \
+                            ''.join(values[item + 2:item + 3]).isdigit():
+                        # Named number like org(3)
+                        components.append((value, int(values[item + 2])))
+                        item += 3
+                    else:
+                        components.append((value, None))
+                    item += 1
+                definitions.append((token, components, syntax, units))
+                index = end
+        index += 1
+    return module, definitions
+
+
+def compile_mibs(directories):
+    """Compile every MIB file in the directories to a dictionary with the
+    names, the qualified names and the objects by their numeric OID"""
+    modules = []
+    for directory in directories:
+        for filename in sorted(os.listdir(directory)):
+            path = os.path.join(directory, filename)
+            if filename.startswith('.') or not os.path.isfile(path):
+                continue
+            with open(path, 'r') as file_mib:
+                text = file_mib.read()
+            if 'DEFINITIONS' in text:
+                modules.append(parse_mib(text))
+    # Collect the definitions by module and by name
+    definitions = {}
+    globals_ = {}
+    for module, items in modules:
+        for name, components, syntax, units in items:
+            definitions[(module, name)] = (components, syntax, units)
+            globals_.setdefault(name, module)
+            # Named numbers define new symbols too
+            for position, (component, number) in enumerate(components):
+                if position and component and number is not None:
+                    key = (module, component)
+                    if key not in definitions:
+                        definitions[key] = (components[:position + 1],
+                                            None, None)
+                        globals_.setdefault(component, module)
+    resolved = {}
+
+    def resolve(key, depth=0):
+        """Resolve a definition to its numeric OID"""
+        if key in resolved:
+            return resolved[key]
+        module, name = key
+        if key not in definitions:
+            if name in ROOTS:
+                return ROOTS[name]
+            elif name in globals_ and globals_[name] != module:
+                return resolve((globals_[name], name), depth + 1)
+            return None
+        if depth > 64:
+            # Circular definitions
+            return None
+        components = definitions[key][0]
+        parent, number = components[0]
+        if parent is None:
+            result = '.%d' % number
+        elif number is not None and parent in ROOTS:
+            result = '.%d' % number
+        else:
+            result = resolve((module, parent), depth + 1)
+        if result is not None:
+            for component, number in components[1:]:
+                if number is None:
+                    # Invalid component without a number
+                    result = None
+                    break
+                result = '%s.%d' % (result, number)
+        resolved[key] = result
+        return result
+
+    index = {'version': INDEX_VERSION,
+             'names': {},
+             'qualified': {},
+             'objects': {}}
+    for key in definitions:
+        oid = resolve(key)
+        if oid:
+            module, name = key
+            components, syntax, units = definitions[key]
+            if globals_[name] == module:
+                index['names'][name] = oid
+            index['qualified']['%s::%s' % key] = oid
+            if oid not in index['objects'] or syntax:
+                index['objects'][oid] = (module, name, syntax, units)
+    for name in ROOTS:
+        index['names'].setdefault(name, ROOTS[name])
+    return index
+
+
+class MIBIndex(object):
+    def __init__(self, filename):
+        """Compiled index of the MIB files, loaded on the first use"""
+        self.filename = filename
+        self.index = None
+
+    def load(self):
+        """Load the index from the file or compile the MIB directories if
+        the MIB set was changed since the index was saved"""
+        signature = get_mibs_signature()
+        try:
+            with open(self.filename, 'rb') as file_index:
+                index = marshal.load(file_index)
+            if index.get('version') == INDEX_VERSION and \
+                    index.get('signature') == signature:
+                self.index = index
+                return
+        except (IOError, EOFError, ValueError, TypeError):
+            # Missing or invalid index file
+            pass
+        self.index = compile_mibs(get_mib_dirs())
+        self.index['signature'] = signature
+        try:
+            with open(self.filename, 'wb') as file_index:
+                marshal.dump(self.index, file_index)
+        except IOError as error:
+            # The index will be compiled again the next time
+            print 'Unable to save the MIB index: %s' % error
+
+    def get_index(self):
+        """Return the index, loading it if needed"""
+        if self.index is None:
+            self.load()
+        return self.index
+
+    def count(self):
+        """Return the number of the objects in the index"""
+        return len(self.get_index()['objects'])
+
+    def translate(self, oid):
+        """Translate a literal OID to numeric OID"""
+        oid = oid.strip()
+        if NUMERIC_OID.match(oid):
+            return '.' + oid.strip('.')
+        index = self.get_index()
+        module = None
+        if '::' in oid:
+            module, oid = oid.split('::', 1)
+        parts = oid.split('.')
+        for part in parts[1:]:
+            if not part.isdigit():
+                return None
+        if module:
+            result = index['qualified'].get('%s::%s' % (module, parts[0]))
+        else:
+            result = index['names'].get(parts[0])
+        if result:
+            result = '.'.join([result] + parts[1:])
+        return result
+
+    def find(self, oid):
+        """Return the object with the longest prefix for a numeric OID
+        along as with the remaining suffix"""
+        objects = self.get_index()['objects']
+        arcs = oid.strip('.').split('.')
+        for length in range(len(arcs), 0, -1):
+            item = objects.get('.' + '.'.join(arcs[:length]))
+            if item:
+                return item, arcs[length:]
+        return None, arcs
+
+    def reverse(self, oid):
+        """Translate a numeric OID to its literal name"""
+        item, suffix = self.find(oid)
+        if item:
+            return '%s::%s' % (item[0], item[1]) + \
+                ''.join('.' + arc for arc in suffix)
+        return oid
+
+    def get_syntax(self, oid):
+        """Return the syntax for a numeric OID"""
+        item = self.find(oid)[0]
+        return item[2] if item else None
+
+    def get_units(self, oid):
+        """Return the units for a numeric OID"""
+        item = self.find(oid)[0]
+        return item[3] if item else None
@@ -29,6 +29,9 @@ class ModelHosts(ModelAbstract):
     COL_VERSION = 5
     COL_COMMUNITY = 6
     COL_DEVICE = 7
+    COL_STATUS = 8
+    COL_LATENCY = 9
+    COL_VALUES = 10
 
     def add_data(self, item):
         """Add a new row to the model if it doesn't exists"""
@@ -41,7 +44,10 @@ class ModelHosts(ModelAbstract):
                                                item.port_number,
                                                item.version,
                                                item.community,
-                                               item.device))
+                                               item.device,
+                                               '',
+                                               '',
+                                               ''))
             self.rows[item.name] = new_row
             return new_row
 
@@ -49,7 +55,14 @@ class ModelHosts(ModelAbstract):
         """Update an existing TreeIter"""
         super(self.__class__, self).set_data(treeiter, item)
         self.model.set_value(treeiter, self.COL_KEY, item.name)
-        self.model.set_value(treeiter, self.COL_DESCRIPTION, item.description)
+        self.model.set(treeiter,
+                       self.COL_DESCRIPTION, item.description,
+                       self.COL_PROTOCOL, item.protocol,
+                       self.COL_ADDRESS, item.address,
+                       self.COL_PORT, item.port_number,
+                       self.COL_VERSION, item.version,
+                       self.COL_COMMUNITY, item.community,
+                       self.COL_DEVICE, item.device)
 
     def get_description(self, treeiter):
         """Get the description from a TreeIter"""
@@ -78,3 +91,14 @@ class ModelHosts(ModelAbstract):
     def get_device(self, treeiter):
         """Get the device from a TreeIter"""
         return self.model[treeiter][self.COL_DEVICE]
+
+    def get_status(self, treeiter):
+        """Get the polling status from a TreeIter"""
+        return self.model[treeiter][self.COL_STATUS]
+
+    def set_status(self, treeiter, status, latency, values):
+        """Set the polling status, latency and values for a TreeIter"""
+        self.model.set(treeiter,
+                       self.COL_STATUS, status,
+                       self.COL_LATENCY, latency,
+                       self.COL_VALUES, values)
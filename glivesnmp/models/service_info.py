@@ -22,7 +22,9 @@ import glivesnmp.preferences as preferences
 
 
 class ServiceInfo(object):
-    def __init__(self, name, description, numeric_oid):
+    def __init__(self, name, description, numeric_oid, interval=0):
         self.name = name
         self.description = description
         self.numeric_oid = numeric_oid
+        # Polling interval in seconds, 0 to use the window timer
+        self.interval = interval
@@ -18,8 +18,6 @@
 #  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
 ##
 
-from gi.repository import GdkPixbuf
-
 import glivesnmp.preferences as preferences
 import glivesnmp.snmp as snmp
 
@@ -32,6 +30,7 @@ services = {}
 class ModelServices(ModelAbstract):
     COL_DESCRIPTION = 1
     COL_NUMERIC_OID = 2
+    COL_INTERVAL = 3
 
     def add_data(self, item):
         """Add a new row to the model if it doesn't exists"""
@@ -40,7 +39,8 @@ class ModelServices(ModelAbstract):
             new_row = self.model.append((
                 item.name,
                 item.description,
-                item.numeric_oid))
+                item.numeric_oid,
+                item.interval))
             self.rows[item.name] = new_row
             return new_row
 
@@ -49,6 +49,7 @@ class ModelServices(ModelAbstract):
         super(self.__class__, self).set_data(treeiter, item)
         self.model.set_value(treeiter, self.COL_KEY, item.name)
         self.model.set_value(treeiter, self.COL_DESCRIPTION, item.description)
+        self.model.set_value(treeiter, self.COL_INTERVAL, item.interval)
 
     def get_description(self, treeiter):
         """Get the description from a TreeIter"""
@@ -58,14 +59,23 @@ class ModelServices(ModelAbstract):
         """Get the numeric OID from a TreeIter"""
         return self.model[treeiter][self.COL_NUMERIC_OID]
 
+    def get_interval(self, treeiter):
+        """Get the polling interval from a TreeIter"""
+        return self.model[treeiter][self.COL_INTERVAL]
+
     def dump(self):
         """Extract the model data to a dict object"""
         super(self.__class__, self).dump()
         result = {}
+        # Translate all the OIDs at once
+        numeric_oids = snmp.snmp.translate_many(
+            [self.get_description(treeiter)
+             for treeiter in self.rows.itervalues()])
         for key in self.rows.iterkeys():
+            description = self.get_description(self.rows[key])
             result[key] = ServiceInfo(
                 name=self.get_key(self.rows[key]),
-                description=self.get_description(self.rows[key]),
-                numeric_oid=snmp.snmp.translate(
-                    self.get_description(self.rows[key])))
+                description=description,
+                numeric_oid=numeric_oids[description],
+                interval=self.get_interval(self.rows[key]))
         return result
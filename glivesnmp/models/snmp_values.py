@@ -18,6 +18,8 @@
 #  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
 ##
 
+import time
+
 from glivesnmp.models.abstract import ModelAbstract
 
 
@@ -25,6 +27,8 @@ class SNMPValues(ModelAbstract):
     COL_VALUE = 1
     COL_TIMESTAMP = 2
     COL_TIME = 3
+    # Value of GTK_TREE_SORTABLE_UNSORTED_SORT_COLUMN_ID
+    UNSORTED_SORT_COLUMN_ID = -2
 
     def add_data(self, item):
         """Add a new row to the model if it doesn't exists"""
@@ -34,7 +38,7 @@ class SNMPValues(ModelAbstract):
                 item.name,
                 item.value,
                 item.timestamp,
-                '' if item.timestamp == 0 else 'XXX'))
+                self.format_time(item.timestamp)))
             self.rows[item.name] = new_row
             return new_row
 
@@ -43,5 +47,33 @@ class SNMPValues(ModelAbstract):
         return self.model[treeiter][self.COL_VALUE]
 
     def set_value(self, treeiter, value):
-        """Set the value for a TreeIter"""
-        self.model.set_value(treeiter, self.COL_VALUE, value)
+        """Set the value for a TreeIter if it was changed"""
+        if self.model.get_value(treeiter, self.COL_VALUE) != value:
+            self.model.set_value(treeiter, self.COL_VALUE, value)
+
+    def set_timestamp(self, treeiter, timestamp):
+        """Set the timestamp for a TreeIter if it was changed"""
+        if self.model.get_value(treeiter, self.COL_TIMESTAMP) != int(
+                timestamp):
+            self.model.set(treeiter,
+                           self.COL_TIMESTAMP, int(timestamp),
+                           self.COL_TIME, self.format_time(timestamp))
+
+    def freeze_sort(self):
+        """Disable the sorting on the updated columns while updating many
+        rows and return the previous sort column"""
+        sort_column = self.model.get_sort_column_id()
+        if sort_column[0] in (self.COL_VALUE, self.COL_TIMESTAMP):
+            self.model.set_sort_column_id(self.UNSORTED_SORT_COLUMN_ID,
+                                          sort_column[1])
+            return sort_column
+
+    def thaw_sort(self, sort_column):
+        """Restore the sort column returned by freeze_sort"""
+        if sort_column:
+            self.model.set_sort_column_id(*sort_column)
+
+    def format_time(self, timestamp):
+        """Format a timestamp in the local time"""
+        return time.strftime('%X', time.localtime(timestamp)) \
+            if timestamp else ''
@@ -39,6 +39,21 @@ DEFAULT_VALUES[GROUPS_SHOW] = (SECTION_PREFERENCES, True)
 DETACHED_WINDOWS = 'detached windows'
 DEFAULT_VALUES[DETACHED_WINDOWS] = (SECTION_PREFERENCES, False)
 
+SNMP_BACKEND = 'snmp backend'
+DEFAULT_VALUES[SNMP_BACKEND] = (SECTION_PREFERENCES, 'internal')
+
+HISTORY_SAMPLES = 'history samples'
+DEFAULT_VALUES[HISTORY_SAMPLES] = (SECTION_PREFERENCES, 720)
+
+WORKER_THREADS = 'worker threads'
+DEFAULT_VALUES[WORKER_THREADS] = (SECTION_PREFERENCES, 16)
+
+EXPORTER_PORT = 'exporter port'
+DEFAULT_VALUES[EXPORTER_PORT] = (SECTION_PREFERENCES, 0)
+
+HOSTS_MONITOR = 'hosts monitor'
+DEFAULT_VALUES[HOSTS_MONITOR] = (SECTION_PREFERENCES, False)
+
 HEADERBARS_DISABLE = 'disable'
 DEFAULT_VALUES[HEADERBARS_DISABLE] = (SECTION_HEADERBARS, False)
 
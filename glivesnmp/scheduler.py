@@ -0,0 +1,253 @@
+##
+#     Project: gLiveSNMP
+# Description: Detect information on various devices via SNMP
+#      Author: Fabio Castelli (Muflone) <muflone@vbsimple.net>
+#   Copyright: 2016 Fabio Castelli
+#     License: GPL-2+
+#  This program is free software; you can redistribute it and/or modify it
+#  under the terms of the GNU General Public License as published by the Free
+#  Software Foundation; either version 2 of the License, or (at your option)
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful, but WITHOUT
+#  ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+#  FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+#  more details.
+#  You should have received a copy of the GNU General Public License along
+#  with this program; if not, write to the Free Software Foundation, Inc.,
+#  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+##
+
+import heapq
+import itertools
+import threading
+import zlib
+
+from glivesnmp.clock import monotonic
+import glivesnmp.snmp as snmp
+from glivesnmp.snmp_exception import (
+    SNMPException, SNMPCancelledException, SNMPUnreachableException)
+from glivesnmp.snmp_stats import PHASE_QUEUE
+import glivesnmp.worker_pool as worker_pool
+
+# Services due within this window are polled in the same batch
+BATCH_WINDOW = 0.1
+# Random delay added to every slot as a fraction of the interval
+JITTER_RATIO = 0.05
+MAX_JITTER = 1.0
+# Period of the host phases, the slots of different intervals are aligned
+PHASE_PERIOD = 3600
+
+scheduler = None
+
+
+def get_hash_fraction(value):
+    """Return a deterministic fraction in [0, 1) from a string"""
+    return (zlib.crc32(value) & 0xffffffff) / 4294967296.0
+
+
+def get_phase(name, interval):
+    """Return the offset of the slots for a host inside the interval"""
+    return get_hash_fraction(name) * PHASE_PERIOD % interval
+
+
+def get_jitter(name, due, interval):
+    """Return the bounded jitter for a host slot, it's the same for every
+    service of the host due at the same time to keep them in one batch"""
+    return min(get_hash_fraction('%s:%d' % (name, round(due * 1000))) *
+               MAX_JITTER, interval * JITTER_RATIO)
+
+
+class ScheduledService(object):
+    __slots__ = ('host', 'service', 'oid', 'interval', 'due', 'slot',
+                 'callback', 'token', 'priority', 'pending', 'active')
+
+    def __init__(self, host, service, oid, interval, due, callback, token,
+                 priority):
+        """A service polled on a host every interval seconds"""
+        self.host = host
+        self.service = service
+        self.oid = oid
+        self.interval = interval
+        self.due = due
+        # Index of the last slot, None before the first poll
+        self.slot = None
+        self.callback = callback
+        self.token = token
+        self.priority = priority
+        # A request for the service is still running
+        self.pending = False
+        # Removed entries are discarded when they come out of the heap
+        self.active = True
+
+
+class Scheduler(object):
+    def __init__(self, name='scheduler'):
+        """Single thread keeping the due times for every scheduled service
+        and submitting the polls to the workers pool"""
+        self.name = name
+        # Heap of (due, sequence, entry)
+        self.queue = []
+        self.condition = threading.Condition()
+        self.sequence = itertools.count()
+        self.entries = {}
+        self.thread = None
+        self.stopped = False
+        # Metrics
+        self.batches = 0
+        self.skipped = 0
+
+    def add(self, host, services, callback, token,
+            priority=worker_pool.PRIORITY_NORMAL):
+        """Schedule a list of (service, oid, interval) for a host, a zero
+        interval polls the service only once.
+        The first poll is immediate, the next ones follow the host slots.
+        The callback is called from a worker thread with the host, the
+        polled (service, oid) pairs, the values and the rates"""
+        with self.condition:
+            now = monotonic()
+            for service, oid, interval in services:
+                entry = ScheduledService(host=host,
+                                         service=service,
+                                         oid=oid,
+                                         interval=interval,
+                                         due=now,
+                                         callback=callback,
+                                         token=token,
+                                         priority=priority)
+                self.entries.setdefault(token, []).append(entry)
+                self.push(entry)
+            # Start the scheduler thread on the first request
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run,
+                                               name=self.name)
+                self.thread.daemon = True
+                self.thread.start()
+            self.condition.notify()
+
+    def push(self, entry):
+        """Add an entry to the heap, the condition must be held"""
+        heapq.heappush(self.queue, (entry.due, next(self.sequence), entry))
+
+    def discard(self, entry):
+        """Forget an entry, the condition must be held"""
+        entry.active = False
+        entries = self.entries.get(entry.token)
+        if entries and entry in entries:
+            entries.remove(entry)
+            if not entries:
+                del self.entries[entry.token]
+
+    def remove(self, token):
+        """Remove every service scheduled with a token"""
+        with self.condition:
+            for entry in self.entries.pop(token, ()):
+                entry.active = False
+            self.condition.notify()
+
+    def reschedule(self, entry, now):
+        """Move the due time to the next slot at a fixed rate.
+        The slots of every host are spread over the interval by a phase
+        from the host name, the slots already missed are skipped instead
+        of polled in a burst"""
+        phase = get_phase(entry.host.name, entry.interval)
+        slot = int((now - phase) // entry.interval) + 1
+        if entry.slot is not None:
+            # Entries polled in advance by the batch window
+            slot = max(slot, entry.slot + 1)
+            self.skipped += slot - entry.slot - 1
+        entry.slot = slot
+        due = phase + slot * entry.interval
+        entry.due = due + get_jitter(entry.host.name, due, entry.interval)
+        self.push(entry)
+
+    def run(self):
+        """Submit the due services until the scheduler is stopped"""
+        while True:
+            with self.condition:
+                while not self.stopped:
+                    if self.queue:
+                        timeout = self.queue[0][0] - monotonic()
+                        if timeout <= 0:
+                            break
+                        self.condition.wait(timeout)
+                    else:
+                        self.condition.wait()
+                if self.stopped:
+                    return
+                # Collect every due service grouped by host and requester
+                now = monotonic()
+                batches = {}
+                while self.queue and self.queue[0][0] <= now + BATCH_WINDOW:
+                    entry = heapq.heappop(self.queue)[2]
+                    if not entry.active:
+                        continue
+                    elif entry.token and entry.token.cancelled:
+                        self.discard(entry)
+                        continue
+                    if entry.pending:
+                        # The previous poll for this slot is still running
+                        self.skipped += 1
+                    else:
+                        entry.pending = True
+                        batches.setdefault(
+                            (entry.host.name, entry.callback, entry.token,
+                             entry.priority), []).append(entry)
+                    if entry.interval > 0:
+                        self.reschedule(entry, now)
+                    else:
+                        self.discard(entry)
+                self.batches += len(batches)
+            # Due OIDs for the same host are sent in a single request
+            for (host_name, callback, token,
+                 priority), entries in batches.iteritems():
+                worker_pool.pool.submit(function=self.poll,
+                                        arguments=(entries[0].host, entries,
+                                                   callback, token,
+                                                   monotonic()),
+                                        priority=priority,
+                                        token=token)
+
+    def poll(self, host, entries, callback, token, submitted):
+        """Get the values for the due services of a host"""
+        snmp.snmp.stats.add((host.address, host.port_number), PHASE_QUEUE,
+                            monotonic() - submitted)
+        oids = []
+        for entry in entries:
+            if entry.oid not in oids:
+                oids.append(entry.oid)
+        rates = {}
+        try:
+            values, rates = snmp.snmp.get_rates_from_host(host, oids, token)
+        except SNMPCancelledException:
+            # The polling was stopped
+            return
+        except SNMPUnreachableException as error:
+            # No request was sent to the unreachable host
+            values = {'error': 'Exception: %s' % error.value,
+                      'unreachable': True}
+        except SNMPException as error:
+            values = {'error': 'Exception: %s' % error.value}
+        finally:
+            with self.condition:
+                for entry in entries:
+                    entry.pending = False
+        callback(host, [(entry.service, entry.oid) for entry in entries],
+                 values, rates)
+
+    def get_metrics(self):
+        """Return a dictionary with the scheduler metrics"""
+        with self.condition:
+            return {'scheduled': sum(len(entries) for entries
+                                     in self.entries.itervalues()),
+                    'queue depth': len(self.queue),
+                    'batches': self.batches,
+                    'skipped': self.skipped}
+
+    def stop(self):
+        """Stop the scheduler thread discarding every scheduled service"""
+        with self.condition:
+            self.stopped = True
+            self.queue = []
+            self.entries = {}
+            self.condition.notify_all()
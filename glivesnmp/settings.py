@@ -36,18 +36,46 @@ services = None
 devices = None
 
 
+def parse_options():
+    """Parse the command line options"""
+    parser = optparse.OptionParser(usage='usage: %prog [options]')
+    parser.set_defaults(verbose_level=VERBOSE_LEVEL_NORMAL)
+    parser.add_option('-v', '--verbose', dest='verbose_level',
+                      action='store_const', const=VERBOSE_LEVEL_MAX,
+                      help='show error and information messages')
+    parser.add_option('-q', '--quiet', dest='verbose_level',
+                      action='store_const', const=VERBOSE_LEVEL_QUIET,
+                      help='hide error and information messages')
+    parser.add_option('--stats', dest='stats', action='store_true',
+                      default=False,
+                      help='write the poller statistics to the standard '
+                           'error on exit')
+    group = optparse.OptionGroup(parser, 'Headless poller options')
+    group.add_option('--poll', dest='poll', action='store_true',
+                     default=False,
+                     help='poll the hosts without the user interface')
+    group.add_option('-g', '--group', dest='groups', action='append',
+                     metavar='GROUP', default=[],
+                     help='poll only the hosts in GROUP (default: all the '
+                          'groups, use an empty name for the default group)')
+    group.add_option('-i', '--interval', dest='interval', type='float',
+                     default=60.0, metavar='SECONDS',
+                     help='seconds between the polling rounds (default: '
+                          '%default)')
+    group.add_option('-c', '--count', dest='count', type='int', default=0,
+                     help='number of polling rounds (default: unlimited)')
+    group.add_option('-f', '--format', dest='format', type='choice',
+                     choices=('json', 'csv'), default='json',
+                     help='output format: json (JSON Lines) or csv '
+                          '(default: %default)')
+    parser.add_option_group(group)
+    return parser.parse_args()
+
+
 class Settings(object):
     def __init__(self, filename, case_sensitive):
         """Initialize settings and command line options"""
-        parser = optparse.OptionParser(usage='usage: %prog [options]')
-        parser.set_defaults(verbose_level=VERBOSE_LEVEL_NORMAL)
-        parser.add_option('-v', '--verbose', dest='verbose_level',
-                          action='store_const', const=VERBOSE_LEVEL_MAX,
-                          help='show error and information messages')
-        parser.add_option('-q', '--quiet', dest='verbose_level',
-                          action='store_const', const=VERBOSE_LEVEL_QUIET,
-                          help='hide error and information messages')
-        (self.options, self.arguments) = parser.parse_args()
+        (self.options, self.arguments) = parse_options()
         # Parse settings from the configuration file
         self.config = ConfigParser.RawConfigParser()
         # Set case sensitiveness if requested
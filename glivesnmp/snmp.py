@@ -18,9 +18,34 @@
 #  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
 ##
 
+import json
 import subprocess
+import threading
 
-from snmp_exception import SNMPException
+from snmp_exception import (
+    SNMPException, SNMPCancelledException, SNMPTimeoutException,
+    SNMPUnreachableException)
+import glivesnmp.preferences as preferences
+from glivesnmp.clock import monotonic
+from glivesnmp.constants import FILE_MIBS_INDEX
+from glivesnmp.mibs import get_mibs_signature, MIBIndex
+from glivesnmp.snmp_engine import (
+    DEFAULT_BATCH_SIZE, SNMPEngine, split_oids)
+from glivesnmp.snmp_breaker import CircuitBreakers
+from glivesnmp.snmp_coalescer import RequestCoalescer
+from glivesnmp.snmp_poller import SNMPPoller
+from glivesnmp.snmp_rates import OID_SYSUPTIME, RateEngine
+from glivesnmp.snmp_rtt import RTTStatistics
+from glivesnmp.snmp_stats import (
+    PollerStatistics, PHASE_SEND, PHASE_RTT, PHASE_PARSE)
+from glivesnmp.snmp_types import iter_varbinds, parse_value
+
+BACKEND_INTERNAL = 'internal'
+BACKEND_NETSNMP = 'net-snmp'
+# Protocols supported by the internal engine
+INTERNAL_PROTOCOLS = ('udp', 'udp6')
+# Message printed by the net-snmp tools when the host doesn't reply
+TIMEOUT_MESSAGE = 'Timeout: No Response from'
 
 snmp = None
 
@@ -29,10 +54,35 @@ class SNMP(object):
     def __init__(self):
         """Object initialization"""
         self.oids = {}
+        self.oids_modified = False
+        self.mibs = MIBIndex(FILE_MIBS_INDEX)
+        # Working number of varbinds per request for every host
+        self.batch_sizes = {}
+        # Measured round trip times for every host
+        self.rtt = RTTStatistics()
+        # Circuit breakers to back off the unreachable hosts
+        self.breakers = CircuitBreakers()
+        # Identical concurrent requests are sent only once
+        self.coalescer = RequestCoalescer()
+        # Per second rates for the counters
+        self.rates = RateEngine()
+        # Timings for every phase of the requests
+        self.stats = PollerStatistics()
+        self.engine = SNMPEngine(batch_sizes=self.batch_sizes, rtt=self.rtt,
+                                 stats=self.stats)
+        self.poller = None
 
-    def translate(self, oid, force_lookup=False):
-        """Translate a literal OID to numeric OID"""
+    def translate(self, oid, force_lookup=False, use_tools=True):
+        """Translate a literal OID to numeric OID using the MIB index or
+        the snmptranslate tool if allowed"""
         if oid not in self.oids or force_lookup:
+            numeric_oid = self.mibs.translate(oid)
+            if numeric_oid:
+                self.oids[oid] = numeric_oid
+                self.oids_modified = True
+                return numeric_oid
+            elif not use_tools:
+                return None
             arguments = ['snmptranslate', ]
             arguments.append('-On')
             arguments.append(oid)
@@ -42,80 +92,459 @@ class SNMP(object):
             stdout, stderr = process.communicate()
             if stderr:
                 print 'stderr = ', stderr
-                return None
+                # Remember the invalid OID to avoid further lookups
+                self.oids[oid] = None
             else:
                 self.oids[oid] = stdout.replace('\n', '')
+            self.oids_modified = True
         return self.oids[oid]
 
-    def get_from_host(self, host, oids):
+    def translate_many(self, oids, force_lookup=False):
+        """Translate many literal OIDs to numeric OIDs using the MIB index
+        and a single snmptranslate process for the OIDs still missing"""
+        missing = []
+        for oid in oids:
+            if oid and (oid not in self.oids or force_lookup) and \
+                    oid not in missing:
+                numeric_oid = self.mibs.translate(oid)
+                if numeric_oid:
+                    self.oids[oid] = numeric_oid
+                    self.oids_modified = True
+                else:
+                    missing.append(oid)
+        if missing:
+            arguments = ['snmptranslate', '-On']
+            arguments.extend(missing)
+            process = subprocess.Popen(args=arguments,
+                                       stdout=subprocess.PIPE,
+                                       stderr=subprocess.PIPE)
+            stdout, stderr = process.communicate()
+            lines = stdout.splitlines()
+            if len(lines) == len(missing):
+                # Every OID was translated, warnings are ignored
+                for oid, numeric_oid in zip(missing, lines):
+                    self.oids[oid] = numeric_oid
+                self.oids_modified = True
+            else:
+                # Some OIDs are invalid, translate them one by one
+                for oid in missing:
+                    self.translate(oid, force_lookup)
+        return dict((oid, self.oids.get(oid)) for oid in oids)
+
+    def reverse_translate(self, oid):
+        """Translate a numeric OID to its literal name"""
+        return self.mibs.reverse(oid)
+
+    def load_cache(self, filename):
+        """Load the translated OIDs from a cache file, the cache is ignored
+        if the MIB set was changed since it was saved"""
+        try:
+            with open(filename, 'r') as file_cache:
+                cache = json.load(file_cache)
+        except (IOError, ValueError):
+            # Missing or invalid cache file
+            return
+        if cache.get('signature') == get_mibs_signature():
+            for oid, numeric_oid in cache.get('oids', {}).iteritems():
+                self.oids.setdefault(
+                    str(oid), str(numeric_oid) if numeric_oid else None)
+
+    def save_cache(self, filename):
+        """Save the translated OIDs to a cache file"""
+        if self.oids_modified:
+            try:
+                with open(filename, 'w') as file_cache:
+                    json.dump({'signature': get_mibs_signature(),
+                               'oids': self.oids}, file_cache)
+                self.oids_modified = False
+            except IOError as error:
+                # The cache is optional, it will be saved the next time
+                print 'Unable to save the OIDs cache: %s' % error
+
+    def get_from_host(self, host, oids, token=None):
         """Get the value for a requested OID for a HostInfo object"""
         return self.get(protocol=host.protocol.lower(),
                         address=host.address,
                         port_number=host.port_number,
                         version=host.version,
                         community=host.community,
-                        oids=oids)
+                        oids=oids,
+                        token=token)
 
-    def get(self, protocol, address, port_number, version, community, oids):
-        """Get many values for requested OIDs"""
+    def get_rates_from_host(self, host, oids, token=None):
+        """Get the values for the requested OIDs for a HostInfo object
+        and the per second rates for the counters"""
+        request_oids = list(oids)
+        # The uptime is always requested to detect the reboots
+        if OID_SYSUPTIME not in request_oids:
+            request_oids.append(OID_SYSUPTIME)
+        values = self.get_from_host(host, request_oids, token)
+        rates = self.rates.update(key=(host.address, host.port_number),
+                                  values=values,
+                                  timestamp=monotonic())
+        return values, rates
+
+    def get_backend(self, protocol):
+        """Return the backend to use for the requested protocol"""
+        backend = preferences.get(preferences.SNMP_BACKEND)
+        if backend == BACKEND_NETSNMP or protocol not in INTERNAL_PROTOCOLS:
+            # The net-snmp tools are also used for the TCP transport
+            return BACKEND_NETSNMP
+        else:
+            return BACKEND_INTERNAL
+
+    def get_host_state(self, host):
+        """Return the reachability state for a HostInfo object"""
+        return self.breakers.get_state((host.address, host.port_number))
+
+    def get(self, protocol, address, port_number, version, community, oids,
+            token=None):
+        """Get many values for requested OIDs, identical requests already
+        in-flight are shared instead of being sent again.
+        If a CancellationToken is set, the request is abandoned as soon as
+        the token is cancelled raising SNMPCancelledException"""
+        key = (protocol, address, port_number, version, community,
+               frozenset(oids))
+        if token:
+            return self.coalescer.call_cancellable(
+                key=key,
+                function=lambda completed, request_token:
+                    self.get_async_direct(protocol=protocol,
+                                          address=address,
+                                          port_number=port_number,
+                                          version=version,
+                                          community=community,
+                                          oids=oids,
+                                          callback=completed,
+                                          token=request_token),
+                token=token)
+        return self.coalescer.call(
+            key=key,
+            function=lambda: self.get_direct(protocol=protocol,
+                                             address=address,
+                                             port_number=port_number,
+                                             version=version,
+                                             community=community,
+                                             oids=oids))
+
+    def get_direct(self, protocol, address, port_number, version, community,
+                   oids):
+        """Get many values for requested OIDs sending a new request"""
+        key = (address, port_number)
+        # Unreachable hosts fail without sending any request
+        self.breakers.check(key)
+        self.stats.started(key)
+        try:
+            if self.get_backend(protocol) == BACKEND_INTERNAL:
+                results = self.engine.get(protocol=protocol,
+                                          address=address,
+                                          port_number=port_number,
+                                          version=version,
+                                          community=community,
+                                          oids=oids)
+            else:
+                results = self.get_netsnmp(protocol=protocol,
+                                           address=address,
+                                           port_number=port_number,
+                                           version=version,
+                                           community=community,
+                                           oids=oids)
+        except SNMPException as error:
+            self.stats.finished(key, error)
+            if isinstance(error, SNMPTimeoutException):
+                self.breakers.failure(key)
+            raise
+        self.stats.finished(key)
+        self.breakers.success(key)
+        return results
+
+    def get_poller(self):
+        """Return the shared poller, starting it on the first use"""
+        if self.poller is None:
+            self.poller = SNMPPoller(batch_sizes=self.batch_sizes,
+                                     rtt=self.rtt,
+                                     stats=self.stats)
+            self.poller.start()
+        return self.poller
+
+    def get_async(self, protocol, address, port_number, version, community,
+                  oids, callback):
+        """Get many values for requested OIDs without waiting the results.
+        The callback will be called from another thread with the results
+        dictionary and an SNMPException or None. Identical requests already
+        in-flight are shared instead of being sent again"""
+        self.coalescer.call_async(
+            key=(protocol, address, port_number, version, community,
+                 frozenset(oids)),
+            function=lambda completed: self.get_async_direct(
+                protocol=protocol,
+                address=address,
+                port_number=port_number,
+                version=version,
+                community=community,
+                oids=oids,
+                callback=completed),
+            callback=callback)
+
+    def get_async_direct(self, protocol, address, port_number, version,
+                         community, oids, callback, token=None):
+        """Get many values for requested OIDs sending a new request without
+        waiting the results. The running snmpget processes are killed if
+        the token is cancelled"""
+        key = (address, port_number)
+        try:
+            # Unreachable hosts fail without sending any request
+            self.breakers.check(key)
+        except SNMPUnreachableException as error:
+            callback({}, error)
+            return
+        self.stats.started(key)
+
+        def completed(results, error):
+            """Report the outcome to the circuit breaker"""
+            self.stats.finished(key, error)
+            if isinstance(error, SNMPTimeoutException):
+                self.breakers.failure(key)
+            elif error is None:
+                self.breakers.success(key)
+            callback(results, error)
+
+        if self.get_backend(protocol) == BACKEND_INTERNAL:
+            self.get_poller().get(protocol=protocol,
+                                  address=address,
+                                  port_number=port_number,
+                                  version=version,
+                                  community=community,
+                                  oids=oids,
+                                  callback=completed)
+        else:
+            def worker():
+                """Get the values using snmpget in a new thread"""
+                results = {}
+                error = SNMPException('Request not completed')
+                try:
+                    results = self.get_netsnmp(protocol=protocol,
+                                               address=address,
+                                               port_number=port_number,
+                                               version=version,
+                                               community=community,
+                                               oids=oids,
+                                               token=token)
+                    error = None
+                except SNMPException as exception:
+                    error = exception
+                except Exception as exception:
+                    error = SNMPException(str(exception))
+                finally:
+                    # Never leave the coalesced requests waiting
+                    completed(results, error)
+            thread = threading.Thread(target=worker)
+            thread.daemon = True
+            thread.start()
+
+    def get_from_host_async(self, host, oids, callback):
+        """Get many values for requested OIDs for a HostInfo object without
+        waiting the results"""
+        return self.get_async(protocol=host.protocol.lower(),
+                              address=host.address,
+                              port_number=host.port_number,
+                              version=host.version,
+                              community=host.community,
+                              oids=oids,
+                              callback=callback)
+
+    def stop(self):
+        """Stop the running poller"""
+        if self.poller:
+            self.poller.stop()
+            self.poller = None
+
+    def get_netsnmp(self, protocol, address, port_number, version, community,
+                    oids, token=None):
+        """Get many values for requested OIDs using snmpget, splitting them
+        in many requests when they don't fit in a single response"""
+        key = (address, port_number)
+        results = {}
+        batches = split_oids(oids, self.batch_sizes.get(key,
+                                                        DEFAULT_BATCH_SIZE))
+        while batches:
+            batch = batches.pop(0)
+            try:
+                results.update(self.get_netsnmp_batch(
+                    protocol=protocol,
+                    address=address,
+                    port_number=port_number,
+                    version=version,
+                    community=community,
+                    oids=batch,
+                    token=token))
+            except SNMPException as error:
+                if '(tooBig)' not in str(error.value) or len(batch) < 2:
+                    raise
+                # Split the batch and remember the smaller size
+                half = len(batch) // 2
+                self.batch_sizes[key] = min(
+                    half, self.batch_sizes.get(key, DEFAULT_BATCH_SIZE))
+                batches[0:0] = [batch[:half], batch[half:]]
+        return results
+
+    def get_netsnmp_batch(self, protocol, address, port_number, version,
+                          community, oids, token=None):
+        """Get many values for requested OIDs using a single snmpget"""
+        if token and token.cancelled:
+            raise SNMPCancelledException('Request cancelled')
+        timeout, retries = self.rtt.get_timeout((address, port_number))
         arguments = ['snmpget',
                      '-v1' if version == 1 else '-v2c',
                      '-c', community,
                      '-O', 'n',
-                     '-t', '1.0',
+                     '-t', '%.2f' % timeout,
+                     '-r', str(retries),
                      '%s:%s:%d' % (protocol, address, port_number),
                      ]
         results = {}
         for oid in oids:
             arguments.append(oid)
             results[oid] = ''
+        key = (address, port_number)
+        started = monotonic()
         process = subprocess.Popen(args=arguments,
                                    stdout=subprocess.PIPE,
                                    stderr=subprocess.PIPE)
+        spawned = monotonic()
+        self.stats.add(key, PHASE_SEND, spawned - started)
+
+        def kill():
+            """Kill the running process when the request is cancelled"""
+            try:
+                process.kill()
+            except OSError:
+                # The process was already terminated
+                pass
+        if token:
+            token.register(kill)
         stdout, stderr = process.communicate()
+        received = monotonic()
+        self.stats.add(key, PHASE_RTT, received - spawned)
+        if token:
+            token.unregister(kill)
+            if token.cancelled:
+                raise SNMPCancelledException('Request cancelled')
         # Check returning values
-        if stderr:
+        if stderr.startswith(TIMEOUT_MESSAGE):
+            # No response raises an exception
+            raise SNMPTimeoutException(stderr)
+        elif stderr:
             # Errors in stderr are always raised
             raise SNMPException(stderr)
-        elif stdout.startswith('Timeout: No Response from'):
+        elif stdout.startswith(TIMEOUT_MESSAGE):
             # No response raises an exception
-            raise SNMPException(stdout)
+            raise SNMPTimeoutException(stdout)
         elif not stdout:
             # An empty reply raises an exception
             raise SNMPException('Empty reply in SNMP request')
         else:
             # We have some data to process
-            for line in stdout.split('\n'):
-                # Skip empty lines
-                if line:
-                    (oid, value) = line.split(' = ', 1)
-                    if ': ' not in value:
-                        print 'wrong data for oid %s' % oid
-                    results[oid] = self.parse_value(value)
+            for oid, value in iter_varbinds(stdout.split('\n')):
+                if oid is not None:
+                    results[oid] = parse_value(value)
+            self.stats.add(key, PHASE_PARSE, monotonic() - received)
             return results
 
-    def parse_value(self, data):
-        """Parse a returned value from snmpget"""
-        if ': ' not in data:
-            # Message lacking the separator are always treated like strings
-            data = 'STRING: %s' % data
-        # Get data type and value for the response
-        datatype, value = data.split(': ', 1)
-        # Check data types
-        if datatype == 'STRING':
-            if value.startswith('"') and value.endswith('"'):
-                # Strip quotes
-                value = value[1:-1]
-        elif datatype in ('INTEGER', 'Counter32', 'IpAddress', 'OID'):
-            # No conversion needed
-            pass
-        elif datatype == 'Hex-STRING':
-            # Convert Hex string to string
-            value = str(bytearray.fromhex(value))
-        elif datatype == 'Timeticks':
-            # Skip the number of timeticks as the full time follows
-            value = value.split(') ')[1]
+    def walk(self, protocol, address, port_number, version, community, oid,
+             max_repetitions=0):
+        """Walk the subtree of an OID yielding the (oid, value) tuples as
+        they are received"""
+        key = (address, port_number)
+        # Unreachable hosts fail without sending any request
+        self.breakers.check(key)
+        if self.get_backend(protocol) == BACKEND_INTERNAL:
+            rows = self.engine.walk(protocol=protocol,
+                                    address=address,
+                                    port_number=port_number,
+                                    version=version,
+                                    community=community,
+                                    oid=oid,
+                                    max_repetitions=max_repetitions)
         else:
-            # An unexpected data type was found
-            print 'Unexpected data type: %s' % datatype
-        return value
+            rows = self.walk_netsnmp(protocol=protocol,
+                                     address=address,
+                                     port_number=port_number,
+                                     version=version,
+                                     community=community,
+                                     oid=oid,
+                                     max_repetitions=max_repetitions)
+        return self.track_rows(key, rows)
+
+    def track_rows(self, key, rows):
+        """Report the outcome of a walk to the circuit breaker"""
+        try:
+            for row in rows:
+                yield row
+        except SNMPTimeoutException:
+            self.breakers.failure(key)
+            raise
+        self.breakers.success(key)
+
+    def bulkwalk(self, protocol, address, port_number, version, community,
+                 oid, max_repetitions=10):
+        """Walk the subtree of an OID using GETBULK requests"""
+        return self.walk(protocol=protocol,
+                         address=address,
+                         port_number=port_number,
+                         version=version,
+                         community=community,
+                         oid=oid,
+                         max_repetitions=max_repetitions)
+
+    def walk_from_host(self, host, oid, max_repetitions=10):
+        """Walk the subtree of an OID for a HostInfo object"""
+        return self.walk(protocol=host.protocol.lower(),
+                         address=host.address,
+                         port_number=host.port_number,
+                         version=host.version,
+                         community=host.community,
+                         oid=oid,
+                         max_repetitions=max_repetitions)
+
+    def walk_netsnmp(self, protocol, address, port_number, version,
+                     community, oid, max_repetitions=0):
+        """Walk the subtree of an OID using snmpwalk or snmpbulkwalk"""
+        use_bulk = version != 1 and max_repetitions > 0
+        timeout, retries = self.rtt.get_timeout((address, port_number))
+        arguments = ['snmpbulkwalk' if use_bulk else 'snmpwalk',
+                     '-v1' if version == 1 else '-v2c',
+                     '-c', community,
+                     '-O', 'n',
+                     '-t', '%.2f' % timeout,
+                     '-r', str(retries),
+                     ]
+        if use_bulk:
+            arguments.append('-Cr%d' % max_repetitions)
+        arguments.append('%s:%s:%d' % (protocol, address, port_number))
+        arguments.append(oid)
+        process = subprocess.Popen(args=arguments,
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE)
+        # Stream every value as soon as it's printed
+        for value_oid, value in iter_varbinds(
+                iter(process.stdout.readline, '')):
+            if value_oid is not None:
+                # Skip the SNMPv2 exceptions for an empty subtree
+                if not value.startswith(('No Such ', 'No more variables')):
+                    yield value_oid, parse_value(value)
+            elif value.startswith(TIMEOUT_MESSAGE):
+                process.wait()
+                raise SNMPTimeoutException(value)
+        stderr = process.stderr.read()
+        process.wait()
+        if stderr.startswith(TIMEOUT_MESSAGE):
+            # No response raises an exception
+            raise SNMPTimeoutException(stderr)
+        elif stderr:
+            # Errors in stderr are always raised
+            raise SNMPException(stderr)
+
+    def parse_value(self, data):
+        """Parse a returned value from snmpget to a typed value"""
+        return parse_value(data)
@@ -0,0 +1,114 @@
+##
+#     Project: gLiveSNMP
+# Description: Detect information on various devices via SNMP
+#      Author: Fabio Castelli (Muflone) <muflone@vbsimple.net>
+#   Copyright: 2016 Fabio Castelli
+#     License: GPL-2+
+#  This program is free software; you can redistribute it and/or modify it
+#  under the terms of the GNU General Public License as published by the Free
+#  Software Foundation; either version 2 of the License, or (at your option)
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful, but WITHOUT
+#  ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+#  FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+#  more details.
+#  You should have received a copy of the GNU General Public License along
+#  with this program; if not, write to the Free Software Foundation, Inc.,
+#  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+##
+
+import random
+import threading
+import time
+
+from glivesnmp.snmp_exception import SNMPUnreachableException
+
+# The host is working and the requests are sent
+STATE_CLOSED = 'reachable'
+# The host is unreachable and the requests fail without being sent
+STATE_OPEN = 'unreachable'
+# A single probe request is allowed to check the host again
+STATE_HALF_OPEN = 'probing'
+
+# Consecutive failures before considering a host unreachable
+FAILURES_THRESHOLD = 3
+# Bounds for the backoff before probing an unreachable host
+MIN_BACKOFF = 5.0
+MAX_BACKOFF = 300.0
+
+
+class CircuitBreaker(object):
+    def __init__(self):
+        """Circuit breaker for a single host"""
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.openings = 0
+        self.retry_time = 0
+
+    def allow(self, now):
+        """Check if a request can be sent to the host"""
+        if self.state == STATE_CLOSED:
+            return True
+        elif now >= self.retry_time:
+            # Allow a single probe, another one will be allowed only if
+            # this one will never complete
+            self.state = STATE_HALF_OPEN
+            self.retry_time = now + MAX_BACKOFF
+            return True
+        return False
+
+    def success(self):
+        """A request was completed, the host is reachable"""
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.openings = 0
+
+    def failure(self, now):
+        """A request has failed, back off the host exponentially after too
+        many consecutive failures or after a failed probe"""
+        self.failures += 1
+        if self.state == STATE_HALF_OPEN or \
+                self.failures >= FAILURES_THRESHOLD:
+            self.state = STATE_OPEN
+            backoff = min(MAX_BACKOFF,
+                          MIN_BACKOFF * (2 ** min(self.openings, 16)))
+            # Add some jitter to avoid probing many hosts at once
+            self.retry_time = now + backoff * random.uniform(0.9, 1.1)
+            self.openings += 1
+
+
+class CircuitBreakers(object):
+    def __init__(self):
+        """Circuit breakers for every host"""
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    def check(self, key):
+        """Raise an SNMPUnreachableException if a request cannot be sent
+        to the host"""
+        with self.lock:
+            breaker = self.hosts.get(key)
+            if breaker and not breaker.allow(time.time()):
+                raise SNMPUnreachableException(
+                    'Host %s:%d is unreachable, next probe in %d seconds' % (
+                        key[0], key[1], breaker.retry_time - time.time()))
+
+    def success(self, key):
+        """Report a completed request for the host"""
+        with self.lock:
+            if key in self.hosts:
+                self.hosts[key].success()
+
+    def failure(self, key):
+        """Report a failed request for the host"""
+        with self.lock:
+            if key not in self.hosts:
+                self.hosts[key] = CircuitBreaker()
+            self.hosts[key].failure(time.time())
+
+    def get_state(self, key):
+        """Return the state of the host"""
+        with self.lock:
+            breaker = self.hosts.get(key)
+            return breaker.state if breaker else STATE_CLOSED
@@ -0,0 +1,146 @@
+##
+#     Project: gLiveSNMP
+# Description: Detect information on various devices via SNMP
+#      Author: Fabio Castelli (Muflone) <muflone@vbsimple.net>
+#   Copyright: 2016 Fabio Castelli
+#     License: GPL-2+
+#  This program is free software; you can redistribute it and/or modify it
+#  under the terms of the GNU General Public License as published by the Free
+#  Software Foundation; either version 2 of the License, or (at your option)
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful, but WITHOUT
+#  ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+#  FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+#  more details.
+#  You should have received a copy of the GNU General Public License along
+#  with this program; if not, write to the Free Software Foundation, Inc.,
+#  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+##
+
+import threading
+
+from glivesnmp.snmp_exception import SNMPException, SNMPCancelledException
+from glivesnmp.worker_pool import CancellationToken
+
+
+class InFlightRequest(object):
+    def __init__(self):
+        """A request shared by many subscribers"""
+        self.event = threading.Event()
+        self.results = None
+        self.error = None
+        self.callbacks = []
+        self.subscribers = 0
+        # Cancelled when every subscriber abandons the request
+        self.token = CancellationToken()
+
+
+class RequestCoalescer(object):
+    def __init__(self):
+        """Merge the concurrent identical requests in a single request
+        and fan out the results to every subscriber"""
+        self.requests = {}
+        self.lock = threading.Lock()
+        self.coalesced = 0
+
+    def subscribe(self, key, callback=None):
+        """Subscribe to the in-flight request for the key, returning the
+        request and True if a new request must be sent"""
+        with self.lock:
+            request = self.requests.get(key)
+            if request is None:
+                request = InFlightRequest()
+                self.requests[key] = request
+                owner = True
+            else:
+                self.coalesced += 1
+                owner = False
+            request.subscribers += 1
+            if callback:
+                request.callbacks.append(callback)
+        return request, owner
+
+    def unsubscribe(self, key, request, callback):
+        """Abandon an in-flight request, cancelling it when there are no
+        more subscribers"""
+        with self.lock:
+            if callback in request.callbacks:
+                request.callbacks.remove(callback)
+            request.subscribers -= 1
+            abandoned = request.subscribers == 0
+            if abandoned and self.requests.get(key) is request:
+                # Identical new requests will be sent again
+                self.requests.pop(key)
+        if abandoned:
+            request.token.cancel()
+
+    def complete(self, key, request, results, error):
+        """Complete the in-flight request and notify every subscriber"""
+        with self.lock:
+            if self.requests.get(key) is request:
+                self.requests.pop(key)
+            callbacks = list(request.callbacks)
+        request.results = results
+        request.error = error
+        request.event.set()
+        for callback in callbacks:
+            # Every subscriber gets its own copy of the results
+            callback(dict(results), error)
+
+    def call(self, key, function):
+        """Call the function or wait for the results of an identical
+        request already in-flight"""
+        request, owner = self.subscribe(key)
+        if owner:
+            try:
+                results = function()
+            except SNMPException as error:
+                self.complete(key, request, {}, error)
+            except Exception as error:
+                # Never leave the other subscribers waiting
+                self.complete(key, request, {}, SNMPException(str(error)))
+                raise
+            else:
+                self.complete(key, request, results, None)
+        else:
+            request.event.wait()
+        if request.error:
+            raise request.error
+        return dict(request.results)
+
+    def call_async(self, key, function, callback):
+        """Call the function with a callback or subscribe the callback to
+        an identical request already in-flight"""
+        request, owner = self.subscribe(key, callback)
+        if owner:
+            function(lambda results, error: self.complete(key, request,
+                                                          results, error))
+
+    def call_cancellable(self, key, function, token):
+        """Call the function with a callback and the request token or
+        subscribe to an identical request already in-flight, waiting the
+        results until the token is cancelled"""
+        event = threading.Event()
+        outcome = []
+
+        def completed(results, error):
+            """Keep the results and wake up the waiting thread"""
+            outcome.append((results, error))
+            event.set()
+        request, owner = self.subscribe(key, completed)
+        if owner:
+            function(lambda results, error: self.complete(key, request,
+                                                          results, error),
+                     request.token)
+        if not token.wait(event) and not outcome:
+            self.unsubscribe(key, request, completed)
+            raise SNMPCancelledException('Request cancelled')
+        results, error = outcome[0]
+        if error:
+            raise error
+        return results
+
+    def count(self):
+        """Return the number of the in-flight requests"""
+        return len(self.requests)
@@ -0,0 +1,262 @@
+##
+#     Project: gLiveSNMP
+# Description: Detect information on various devices via SNMP
+#      Author: Fabio Castelli (Muflone) <muflone@vbsimple.net>
+#   Copyright: 2016 Fabio Castelli
+#     License: GPL-2+
+#  This program is free software; you can redistribute it and/or modify it
+#  under the terms of the GNU General Public License as published by the Free
+#  Software Foundation; either version 2 of the License, or (at your option)
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful, but WITHOUT
+#  ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+#  FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+#  more details.
+#  You should have received a copy of the GNU General Public License along
+#  with this program; if not, write to the Free Software Foundation, Inc.,
+#  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+##
+
+import itertools
+import random
+import select
+import socket
+import threading
+
+import glivesnmp.ber as ber
+from glivesnmp.clock import monotonic
+from glivesnmp.snmp_exception import SNMPException, SNMPTimeoutException
+from glivesnmp.snmp_rtt import get_backoff
+from glivesnmp.snmp_stats import PHASE_SEND, PHASE_RTT, PHASE_PARSE
+from glivesnmp.snmp_types import from_ber
+
+MAX_PACKET_SIZE = 65535
+# Varbinds per request until an agent reports a tooBig error
+DEFAULT_BATCH_SIZE = 50
+# Maximum size for the varbinds of a request to avoid IP fragmentation
+MAX_REQUEST_SIZE = 1400
+
+
+def resolve(protocol, address, port_number):
+    """Resolve the address to the socket family and address"""
+    family = socket.AF_INET6 if protocol == 'udp6' else socket.AF_UNSPEC
+    try:
+        info = socket.getaddrinfo(address, port_number, family,
+                                  socket.SOCK_DGRAM)
+    except socket.gaierror as error:
+        raise SNMPException('Unknown host (%s): %s' % (address, error))
+    return info[0][0], info[0][4]
+
+
+def error_message(error_status, error_index, oids):
+    """Return the message for an error status in a response"""
+    return 'Error in packet\nReason: (%s)\nFailed object: %s' % (
+        ber.ERROR_STATUS_NAMES[error_status]
+        if error_status < len(ber.ERROR_STATUS_NAMES) else error_status,
+        oids[error_index - 1] if 0 < error_index <= len(oids) else '')
+
+
+def split_oids(oids, batch_size):
+    """Plan the requests for many OIDs in batches of batch_size varbinds
+    without exceeding the maximum request size"""
+    batches = []
+    batch = []
+    size = 0
+    for oid in oids:
+        # Encoded OID plus the NULL value and the varbind sequence header
+        oid_size = len(ber.encode_oid(oid)) + 4
+        if batch and (len(batch) >= batch_size or
+                      size + oid_size > MAX_REQUEST_SIZE):
+            batches.append(batch)
+            batch = []
+            size = 0
+        batch.append(oid)
+        size += oid_size
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def oid_to_tuple(oid):
+    """Return the arcs of a numeric OID to compare them"""
+    return tuple(int(arc) for arc in oid.strip('.').split('.'))
+
+
+def process_response(response, oids):
+    """Return the values from a decoded GET response"""
+    results = {}
+    for oid in oids:
+        results[oid] = ''
+    error_status, error_index, varbinds = response[4:]
+    if error_status:
+        # Errors in the response are always raised
+        raise SNMPException(error_message(error_status, error_index, oids))
+    for oid, tag, value in varbinds:
+        results[oid] = from_ber(tag, value)
+    return results
+
+
+def timeout_message(protocol, address, port_number):
+    """Return the message for a request without response"""
+    return 'Timeout: No Response from %s:%s:%d.' % (protocol, address,
+                                                    port_number)
+
+
+class SNMPEngine(object):
+    def __init__(self, timeout=1.0, retries=5, batch_sizes=None, rtt=None,
+                 stats=None):
+        """In-process SNMP v1/v2c engine over UDP. If the RTTStatistics
+        are set the timeout and the retries are computed for every host
+        from the measured round trip times. If the PollerStatistics are
+        set the timings of every phase are recorded"""
+        self.timeout = timeout
+        self.retries = retries
+        self.rtt = rtt
+        self.stats = stats
+        # Working number of varbinds per request for every host
+        self.batch_sizes = {} if batch_sizes is None else batch_sizes
+        self.request_ids = itertools.count(random.randint(1, 0x3FFFFFFF))
+        self.lock = threading.Lock()
+
+    def next_request_id(self):
+        """Return a new request id for a message"""
+        with self.lock:
+            return next(self.request_ids) & 0x7FFFFFFF
+
+    def request(self, protocol, address, port_number, version, community,
+                pdu_type, oids, non_repeaters=0, max_repetitions=0):
+        """Send a request PDU and wait for the matching response"""
+        family, sockaddr = resolve(protocol, address, port_number)
+        key = (address, port_number)
+        if self.rtt:
+            timeout, retries = self.rtt.get_timeout(key)
+        else:
+            timeout, retries = self.timeout, self.retries
+        # Every attempt uses a new request id to know which one was answered
+        sent = {}
+        sock = socket.socket(family, socket.SOCK_DGRAM)
+        try:
+            for attempt in range(retries + 1):
+                started = monotonic()
+                request_id = self.next_request_id()
+                message = ber.encode_request(
+                    version=0 if version == 1 else 1,
+                    community=community,
+                    pdu_type=pdu_type,
+                    request_id=request_id,
+                    oids=oids,
+                    non_repeaters=non_repeaters,
+                    max_repetitions=max_repetitions)
+                sock.sendto(message, sockaddr)
+                sent[request_id] = monotonic()
+                if self.stats and attempt == 0:
+                    self.stats.add(key, PHASE_SEND,
+                                   sent[request_id] - started)
+                wait = get_backoff(timeout, attempt) if self.rtt else timeout
+                deadline = sent[request_id] + wait
+                remaining = wait
+                while remaining > 0:
+                    if not select.select([sock], [], [], remaining)[0]:
+                        break
+                    data = sock.recv(MAX_PACKET_SIZE)
+                    received = monotonic()
+                    remaining = deadline - received
+                    try:
+                        response = ber.decode_message(data)
+                    except ber.BERException:
+                        # Skip malformed packets
+                        continue
+                    # Late replies to the previous attempts are accepted
+                    if (response[2] == ber.PDU_RESPONSE and
+                            response[3] in sent):
+                        if self.rtt:
+                            self.rtt.add_sample(key,
+                                                received - sent[response[3]])
+                        if self.stats:
+                            self.stats.add(key, PHASE_RTT,
+                                           received - sent[response[3]])
+                            self.stats.add(key, PHASE_PARSE,
+                                           monotonic() - received)
+                        return response
+        finally:
+            sock.close()
+        raise SNMPTimeoutException(timeout_message(protocol, address,
+                                                   port_number))
+
+    def get(self, protocol, address, port_number, version, community, oids):
+        """Get many values for requested OIDs, splitting them in many
+        requests when they don't fit in a single response"""
+        key = (address, port_number)
+        results = {}
+        batches = split_oids(oids, self.batch_sizes.get(key,
+                                                        DEFAULT_BATCH_SIZE))
+        while batches:
+            batch = batches.pop(0)
+            response = self.request(protocol=protocol,
+                                    address=address,
+                                    port_number=port_number,
+                                    version=version,
+                                    community=community,
+                                    pdu_type=ber.PDU_GET,
+                                    oids=batch)
+            if response[4] == ber.ERROR_TOO_BIG and len(batch) > 1:
+                # Split the batch and remember the smaller size
+                half = len(batch) // 2
+                self.batch_sizes[key] = min(
+                    half, self.batch_sizes.get(key, DEFAULT_BATCH_SIZE))
+                batches[0:0] = [batch[:half], batch[half:]]
+            else:
+                results.update(process_response(response, batch))
+        return results
+
+    def walk(self, protocol, address, port_number, version, community, oid,
+             max_repetitions=0):
+        """Walk the subtree of an OID yielding the (oid, value) tuples as
+        soon as every response arrives. GETBULK is used for SNMPv2c when
+        max_repetitions is set, else a GETNEXT is sent for every row"""
+        root = '.' + oid.strip('.')
+        current = root
+        last = oid_to_tuple(root)
+        use_bulk = version != 1 and max_repetitions > 0
+        while True:
+            response = self.request(
+                protocol=protocol,
+                address=address,
+                port_number=port_number,
+                version=version,
+                community=community,
+                pdu_type=ber.PDU_GET_BULK if use_bulk else ber.PDU_GET_NEXT,
+                oids=[current],
+                max_repetitions=max_repetitions if use_bulk else 0)
+            error_status, error_index, varbinds = response[4:]
+            if error_status == ber.ERROR_NO_SUCH_NAME and version == 1:
+                # SNMPv1 agents report the end of the MIB view this way
+                return
+            elif error_status:
+                raise SNMPException(error_message(error_status, error_index,
+                                                  [current]))
+            elif not varbinds:
+                return
+            for next_oid, tag, value in varbinds:
+                if (tag == ber.TAG_END_OF_MIB_VIEW or
+                        not next_oid.startswith(root + '.')):
+                    # The subtree was completely walked
+                    return
+                elif oid_to_tuple(next_oid) <= last:
+                    raise SNMPException('Error: OID not increasing: %s' %
+                                        next_oid)
+                yield next_oid, from_ber(tag, value)
+                current = next_oid
+                last = oid_to_tuple(next_oid)
+
+    def bulkwalk(self, protocol, address, port_number, version, community,
+                 oid, max_repetitions=10):
+        """Walk the subtree of an OID using GETBULK requests"""
+        return self.walk(protocol=protocol,
+                         address=address,
+                         port_number=port_number,
+                         version=version,
+                         community=community,
+                         oid=oid,
+                         max_repetitions=max_repetitions)
@@ -26,3 +26,20 @@ class SNMPException(Exception):
 
     def __str__(self):
         return repr(self.value)
+
+
+class SNMPTimeoutException(SNMPException):
+    """An exception raised when a host doesn't reply to a request"""
+    pass
+
+
+class SNMPUnreachableException(SNMPException):
+    """An exception raised without sending any request when a host is
+    considered unreachable after too many failures"""
+    pass
+
+
+class SNMPCancelledException(SNMPException):
+    """An exception raised when a request is cancelled before its results
+    are received"""
+    pass
@@ -0,0 +1,346 @@
+##
+#     Project: gLiveSNMP
+# Description: Detect information on various devices via SNMP
+#      Author: Fabio Castelli (Muflone) <muflone@vbsimple.net>
+#   Copyright: 2016 Fabio Castelli
+#     License: GPL-2+
+#  This program is free software; you can redistribute it and/or modify it
+#  under the terms of the GNU General Public License as published by the Free
+#  Software Foundation; either version 2 of the License, or (at your option)
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful, but WITHOUT
+#  ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+#  FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+#  more details.
+#  You should have received a copy of the GNU General Public License along
+#  with this program; if not, write to the Free Software Foundation, Inc.,
+#  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+##
+
+import collections
+import errno
+import fcntl
+import heapq
+import itertools
+import os
+import random
+import select
+import socket
+import threading
+
+import glivesnmp.ber as ber
+from glivesnmp.clock import monotonic
+from glivesnmp.snmp_engine import (
+    DEFAULT_BATCH_SIZE, MAX_PACKET_SIZE,
+    resolve, process_response, split_oids, timeout_message)
+from glivesnmp.snmp_exception import SNMPException, SNMPTimeoutException
+from glivesnmp.snmp_rtt import get_backoff
+from glivesnmp.snmp_stats import (
+    PHASE_QUEUE, PHASE_SEND, PHASE_RTT, PHASE_PARSE)
+
+# Size of the receive buffer to hold the burst of replies
+RECEIVE_BUFFER_SIZE = 4 * 1024 * 1024
+
+
+class RequestGroup(object):
+    def __init__(self, oids, callback, count):
+        """The requests planned for the OIDs of a single get"""
+        self.results = {}
+        for oid in oids:
+            self.results[oid] = ''
+        self.callback = callback
+        self.remaining = count
+        self.error = None
+
+    def complete(self, results, error):
+        """Collect the results of a request and call the callback when
+        every request is completed"""
+        self.results.update(results)
+        self.error = self.error or error
+        self.remaining -= 1
+        if self.remaining == 0:
+            self.callback({} if self.error else self.results, self.error)
+
+
+class PendingRequest(object):
+    def __init__(self, request_id, family, sockaddr, version, community,
+                 oids, group, timeout, retries, key, description):
+        """A request waiting for its response"""
+        self.request_id = request_id
+        self.family = family
+        self.sockaddr = sockaddr
+        self.version = version
+        self.community = community
+        self.message = ber.encode_request(version=version,
+                                          community=community,
+                                          pdu_type=ber.PDU_GET,
+                                          request_id=request_id,
+                                          oids=oids)
+        self.oids = oids
+        self.group = group
+        self.timeout = timeout
+        self.retries = retries
+        self.key = key
+        self.description = description
+        self.attempt = 0
+        self.queued = monotonic()
+        self.sent = 0
+
+
+class SNMPPoller(threading.Thread):
+    def __init__(self, timeout=1.0, retries=5, max_outstanding=4096,
+                 batch_sizes=None, rtt=None, stats=None):
+        """Multiplexed SNMP poller sharing a single UDP socket per address
+        family for every request. Replies are matched to their requests
+        by request-id and the results are delivered through callbacks
+        called from the poller thread. If the RTTStatistics are set the
+        timeout and the retries are computed for every host from the
+        measured round trip times. If the PollerStatistics are set the
+        timings of every phase are recorded."""
+        super(self.__class__, self).__init__(name='SNMPPoller')
+        self.daemon = True
+        self.timeout = timeout
+        self.retries = retries
+        self.max_outstanding = max_outstanding
+        # Working number of varbinds per request for every host
+        self.batch_sizes = {} if batch_sizes is None else batch_sizes
+        self.rtt = rtt
+        self.stats = stats
+        self.request_ids = itertools.count(random.randint(1, 0x3FFFFFFF))
+        self.lock = threading.Lock()
+        # Requests waiting to be sent
+        self.queue = collections.deque()
+        # Requests sent and waiting for a response by request-id
+        self.pending = {}
+        # Heap of (deadline, request_id, attempt) for the timeouts
+        self.deadlines = []
+        self.sockets = {}
+        self.stopped = False
+        # Pipe used to wake up the poller thread for new requests
+        self.wakeup_read, self.wakeup_write = os.pipe()
+        fcntl.fcntl(self.wakeup_write, fcntl.F_SETFL,
+                    fcntl.fcntl(self.wakeup_write, fcntl.F_GETFL) |
+                    os.O_NONBLOCK)
+
+    def next_request_id(self):
+        """Return a new request id for a message"""
+        with self.lock:
+            return next(self.request_ids) & 0x7FFFFFFF
+
+    def get_socket(self, family):
+        """Return the non-blocking socket for the address family"""
+        if family not in self.sockets:
+            sock = socket.socket(family, socket.SOCK_DGRAM)
+            sock.setblocking(False)
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF,
+                                RECEIVE_BUFFER_SIZE)
+            except socket.error:
+                # Keep the default buffer size
+                pass
+            self.sockets[family] = sock
+        return self.sockets[family]
+
+    def get(self, protocol, address, port_number, version, community, oids,
+            callback, timeout=None, retries=None):
+        """Queue a request for many OIDs, the callback will be called with
+        the results dictionary and an SNMPException or None"""
+        try:
+            family, sockaddr = resolve(protocol, address, port_number)
+        except SNMPException as error:
+            callback({}, error)
+            return None
+        key = (address, port_number)
+        if timeout is None and retries is None and self.rtt:
+            timeout, retries = self.rtt.get_timeout(key)
+        batches = split_oids(oids, self.batch_sizes.get(key,
+                                                        DEFAULT_BATCH_SIZE))
+        group = RequestGroup(oids, callback, len(batches))
+        if not batches:
+            callback({}, None)
+        for batch in batches:
+            self.queue.append(PendingRequest(
+                request_id=self.next_request_id(),
+                family=family,
+                sockaddr=sockaddr,
+                version=0 if version == 1 else 1,
+                community=community,
+                oids=batch,
+                group=group,
+                timeout=self.timeout if timeout is None else timeout,
+                retries=self.retries if retries is None else retries,
+                key=key,
+                description=timeout_message(protocol, address,
+                                            port_number)))
+        self.wakeup()
+        return group
+
+    def get_from_host(self, host, oids, callback):
+        """Queue a request for many OIDs for a HostInfo object"""
+        return self.get(protocol=host.protocol.lower(),
+                        address=host.address,
+                        port_number=host.port_number,
+                        version=host.version,
+                        community=host.community,
+                        oids=oids,
+                        callback=callback)
+
+    def count_outstanding(self):
+        """Return the number of requests queued or waiting a response"""
+        return len(self.queue) + len(self.pending)
+
+    def wakeup(self):
+        """Wake up the poller thread"""
+        try:
+            os.write(self.wakeup_write, b'.')
+        except OSError:
+            # The pipe is already full of wake up requests
+            pass
+
+    def stop(self):
+        """Stop the poller thread"""
+        self.stopped = True
+        self.wakeup()
+
+    def send(self, request):
+        """Send (or send again) a request and schedule its timeout"""
+        started = monotonic()
+        try:
+            self.get_socket(request.family).sendto(request.message,
+                                                   request.sockaddr)
+        except socket.error as error:
+            if error.errno not in (errno.EAGAIN, errno.ENOBUFS):
+                # A request sent again is still pending, its previous
+                # deadlines are skipped once it's removed
+                self.pending.pop(request.request_id, None)
+                self.complete(request, {}, SNMPException(str(error)))
+                return
+            # The send buffer is full, the request will be retried
+        request.sent = monotonic()
+        if self.stats and request.attempt == 0:
+            self.stats.add(request.key, PHASE_QUEUE,
+                           started - request.queued)
+            self.stats.add(request.key, PHASE_SEND, request.sent - started)
+        self.pending[request.request_id] = request
+        if self.rtt:
+            timeout = get_backoff(request.timeout, request.attempt)
+        else:
+            timeout = request.timeout
+        heapq.heappush(self.deadlines, (request.sent + timeout,
+                                        request.request_id,
+                                        request.attempt))
+
+    def send_queued(self):
+        """Send the queued requests up to the outstanding limit"""
+        while self.queue and len(self.pending) < self.max_outstanding:
+            self.send(self.queue.popleft())
+
+    def receive(self, sock):
+        """Read every available reply from the socket"""
+        while True:
+            try:
+                data, sockaddr = sock.recvfrom(MAX_PACKET_SIZE)
+            except socket.error as error:
+                if error.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                # Ignore ICMP errors reported on the socket
+                continue
+            received = monotonic()
+            try:
+                response = ber.decode_message(data)
+            except ber.BERException:
+                # Skip malformed packets
+                continue
+            request = self.pending.get(response[3])
+            # Skip unknown or late replies and replies from other hosts
+            if (request is None or response[2] != ber.PDU_RESPONSE or
+                    sockaddr[0] != request.sockaddr[0]):
+                continue
+            self.pending.pop(request.request_id)
+            if self.rtt and request.attempt == 0:
+                # Only the replies to the first attempt are unambiguous
+                self.rtt.add_sample(request.key, received - request.sent)
+            if self.stats and request.attempt == 0:
+                self.stats.add(request.key, PHASE_RTT,
+                               received - request.sent)
+            if response[4] == ber.ERROR_TOO_BIG and len(request.oids) > 1:
+                self.split(request)
+                continue
+            try:
+                results = process_response(response, request.oids)
+                error = None
+            except SNMPException as exception:
+                results = {}
+                error = exception
+            if self.stats:
+                self.stats.add(request.key, PHASE_PARSE,
+                               monotonic() - received)
+            self.complete(request, results, error)
+
+    def split(self, request):
+        """Split a request which response was too big in two requests and
+        remember the smaller size for the host"""
+        half = len(request.oids) // 2
+        self.batch_sizes[request.key] = min(
+            half, self.batch_sizes.get(request.key, DEFAULT_BATCH_SIZE))
+        request.group.remaining += 1
+        for batch in (request.oids[:half], request.oids[half:]):
+            self.queue.append(PendingRequest(
+                request_id=self.next_request_id(),
+                family=request.family,
+                sockaddr=request.sockaddr,
+                version=request.version,
+                community=request.community,
+                oids=batch,
+                group=request.group,
+                timeout=request.timeout,
+                retries=request.retries,
+                key=request.key,
+                description=request.description))
+
+    def check_timeouts(self):
+        """Resend or fail the expired requests"""
+        now = monotonic()
+        while self.deadlines and self.deadlines[0][0] <= now:
+            deadline, request_id, attempt = heapq.heappop(self.deadlines)
+            request = self.pending.get(request_id)
+            # Skip the requests already completed or sent again
+            if request is None or request.attempt != attempt:
+                continue
+            if request.attempt < request.retries:
+                request.attempt += 1
+                self.send(request)
+            else:
+                self.pending.pop(request_id)
+                self.complete(request, {},
+                              SNMPTimeoutException(request.description))
+
+    def complete(self, request, results, error):
+        """Deliver the results to the request callback"""
+        try:
+            request.group.complete(results, error)
+        except Exception as exception:
+            # A failing callback must not stop the poller
+            print 'Exception in poller callback: %s' % exception
+
+    def run(self):
+        """Process the requests until the poller is stopped"""
+        while not self.stopped:
+            self.send_queued()
+            if self.deadlines:
+                wait = max(0, self.deadlines[0][0] - monotonic())
+            else:
+                wait = None
+            readable = select.select(
+                [self.wakeup_read] + self.sockets.values(), [], [], wait)[0]
+            for item in readable:
+                if item == self.wakeup_read:
+                    os.read(self.wakeup_read, 4096)
+                else:
+                    self.receive(item)
+            self.check_timeouts()
+        for sock in self.sockets.values():
+            sock.close()
+        os.close(self.wakeup_read)
+        os.close(self.wakeup_write)
@@ -0,0 +1,94 @@
+##
+#     Project: gLiveSNMP
+# Description: Detect information on various devices via SNMP
+#      Author: Fabio Castelli (Muflone) <muflone@vbsimple.net>
+#   Copyright: 2016 Fabio Castelli
+#     License: GPL-2+
+#  This program is free software; you can redistribute it and/or modify it
+#  under the terms of the GNU General Public License as published by the Free
+#  Software Foundation; either version 2 of the License, or (at your option)
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful, but WITHOUT
+#  ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+#  FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+#  more details.
+#  You should have received a copy of the GNU General Public License along
+#  with this program; if not, write to the Free Software Foundation, Inc.,
+#  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+##
+
+from glivesnmp.snmp_types import Counter32, Counter64, Timeticks
+
+# sysUpTime.0 to detect the agent reboots
+OID_SYSUPTIME = '.1.3.6.1.2.1.1.3.0'
+# Timeticks wrap after about 497 days
+TIMETICKS_WRAP = 1 << 32
+
+
+class RateEngine(object):
+    def __init__(self):
+        """Per second rates for the counters of every host"""
+        # Previous (value, timestamp, boots) for every (host, oid)
+        self.samples = {}
+        # Last (uptime, timestamp, boots) for every host
+        self.uptimes = {}
+
+    def check_reboot(self, key, uptime, timestamp):
+        """Return the number of reboots detected for a host"""
+        previous = self.uptimes.get(key)
+        if previous is None:
+            boots = 0
+        else:
+            previous_uptime, previous_timestamp, boots = previous
+            if uptime < previous_uptime:
+                # The uptime went back because of a reboot, unless the
+                # expected uptime has just passed the timeticks wrap
+                expected = previous_uptime + int(
+                    (timestamp - previous_timestamp) * 100)
+                if expected < TIMETICKS_WRAP or \
+                        uptime > expected - TIMETICKS_WRAP + 100:
+                    boots += 1
+        self.uptimes[key] = (uptime, timestamp, boots)
+        return boots
+
+    def add_sample(self, key, oid, value, timestamp, boots=0):
+        """Add a counter sample and return its rate per second or None
+        if the rate cannot be computed yet"""
+        previous = self.samples.get((key, oid))
+        self.samples[(key, oid)] = (value, timestamp, boots)
+        if previous is None:
+            return None
+        previous_value, previous_timestamp, previous_boots = previous
+        elapsed = timestamp - previous_timestamp
+        if previous_boots != boots or elapsed <= 0:
+            # The counters were reset since the previous sample
+            return None
+        delta = value - previous_value
+        if delta < 0:
+            if value.width == 64:
+                # A Counter64 cannot wrap between two polls, the counter
+                # was reset
+                return None
+            delta += 1 << value.width
+        return delta / elapsed
+
+    def update(self, key, values, timestamp):
+        """Add the samples for the counters in the values dictionary and
+        return the dictionary with their rates"""
+        uptime = values.get(OID_SYSUPTIME)
+        boots = (self.check_reboot(key, uptime, timestamp)
+                 if isinstance(uptime, Timeticks) else 0)
+        rates = {}
+        for oid, value in values.iteritems():
+            if isinstance(value, (Counter32, Counter64)):
+                rates[oid] = self.add_sample(key, oid, value, timestamp,
+                                             boots)
+        return rates
+
+    def forget(self, key):
+        """Remove every sample for a host"""
+        self.uptimes.pop(key, None)
+        for sample_key in [sample_key for sample_key in self.samples.iterkeys()
+                           if sample_key[0] == key]:
+            del self.samples[sample_key]
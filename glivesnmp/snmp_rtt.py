@@ -0,0 +1,134 @@
+##
+#     Project: gLiveSNMP
+# Description: Detect information on various devices via SNMP
+#      Author: Fabio Castelli (Muflone) <muflone@vbsimple.net>
+#   Copyright: 2016 Fabio Castelli
+#     License: GPL-2+
+#  This program is free software; you can redistribute it and/or modify it
+#  under the terms of the GNU General Public License as published by the Free
+#  Software Foundation; either version 2 of the License, or (at your option)
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful, but WITHOUT
+#  ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+#  FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+#  more details.
+#  You should have received a copy of the GNU General Public License along
+#  with this program; if not, write to the Free Software Foundation, Inc.,
+#  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+##
+
+import json
+import threading
+
+# Bounds for the computed timeouts
+MIN_TIMEOUT = 0.2
+MAX_TIMEOUT = 10.0
+# Initial timeout for the hosts without samples
+INITIAL_TIMEOUT = 1.0
+# Total time to wait for a host before giving up
+MAX_TOTAL_WAIT = 6.0
+MIN_RETRIES = 1
+MAX_RETRIES = 5
+# Gains of the smoothed RTT and variance (RFC 6298)
+ALPHA = 0.125
+BETA = 0.25
+
+
+def get_backoff(timeout, attempt):
+    """Return the timeout for an attempt using exponential backoff"""
+    return min(MAX_TIMEOUT, timeout * (2 ** attempt))
+
+
+class RTTEstimator(object):
+    def __init__(self, srtt=None, rttvar=None):
+        """Smoothed round trip time and variance for a single host"""
+        self.srtt = srtt
+        self.rttvar = rttvar
+
+    def add_sample(self, rtt):
+        """Update the estimator with a new round trip time sample"""
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2.0
+        else:
+            self.rttvar = (1 - BETA) * self.rttvar + \
+                BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - ALPHA) * self.srtt + ALPHA * rtt
+
+    def get_timeout(self):
+        """Return the retransmission timeout like TCP does"""
+        if self.srtt is None:
+            return INITIAL_TIMEOUT
+        return min(MAX_TIMEOUT,
+                   max(MIN_TIMEOUT, self.srtt + 4 * self.rttvar))
+
+    def get_retries(self):
+        """Return the number of retries fitting in the maximum wait, every
+        retry doubles the timeout of the previous attempt"""
+        timeout = self.get_timeout()
+        total = 0
+        attempts = 0
+        while total + get_backoff(timeout, attempts) <= MAX_TOTAL_WAIT:
+            total += get_backoff(timeout, attempts)
+            attempts += 1
+        return min(MAX_RETRIES, max(MIN_RETRIES, attempts - 1))
+
+
+class RTTStatistics(object):
+    def __init__(self):
+        """Round trip time estimators for every host"""
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Return the estimator for a host"""
+        with self.lock:
+            if key not in self.hosts:
+                self.hosts[key] = RTTEstimator()
+            return self.hosts[key]
+
+    def add_sample(self, key, rtt):
+        """Update the estimator of a host with a new sample"""
+        estimator = self.get(key)
+        with self.lock:
+            estimator.add_sample(rtt)
+
+    def get_timeout(self, key):
+        """Return the timeout and the retries for a host"""
+        estimator = self.get(key)
+        return estimator.get_timeout(), estimator.get_retries()
+
+    def load(self, filename):
+        """Load the saved statistics"""
+        try:
+            with open(filename, 'r') as file_stats:
+                stats = json.load(file_stats)
+        except (IOError, ValueError):
+            # Missing or invalid statistics file
+            return
+        with self.lock:
+            for item in stats:
+                try:
+                    key = (str(item['address']), int(item['port']))
+                    self.hosts[key] = RTTEstimator(float(item['srtt']),
+                                                   float(item['rttvar']))
+                except (KeyError, TypeError, ValueError):
+                    # Skip invalid items
+                    pass
+
+    def save(self, filename):
+        """Save the statistics to warm up the next start"""
+        with self.lock:
+            stats = [{'address': key[0],
+                      'port': key[1],
+                      'srtt': estimator.srtt,
+                      'rttvar': estimator.rttvar}
+                     for key, estimator in self.hosts.iteritems()
+                     if estimator.srtt is not None]
+        try:
+            with open(filename, 'w') as file_stats:
+                json.dump(stats, file_stats)
+        except IOError as error:
+            # The statistics will be saved the next time
+            print 'Unable to save the RTT statistics: %s' % error
@@ -0,0 +1,439 @@
+##
+#     Project: gLiveSNMP
+# Description: Detect information on various devices via SNMP
+#      Author: Fabio Castelli (Muflone) <muflone@vbsimple.net>
+#   Copyright: 2016 Fabio Castelli
+#     License: GPL-2+
+#  This program is free software; you can redistribute it and/or modify it
+#  under the terms of the GNU General Public License as published by the Free
+#  Software Foundation; either version 2 of the License, or (at your option)
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful, but WITHOUT
+#  ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+#  FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+#  more details.
+#  You should have received a copy of the GNU General Public License along
+#  with this program; if not, write to the Free Software Foundation, Inc.,
+#  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+##
+
+import bisect
+import errno
+import heapq
+import optparse
+import os
+import random
+import select
+import socket
+import sys
+import threading
+import time
+
+import glivesnmp.ber as ber
+from glivesnmp.clock import monotonic
+
+MAX_PACKET_SIZE = 65535
+# Largest response sent without a tooBig error, like the Net-SNMP agent
+DEFAULT_MAX_SIZE = 1472
+OID_SYSUPTIME = '.1.3.6.1.2.1.1.3.0'
+# Error status for the write requests
+ERROR_READ_ONLY = 4
+ERROR_NOT_WRITABLE = 17
+# Types whose value grows over time with the numeric variation
+WRAPPING_TAGS = {ber.TAG_COUNTER32: 1 << 32,
+                 ber.TAG_COUNTER64: 1 << 64}
+
+
+def get_arcs(oid):
+    """Return the numeric arcs of an OID to sort them"""
+    return tuple(int(arc) for arc in oid.strip('.').split('.'))
+
+
+class DatasetValue(object):
+    __slots__ = ('tag', 'value', 'initial', 'rate')
+
+    def __init__(self, tag, value, initial=None, rate=None):
+        """A single dataset value, the numeric ones grow over the time"""
+        self.tag = tag
+        self.value = value
+        self.initial = initial
+        self.rate = rate
+
+    def get(self, elapsed):
+        """Return the value after the elapsed seconds"""
+        if self.rate is None:
+            return self.value
+        value = int(self.initial + self.rate * elapsed)
+        if self.tag in WRAPPING_TAGS:
+            value %= WRAPPING_TAGS[self.tag]
+        return value
+
+
+def parse_dataset_value(tag, value):
+    """Parse the tag and the value of a snmprec record"""
+    tag, separator, variation = tag.partition(':')
+    if tag.endswith('x'):
+        # Hexadecimal encoded value
+        tag = int(tag[:-1])
+        value = value.decode('hex')
+        if tag == ber.TAG_IPADDRESS:
+            value = '.'.join(str(ord(byte)) for byte in value)
+    else:
+        tag = int(tag)
+    if variation == 'numeric':
+        # Only the initial and the rate options of the numeric variation
+        options = dict(option.split('=', 1)
+                       for option in value.split(',') if '=' in option)
+        return DatasetValue(tag=tag,
+                            value=None,
+                            initial=float(options.get('initial', 0)),
+                            rate=float(options.get('rate', 1)))
+    elif variation:
+        raise ValueError('Unsupported variation %s' % variation)
+    if tag == ber.TAG_INTEGER or tag in ber.UNSIGNED_TAGS:
+        value = int(value)
+    elif tag == ber.TAG_OID:
+        value = '.' + value.strip('.')
+    elif tag in (ber.TAG_NULL, ber.TAG_NO_SUCH_OBJECT,
+                 ber.TAG_NO_SUCH_INSTANCE, ber.TAG_END_OF_MIB_VIEW):
+        value = None
+    return DatasetValue(tag=tag, value=value)
+
+
+class Dataset(object):
+    def __init__(self, filename):
+        """Load a snmprec dataset with a OID|TAG|VALUE record for each line.
+        The tag may end with x for hexadecimal values or with :numeric
+        for counters growing by initial=N,rate=N"""
+        self.values = {}
+        with open(filename, 'r') as dataset:
+            for line_number, line in enumerate(dataset, 1):
+                line = line.rstrip('\r\n')
+                if not line or line.startswith('#'):
+                    continue
+                try:
+                    oid, tag, value = line.split('|', 2)
+                    self.values['.' + oid.strip('.')] = (
+                        parse_dataset_value(tag, value))
+                except ValueError as error:
+                    raise ValueError('%s:%d: %s' % (filename, line_number,
+                                                    error))
+        # OIDs in lexicographic order for the GETNEXT requests
+        self.oids = sorted(self.values.iterkeys(), key=get_arcs)
+        self.arcs = [get_arcs(oid) for oid in self.oids]
+
+    def get(self, oid):
+        """Return the value for an OID or None if it's missing"""
+        return self.values.get(oid)
+
+    def get_next(self, oid):
+        """Return the OID following the requested one or None at the end"""
+        try:
+            index = bisect.bisect_right(self.arcs, get_arcs(oid))
+        except ValueError:
+            return None
+        return self.oids[index] if index < len(self.oids) else None
+
+
+class SimulatorFleet(object):
+    def __init__(self, dataset, address='127.0.0.1', port_number=16100,
+                 count=1, community='public', latency=0.0, loss=0.0,
+                 max_size=DEFAULT_MAX_SIZE):
+        """Simulate count agents answering from the same dataset on the
+        consecutive UDP ports starting from port_number.
+        Larger fleets should run in their own process using main, as the
+        clients waiting with select() fail for descriptors over 1024"""
+        self.dataset = dataset
+        self.address = address
+        self.port_number = port_number
+        self.count = count
+        self.community = community
+        # Seconds before every response is sent
+        self.latency = latency
+        # Fraction of the requests dropped without a response
+        self.loss = loss
+        # Largest response size before a tooBig error
+        self.max_size = max_size
+        self.sockets = {}
+        self.started = monotonic()
+        self.thread = None
+        self.stopped = False
+        # Pipe to wake up the thread when the fleet is stopped
+        self.wakeup = None
+        # Heap of (send time, sequence, socket, response, address)
+        self.pending = []
+        self.sequence = 0
+        # Metrics
+        self.requests = 0
+        self.responses = 0
+        self.dropped = 0
+        self.too_big = 0
+        self.errors = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        """Bind every agent port and start answering in a thread"""
+        raise_open_files_limit(self.count + 16)
+        for port_number in xrange(self.port_number,
+                                  self.port_number + self.count):
+            agent = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            agent.setblocking(False)
+            agent.bind((self.address, port_number))
+            self.sockets[agent.fileno()] = agent
+        self.wakeup = os.pipe()
+        self.started = monotonic()
+        self.thread = threading.Thread(target=self.run,
+                                       name='snmp-simulator')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """Stop the thread and close every agent port"""
+        self.stopped = True
+        if self.thread:
+            os.write(self.wakeup[1], 'x')
+            self.thread.join()
+            self.thread = None
+        for agent in self.sockets.itervalues():
+            agent.close()
+        self.sockets = {}
+        if self.wakeup:
+            for descriptor in self.wakeup:
+                os.close(descriptor)
+            self.wakeup = None
+
+    def get_metrics(self):
+        """Return a dictionary with the fleet metrics"""
+        return {'agents': self.count,
+                'requests': self.requests,
+                'responses': self.responses,
+                'dropped': self.dropped,
+                'too big': self.too_big,
+                'errors': self.errors}
+
+    def run(self):
+        """Receive the requests and send the delayed responses"""
+        poller = select.poll()
+        for descriptor in self.sockets.iterkeys():
+            poller.register(descriptor, select.POLLIN)
+        poller.register(self.wakeup[0], select.POLLIN)
+        while not self.stopped:
+            if self.pending:
+                timeout = max(0, (self.pending[0][0] - monotonic()) * 1000)
+            else:
+                timeout = None
+            try:
+                events = poller.poll(timeout)
+            except select.error as error:
+                if error.args[0] == errno.EINTR:
+                    continue
+                raise
+            for descriptor, event in events:
+                agent = self.sockets.get(descriptor)
+                if agent:
+                    self.receive(agent)
+            # Send the responses whose latency is elapsed
+            now = monotonic()
+            while self.pending and self.pending[0][0] <= now:
+                agent, response, address = heapq.heappop(self.pending)[2:]
+                try:
+                    agent.sendto(response, address)
+                    self.responses += 1
+                except socket.error:
+                    self.errors += 1
+
+    def receive(self, agent):
+        """Read every queued request for an agent"""
+        while True:
+            try:
+                data, address = agent.recvfrom(MAX_PACKET_SIZE)
+            except socket.error as error:
+                if error.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return
+                raise
+            self.requests += 1
+            if self.loss and random.random() < self.loss:
+                self.dropped += 1
+                continue
+            try:
+                response = self.respond(data)
+            except ber.BERException:
+                self.errors += 1
+                continue
+            if response is None:
+                # Wrong community or not a request
+                self.dropped += 1
+                continue
+            self.sequence += 1
+            heapq.heappush(self.pending, (monotonic() + self.latency,
+                                          self.sequence, agent,
+                                          response, address))
+
+    def get_varbind(self, oid, elapsed):
+        """Return the (oid, tag, value) varbind for an existing OID"""
+        if oid == OID_SYSUPTIME:
+            # The uptime is counted from the fleet start
+            return oid, ber.TAG_TIMETICKS, int(elapsed * 100) % (1 << 32)
+        item = self.dataset.get(oid)
+        return oid, item.tag, item.get(elapsed)
+
+    def respond(self, data):
+        """Return the encoded response for a request"""
+        (version, community, pdu_type, request_id,
+         error_status, error_index, varbinds) = ber.decode_message(data)
+        if community != self.community:
+            return None
+        elapsed = monotonic() - self.started
+        oids = [oid for oid, tag, value in varbinds]
+        # The GETBULK fields are non-repeaters and max-repetitions
+        non_repeaters, max_repetitions = error_status, error_index
+        results = []
+        error_status = 0
+        error_index = 0
+        if pdu_type == ber.PDU_GET:
+            for index, oid in enumerate(oids):
+                if oid == OID_SYSUPTIME or self.dataset.get(oid):
+                    results.append(self.get_varbind(oid, elapsed))
+                elif version == 0:
+                    error_status = ber.ERROR_NO_SUCH_NAME
+                    error_index = index + 1
+                    break
+                else:
+                    results.append((oid, ber.TAG_NO_SUCH_OBJECT, None))
+        elif pdu_type == ber.PDU_GET_NEXT:
+            for index, oid in enumerate(oids):
+                next_oid = self.dataset.get_next(oid)
+                if next_oid:
+                    results.append(self.get_varbind(next_oid, elapsed))
+                elif version == 0:
+                    error_status = ber.ERROR_NO_SUCH_NAME
+                    error_index = index + 1
+                    break
+                else:
+                    results.append((oid, ber.TAG_END_OF_MIB_VIEW, None))
+        elif pdu_type == ber.PDU_GET_BULK and version != 0:
+            results = self.get_bulk(oids, non_repeaters, max_repetitions,
+                                    elapsed)
+        elif pdu_type == ber.PDU_SET:
+            error_status = (ERROR_READ_ONLY if version == 0
+                            else ERROR_NOT_WRITABLE)
+            error_index = 1
+        else:
+            # Unknown PDUs and GETBULK for SNMPv1 are ignored
+            return None
+        if error_status:
+            # The errors return the requested varbinds
+            results = [(oid, None, None) for oid in oids]
+        response = ber.encode_message(version, community, ber.PDU_RESPONSE,
+                                      request_id, results,
+                                      error_status, error_index)
+        if pdu_type == ber.PDU_GET_BULK:
+            # The repetitions are truncated to fit in the maximum size
+            while len(response) > self.max_size and len(results) > 1:
+                results.pop()
+                response = ber.encode_message(version, community,
+                                              ber.PDU_RESPONSE, request_id,
+                                              results)
+        if len(response) > self.max_size:
+            self.too_big += 1
+            response = ber.encode_message(
+                version, community, ber.PDU_RESPONSE, request_id,
+                [(oid, None, None) for oid in oids] if version == 0 else [],
+                ber.ERROR_TOO_BIG, 0)
+        return response
+
+    def get_bulk(self, oids, non_repeaters, max_repetitions, elapsed):
+        """Return the varbinds for a GETBULK request"""
+        results = []
+        for oid in oids[:non_repeaters]:
+            next_oid = self.dataset.get_next(oid)
+            results.append(self.get_varbind(next_oid, elapsed) if next_oid
+                           else (oid, ber.TAG_END_OF_MIB_VIEW, None))
+        repeaters = oids[non_repeaters:]
+        for repetition in xrange(max_repetitions if repeaters else 0):
+            row = []
+            for index, oid in enumerate(repeaters):
+                next_oid = self.dataset.get_next(oid)
+                if next_oid:
+                    row.append(self.get_varbind(next_oid, elapsed))
+                    repeaters[index] = next_oid
+                else:
+                    row.append((oid, ber.TAG_END_OF_MIB_VIEW, None))
+            results.extend(row)
+            if all(tag == ber.TAG_END_OF_MIB_VIEW for oid, tag, value in row):
+                break
+        return results
+
+
+def raise_open_files_limit(files):
+    """Raise the soft limit for the open files up to the hard limit"""
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != resource.RLIM_INFINITY and soft < files:
+        if hard != resource.RLIM_INFINITY:
+            files = min(files, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (files, hard))
+
+
+def main(arguments=None):
+    """Run a simulated fleet from the command line until interrupted"""
+    parser = optparse.OptionParser(
+        usage='usage: %prog -d DATASET [options]')
+    parser.add_option('-d', '--dataset', type='string',
+                      help='snmprec dataset with the values')
+    parser.add_option('-a', '--address', type='string', default='127.0.0.1',
+                      help='address to listen to [default: %default]')
+    parser.add_option('-p', '--port', type='int', default=16100,
+                      help='port of the first agent [default: %default]')
+    parser.add_option('-n', '--count', type='int', default=1,
+                      help='number of agents [default: %default]')
+    parser.add_option('-C', '--community', type='string', default='public',
+                      help='community string [default: %default]')
+    parser.add_option('-l', '--latency', type='float', default=0.0,
+                      help='seconds before every response '
+                           '[default: %default]')
+    parser.add_option('-L', '--loss', type='float', default=0.0,
+                      help='fraction of the requests dropped '
+                           '[default: %default]')
+    parser.add_option('-m', '--max-size', type='int',
+                      default=DEFAULT_MAX_SIZE,
+                      help='largest response before a tooBig error '
+                           '[default: %default]')
+    (options, args) = parser.parse_args(arguments)
+    if not options.dataset:
+        parser.error('the dataset is required')
+    fleet = SimulatorFleet(dataset=Dataset(options.dataset),
+                           address=options.address,
+                           port_number=options.port,
+                           count=options.count,
+                           community=options.community,
+                           latency=options.latency,
+                           loss=options.loss,
+                           max_size=options.max_size)
+    fleet.start()
+    print 'Simulating %d agents on %s ports %d-%d' % (
+        options.count, options.address, options.port,
+        options.port + options.count - 1)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fleet.stop()
+        print fleet.get_metrics()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,226 @@
+##
+#     Project: gLiveSNMP
+# Description: Detect information on various devices via SNMP
+#      Author: Fabio Castelli (Muflone) <muflone@vbsimple.net>
+#   Copyright: 2016 Fabio Castelli
+#     License: GPL-2+
+#  This program is free software; you can redistribute it and/or modify it
+#  under the terms of the GNU General Public License as published by the Free
+#  Software Foundation; either version 2 of the License, or (at your option)
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful, but WITHOUT
+#  ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+#  FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+#  more details.
+#  You should have received a copy of the GNU General Public License along
+#  with this program; if not, write to the Free Software Foundation, Inc.,
+#  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+##
+
+import array
+import collections
+import math
+import threading
+
+from glivesnmp.snmp_exception import (
+    SNMPCancelledException, SNMPTimeoutException)
+
+# Phases of a request
+PHASE_QUEUE = 'queue wait'
+PHASE_SEND = 'spawn/send'
+PHASE_RTT = 'rtt'
+PHASE_PARSE = 'parse'
+PHASE_DISPATCH = 'ui dispatch'
+PHASES = (PHASE_QUEUE, PHASE_SEND, PHASE_RTT, PHASE_PARSE, PHASE_DISPATCH)
+# Logarithmic buckets from 1 us to about 4 minutes
+MIN_LATENCY = 1e-6
+BUCKETS_PER_OCTAVE = 4
+BUCKETS = 28 * BUCKETS_PER_OCTAVE
+PERCENTILES = (50, 95, 99)
+# Hosts with their own statistics, the oldest ones are discarded
+MAX_HOSTS = 1024
+
+
+class Histogram(object):
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        """Latencies histogram with a fixed number of logarithmic buckets,
+        the percentiles have an error within a fourth of octave"""
+        self.counts = array.array('L', [0]) * BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        """Add a latency sample"""
+        if seconds > MIN_LATENCY:
+            bucket = min(BUCKETS - 1, int(math.log(seconds / MIN_LATENCY, 2) *
+                                          BUCKETS_PER_OCTAVE))
+        else:
+            bucket = 0
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def get_percentile(self, percentile):
+        """Return the upper bound of the bucket for a percentile"""
+        if not self.count:
+            return None
+        threshold = self.count * percentile / 100.0
+        cumulative = 0
+        for bucket, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= threshold:
+                return min(self.max, MIN_LATENCY * 2 ** (
+                    (bucket + 1.0) / BUCKETS_PER_OCTAVE))
+        return self.max
+
+    def get_summary(self):
+        """Return a dictionary with the count, mean, percentiles and max"""
+        summary = collections.OrderedDict()
+        summary['count'] = self.count
+        summary['mean'] = self.total / self.count if self.count else None
+        for percentile in PERCENTILES:
+            summary['p%d' % percentile] = self.get_percentile(percentile)
+        summary['max'] = self.max
+        return summary
+
+
+class HostStatistics(object):
+    def __init__(self):
+        """Counters and phase histograms for a single host"""
+        self.histograms = dict((phase, Histogram()) for phase in PHASES)
+        self.requests = 0
+        self.in_flight = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.cancelled = 0
+
+    def finished(self, error):
+        """Count a finished request"""
+        self.in_flight -= 1
+        if isinstance(error, SNMPTimeoutException):
+            self.timeouts += 1
+        elif isinstance(error, SNMPCancelledException):
+            self.cancelled += 1
+        elif error:
+            self.errors += 1
+
+    def get_summary(self):
+        """Return a dictionary with the counters and the phases"""
+        summary = collections.OrderedDict()
+        summary['requests'] = self.requests
+        summary['in flight'] = self.in_flight
+        summary['timeouts'] = self.timeouts
+        summary['errors'] = self.errors
+        summary['cancelled'] = self.cancelled
+        summary['phases'] = collections.OrderedDict(
+            (phase, self.histograms[phase].get_summary())
+            for phase in PHASES)
+        return summary
+
+
+class PollerStatistics(object):
+    def __init__(self, max_hosts=MAX_HOSTS):
+        """Timings for every phase of the requests for every host and for
+        all of them together"""
+        self.max_hosts = max_hosts
+        self.lock = threading.Lock()
+        self.total = HostStatistics()
+        self.hosts = collections.OrderedDict()
+
+    def get_host(self, key):
+        """Return the statistics for a host, the lock must be held"""
+        host = self.hosts.pop(key, None)
+        if host is None:
+            host = HostStatistics()
+            # Forget the least recently used host
+            if len(self.hosts) >= self.max_hosts:
+                self.hosts.popitem(last=False)
+        self.hosts[key] = host
+        return host
+
+    def add(self, key, phase, seconds):
+        """Add a latency sample for a phase of a host request"""
+        with self.lock:
+            self.get_host(key).histograms[phase].add(seconds)
+            self.total.histograms[phase].add(seconds)
+
+    def started(self, key):
+        """Count a new request for a host"""
+        with self.lock:
+            for host in (self.get_host(key), self.total):
+                host.requests += 1
+                host.in_flight += 1
+
+    def finished(self, key, error=None):
+        """Count a request completed with an SNMPException or None"""
+        with self.lock:
+            self.total.finished(error)
+            # The host could be discarded while the request was running
+            if key in self.hosts:
+                self.hosts[key].finished(error)
+
+    def get_summary(self, key=None):
+        """Return the summary for a host or for all the hosts"""
+        with self.lock:
+            if key is None:
+                return self.total.get_summary()
+            elif key in self.hosts:
+                return self.hosts[key].get_summary()
+
+    def get_histograms(self, key=None):
+        """Return the (counts, count, total) for every phase of a host or
+        of all the hosts"""
+        with self.lock:
+            host = self.total if key is None else self.hosts.get(key)
+            if host is None:
+                return None
+            return dict((phase, (list(histogram.counts), histogram.count,
+                                 histogram.total))
+                        for phase, histogram in host.histograms.iteritems())
+
+    def get_hosts(self):
+        """Return the keys of the hosts with statistics"""
+        with self.lock:
+            return self.hosts.keys()
+
+    def reset(self):
+        """Discard every statistic"""
+        with self.lock:
+            self.total = HostStatistics()
+            self.hosts = collections.OrderedDict()
+
+    def dump(self, output):
+        """Write the statistics as text for all the hosts and every host"""
+        rows = [('all hosts', self.get_summary())]
+        for key in self.get_hosts():
+            rows.append(('%s:%d' % key, self.get_summary(key)))
+        for name, summary in rows:
+            if summary is None:
+                continue
+            output.write('%s: %d requests, %d in flight, %d timeouts, '
+                         '%d errors, %d cancelled\n' % (
+                             name,
+                             summary['requests'],
+                             summary['in flight'],
+                             summary['timeouts'],
+                             summary['errors'],
+                             summary['cancelled']))
+            for phase, histogram in summary['phases'].iteritems():
+                if histogram['count']:
+                    output.write('  %-12s %8d %s\n' % (
+                        phase, histogram['count'], ' '.join(
+                            '%s %s' % (field, format_latency(
+                                histogram[field]))
+                            for field in ('p50', 'p95', 'p99', 'max'))))
+
+
+def format_latency(seconds):
+    """Format a latency in milliseconds"""
+    if seconds is None:
+        return '-'
+    return '%.3f ms' % (seconds * 1000)
@@ -0,0 +1,352 @@
+##
+#     Project: gLiveSNMP
+# Description: Detect information on various devices via SNMP
+#      Author: Fabio Castelli (Muflone) <muflone@vbsimple.net>
+#   Copyright: 2016 Fabio Castelli
+#     License: GPL-2+
+#  This program is free software; you can redistribute it and/or modify it
+#  under the terms of the GNU General Public License as published by the Free
+#  Software Foundation; either version 2 of the License, or (at your option)
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful, but WITHOUT
+#  ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+#  FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+#  more details.
+#  You should have received a copy of the GNU General Public License along
+#  with this program; if not, write to the Free Software Foundation, Inc.,
+#  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+##
+
+import re
+import socket
+
+import glivesnmp.ber as ber
+
+# Values returned by net-snmp for the SNMPv2 exceptions
+EXCEPTION_MESSAGES = {
+    ber.TAG_NO_SUCH_OBJECT:
+        'No Such Object available on this agent at this OID',
+    ber.TAG_NO_SUCH_INSTANCE:
+        'No Such Instance currently exists at this OID',
+    ber.TAG_END_OF_MIB_VIEW:
+        'No more variables left in this MIB View '
+        '(It is past the end of the MIB tree)'}
+# Enumerated integers are printed as label(value)
+RE_ENUMERATION = re.compile(r'^(.+)\((-?\d+)\)$')
+# Continuation lines for the hexadecimal values
+RE_HEX_LINE = re.compile(r'^([0-9A-Fa-f]{2} ?)+$')
+# Control characters which are not part of a printable text
+RE_CONTROL = re.compile(u'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]')
+
+
+def format_timeticks(ticks):
+    """Format the timeticks like net-snmp does"""
+    seconds, hundredths = divmod(ticks, 100)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    result = '%d:%02d:%02d.%02d' % (hours, minutes, seconds, hundredths)
+    if days:
+        result = '%d day%s, %s' % (days, '' if days == 1 else 's', result)
+    return result
+
+
+def split_units(value):
+    """Split the number from the optional units"""
+    if ' ' in value:
+        return value.split(' ', 1)
+    return value, None
+
+
+class Integer(int):
+    """Signed INTEGER with its optional enumeration label"""
+    syntax = 'INTEGER'
+
+    def __new__(cls, value, label=None, units=None):
+        result = int.__new__(cls, value)
+        result.label = label
+        result.units = units
+        return result
+
+    def __str__(self):
+        if self.label:
+            return '%s(%d)' % (self.label, self)
+        elif self.units:
+            return '%d %s' % (self, self.units)
+        else:
+            return int.__str__(self)
+
+
+class Unsigned(long):
+    """Unsigned integer of width bits"""
+    syntax = 'Unsigned32'
+    width = 32
+
+    def __new__(cls, value, units=None):
+        result = long.__new__(cls, value)
+        result.units = units
+        return result
+
+    def __str__(self):
+        if self.units:
+            return '%s %s' % (long.__str__(self), self.units)
+        else:
+            return long.__str__(self)
+
+
+class Gauge32(Unsigned):
+    """Gauge32 value"""
+    syntax = 'Gauge32'
+
+
+class Counter32(Unsigned):
+    """Counter32 value, wrapping at 2^32"""
+    syntax = 'Counter32'
+
+
+class Counter64(Unsigned):
+    """Counter64 value, wrapping at 2^64"""
+    syntax = 'Counter64'
+    width = 64
+
+
+class Timeticks(Unsigned):
+    """Hundredths of seconds, printed like net-snmp does"""
+    syntax = 'Timeticks'
+
+    def __str__(self):
+        return format_timeticks(self)
+
+
+class OctetString(str):
+    """Raw bytes of an OCTET STRING"""
+    syntax = 'STRING'
+
+    def hex(self):
+        """Return the bytes in hexadecimal format"""
+        return ' '.join('%02X' % ord(byte) for byte in self)
+
+
+class Opaque(OctetString):
+    """Opaque value"""
+    syntax = 'Opaque'
+
+
+class IpAddress(str):
+    """IPv4 address in dotted format"""
+    syntax = 'IpAddress'
+
+    @property
+    def packed(self):
+        """Return the address as four bytes"""
+        return socket.inet_aton(self)
+
+
+class ObjectIdentifier(str):
+    """Numeric OBJECT IDENTIFIER"""
+    syntax = 'OID'
+
+    @property
+    def arcs(self):
+        """Return the arcs of the OID"""
+        return tuple(int(arc) for arc in self.strip('.').split('.'))
+
+
+class Null(str):
+    """NULL value"""
+    syntax = 'NULL'
+
+    def __new__(cls, value=None):
+        return str.__new__(cls, 'NULL')
+
+
+class NoSuchValue(str):
+    """SNMPv2 exception in place of a value"""
+    syntax = 'EXCEPTION'
+
+    def __new__(cls, tag):
+        result = str.__new__(cls, EXCEPTION_MESSAGES[tag])
+        result.tag = tag
+        return result
+
+
+# Exceptions from their net-snmp message
+EXCEPTION_TAGS = dict((message, tag)
+                      for tag, message in EXCEPTION_MESSAGES.iteritems())
+# Types for the decoded BER tags
+BER_TYPES = {
+    ber.TAG_INTEGER: Integer,
+    ber.TAG_OCTET_STRING: OctetString,
+    ber.TAG_NULL: Null,
+    ber.TAG_OID: ObjectIdentifier,
+    ber.TAG_IPADDRESS: IpAddress,
+    ber.TAG_COUNTER32: Counter32,
+    ber.TAG_GAUGE32: Gauge32,
+    ber.TAG_TIMETICKS: Timeticks,
+    ber.TAG_OPAQUE: Opaque,
+    ber.TAG_COUNTER64: Counter64,
+    }
+
+
+def from_ber(tag, value):
+    """Return the typed value for a decoded BER value"""
+    if tag in EXCEPTION_MESSAGES:
+        return NoSuchValue(tag)
+    return BER_TYPES.get(tag, OctetString)(value)
+
+
+def parse_string(value):
+    """Parse a STRING value"""
+    if len(value) > 1 and value[0] == '"' and value[-1] == '"':
+        # Strip quotes
+        value = value[1:-1]
+    return OctetString(value)
+
+
+def parse_hex_string(value):
+    """Parse a Hex-STRING value, even on multiple lines"""
+    return OctetString(bytearray.fromhex(''.join(value.split())))
+
+
+def parse_bits(value):
+    """Parse a BITS value skipping the names of the set bits"""
+    return OctetString(bytearray.fromhex(''.join(
+        item for item in value.split() if RE_HEX_LINE.match(item))))
+
+
+def parse_integer(value):
+    """Parse an INTEGER value with its enumeration label or units"""
+    if value[-1:] == ')':
+        match = RE_ENUMERATION.match(value)
+        if match:
+            return Integer(match.group(2), label=match.group(1))
+    number, units = split_units(value)
+    return Integer(number, units=units)
+
+
+def unsigned_parser(cls):
+    """Return the parser for an unsigned type with optional units"""
+    def parser(value):
+        number, units = split_units(value)
+        return cls(number, units=units)
+    return parser
+
+
+def parse_timeticks(value):
+    """Parse a Timeticks value keeping only the raw number"""
+    return Timeticks(value[1:value.index(')')])
+
+
+def parse_network_address(value):
+    """Parse a Network Address value in hexadecimal format"""
+    return IpAddress('.'.join(str(int(byte, 16))
+                              for byte in value.split(':')))
+
+
+def parse_message(value):
+    """Parse a value lacking the data type"""
+    if value in EXCEPTION_TAGS:
+        return NoSuchValue(EXCEPTION_TAGS[value])
+    elif value == 'NULL':
+        return Null()
+    # Anything else is always treated like a string
+    return parse_string(value)
+
+
+PARSERS = {
+    'STRING': parse_string,
+    'Hex-STRING': parse_hex_string,
+    'BITS': parse_bits,
+    'INTEGER': parse_integer,
+    'Counter32': unsigned_parser(Counter32),
+    'Counter64': unsigned_parser(Counter64),
+    'Gauge32': unsigned_parser(Gauge32),
+    'Unsigned32': unsigned_parser(Unsigned),
+    'UInteger32': unsigned_parser(Unsigned),
+    'Timeticks': parse_timeticks,
+    'IpAddress': IpAddress,
+    'Network Address': parse_network_address,
+    'OID': ObjectIdentifier,
+    'Opaque': Opaque,
+    }
+
+
+def parse_value(data):
+    """Parse a value printed by the net-snmp tools"""
+    separator = data.find(': ')
+    if separator < 0:
+        return parse_message(data)
+    datatype = data[:separator]
+    parser = PARSERS.get(datatype)
+    if parser:
+        try:
+            return parser(data[separator + 2:])
+        except ValueError:
+            # Display hints can print numbers which cannot be parsed
+            return OctetString(data[separator + 2:])
+    elif datatype.startswith('Wrong Type'):
+        # The value follows the expected type
+        return parse_value(data[separator + 2:])
+    else:
+        # Unknown data types are kept as strings
+        return OctetString(data[separator + 2:])
+
+
+def is_varbind(line):
+    """Check if a line starts a new varbind"""
+    return line.startswith('.') and ' = ' in line
+
+
+def is_continued(value, line):
+    """Check if a line continues a multi-line value"""
+    if is_varbind(line):
+        return False
+    elif value.startswith('STRING: "'):
+        # Quoted strings continue up to the closing quote, unless it's
+        # escaped by an odd number of backslashes
+        if len(value) == 9 or not value.endswith('"'):
+            return True
+        escapes = len(value) - 1 - len(value[:-1].rstrip('\\'))
+        return escapes % 2 == 1
+    elif value.startswith(('Hex-STRING: ', 'BITS: ')):
+        return RE_HEX_LINE.match(line) is not None
+    return False
+
+
+def iter_varbinds(lines):
+    """Join the lines printed by the net-snmp tools in (oid, value) tuples.
+    Any other line is returned as (None, line)"""
+    oid = value = None
+    for line in lines:
+        line = line.rstrip('\n')
+        if oid is not None:
+            if is_continued(value, line):
+                value = '%s\n%s' % (value, line)
+                continue
+            yield oid, value
+            oid = value = None
+        if is_varbind(line):
+            oid, value = line.split(' = ', 1)
+        elif line:
+            yield None, line
+    if oid is not None:
+        yield oid, value
+
+
+def export_value(value):
+    """Return a typed value as a plain type for the exported output"""
+    if value is None:
+        return None
+    elif isinstance(value, int):
+        return int(value)
+    elif isinstance(value, long):
+        return long(value)
+    try:
+        text = value.decode('utf-8')
+    except UnicodeDecodeError:
+        text = None
+    if text is None or RE_CONTROL.search(text):
+        # Binary strings are written in hexadecimal format
+        return value.hex() if hasattr(value, 'hex') else repr(value)
+    return text
@@ -0,0 +1,237 @@
+##
+#     Project: gLiveSNMP
+# Description: Detect information on various devices via SNMP
+#      Author: Fabio Castelli (Muflone) <muflone@vbsimple.net>
+#   Copyright: 2016 Fabio Castelli
+#     License: GPL-2+
+#  This program is free software; you can redistribute it and/or modify it
+#  under the terms of the GNU General Public License as published by the Free
+#  Software Foundation; either version 2 of the License, or (at your option)
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful, but WITHOUT
+#  ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+#  FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+#  more details.
+#  You should have received a copy of the GNU General Public License along
+#  with this program; if not, write to the Free Software Foundation, Inc.,
+#  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+##
+
+import array
+import collections
+import mmap
+import os
+import os.path
+import shutil
+import struct
+import sys
+import time
+import urllib
+
+MAGIC = 'GLSNMPTS'
+VERSION = 1
+HEADER = struct.Struct('<8sHH')
+# Seconds per row and number of rows for every archive
+ARCHIVE = struct.Struct('<II')
+# Bucket start, samples count, minimum, average and maximum values
+ROW = struct.Struct('<5d')
+ROW_FIELDS = 5
+# 1 hour every 5 seconds, 1 day every minute, 1 week every 10 minutes
+# and 90 days every hour
+DEFAULT_ARCHIVES = ((5, 720), (60, 1440), (600, 1008), (3600, 2160))
+# Series files kept open at the same time
+MAX_OPEN_FILES = 256
+FILE_EXTENSION = '.tsdb'
+# Prefix for the groups directories, it's always quoted in the hosts names
+GROUP_PREFIX = '@'
+
+store = None
+
+
+class SeriesFile(object):
+    def __init__(self, filename, archives=DEFAULT_ARCHIVES):
+        """Fixed size memory-mapped file with the consolidation archives
+        of a single series"""
+        self.filename = filename
+        self.archives = tuple(archives)
+        header = (HEADER.pack(MAGIC, VERSION, len(self.archives)) +
+                  ''.join(ARCHIVE.pack(resolution, rows)
+                          for resolution, rows in self.archives))
+        # Align the rows to 8 bytes
+        offset = (len(header) + 7) // 8 * 8
+        # (resolution, rows, offset) for every archive
+        self.layout = []
+        for resolution, rows in self.archives:
+            self.layout.append((resolution, rows, offset))
+            offset += rows * ROW.size
+        self.size = offset
+        descriptor = os.open(filename, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.read(descriptor, len(header)) != header or \
+                    os.fstat(descriptor).st_size != self.size:
+                # Pre-allocate a new file discarding any different layout
+                os.ftruncate(descriptor, 0)
+                os.ftruncate(descriptor, self.size)
+                os.lseek(descriptor, 0, os.SEEK_SET)
+                os.write(descriptor, header)
+            self.mmap = mmap.mmap(descriptor, self.size)
+        finally:
+            os.close(descriptor)
+
+    def add(self, timestamp, value):
+        """Consolidate a sample in the row of every archive"""
+        data = self.mmap
+        timestamp = int(timestamp)
+        for resolution, rows, offset in self.layout:
+            start = timestamp - timestamp % resolution
+            position = offset + (start // resolution) % rows * ROW.size
+            (row_start, count, minimum, average,
+             maximum) = ROW.unpack_from(data, position)
+            if row_start == start:
+                count += 1
+                ROW.pack_into(data, position, start, count,
+                              value if value < minimum else minimum,
+                              average + (value - average) / count,
+                              value if value > maximum else maximum)
+            elif row_start < start:
+                # Replace the oldest row for a new bucket
+                ROW.pack_into(data, position, start, 1, value, value, value)
+
+    def get_archive(self, start, resolution=None):
+        """Return the finest archive with the requested resolution or
+        covering the data from the start timestamp"""
+        now = time.time()
+        for archive in self.layout:
+            if resolution is None:
+                if archive[0] * archive[1] >= now - start:
+                    return archive
+            elif archive[0] >= resolution:
+                return archive
+        return self.layout[-1]
+
+    def fetch(self, start, end=None, resolution=None):
+        """Return the (timestamp, minimum, average, maximum) rows between
+        the start and end timestamps"""
+        if end is None:
+            end = time.time()
+        resolution, rows, offset = self.get_archive(start, resolution)
+        first = int(start) // resolution
+        last = int(end) // resolution
+        # Older rows were already replaced
+        first = max(first, last - rows + 1)
+        count = last - first + 1
+        if count <= 0:
+            return []
+        # Read the rows with one or two slices in case of wrap
+        slot = first % rows
+        head = min(count, rows - slot)
+        values = array.array('d')
+        values.fromstring(self.mmap[offset + slot * ROW.size:
+                                    offset + (slot + head) * ROW.size])
+        if head < count:
+            values.fromstring(self.mmap[offset:
+                                        offset + (count - head) * ROW.size])
+        if sys.byteorder == 'big':
+            values.byteswap()
+        results = []
+        for index in xrange(count):
+            base = index * ROW_FIELDS
+            bucket = (first + index) * resolution
+            # Skip the rows never written for the bucket
+            if values[base] == bucket and values[base + 1]:
+                results.append((bucket, values[base + 2], values[base + 3],
+                                values[base + 4]))
+        return results
+
+    def flush(self):
+        """Write the changes to the disk"""
+        self.mmap.flush()
+
+    def close(self):
+        """Close the file"""
+        self.mmap.close()
+
+
+class SeriesStore(object):
+    def __init__(self, directory, archives=DEFAULT_ARCHIVES):
+        """On-disk store with a SeriesFile for every (group, host, service)"""
+        self.directory = directory
+        self.archives = archives
+        # Least recently used open files
+        self.files = collections.OrderedDict()
+
+    def get_host_path(self, group, host):
+        """Return the directory for the series of a host in a group.
+        The hosts of the default group are kept in the main directory and
+        the groups are prefixed by a character always quoted in the hosts
+        names, so the two can never collide"""
+        path = self.directory
+        if group:
+            path = os.path.join(path, GROUP_PREFIX + urllib.quote(group,
+                                                                  safe=''))
+        return os.path.join(path, urllib.quote(host, safe=''))
+
+    def get_filename(self, group, host, service):
+        """Return the file name for a series"""
+        return os.path.join(self.get_host_path(group, host),
+                            urllib.quote(service, safe='') + FILE_EXTENSION)
+
+    def get_file(self, group, host, service, create=True):
+        """Return the open SeriesFile for a series"""
+        key = (group, host, service)
+        series = self.files.pop(key, None)
+        if series is None:
+            filename = self.get_filename(group, host, service)
+            if not os.path.isfile(filename):
+                if not create:
+                    return None
+                path = self.get_host_path(group, host)
+                if not os.path.isdir(path):
+                    os.makedirs(path)
+            series = SeriesFile(filename, self.archives)
+            if len(self.files) >= MAX_OPEN_FILES:
+                self.files.popitem(last=False)[1].close()
+        self.files[key] = series
+        return series
+
+    def add(self, group, host, service, timestamp, value):
+        """Add a sample for a series, only numeric values are kept"""
+        if not isinstance(value, (int, long, float)):
+            return False
+        self.get_file(group, host, service).add(timestamp, float(value))
+        return True
+
+    def fetch(self, group, host, service, start, end=None,
+              resolution=None):
+        """Return the consolidated rows of a series between two
+        timestamps"""
+        series = self.get_file(group, host, service, create=False)
+        return series.fetch(start, end, resolution) if series else []
+
+    def close_host(self, group, host):
+        """Close the open files for a host"""
+        for key in [key for key in self.files.iterkeys()
+                    if key[:2] == (group, host)]:
+            self.files.pop(key).close()
+
+    def remove_host(self, group, host):
+        """Remove every series for a host"""
+        self.close_host(group, host)
+        path = self.get_host_path(group, host)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+
+    def rename_host(self, group, host, new_host):
+        """Move every series of a host to its new name, the series are
+        kept under the old name if the new name has its own series"""
+        self.close_host(group, host)
+        path = self.get_host_path(group, host)
+        new_path = self.get_host_path(group, new_host)
+        if os.path.isdir(path) and not os.path.exists(new_path):
+            os.rename(path, new_path)
+
+    def close(self):
+        """Close every open file"""
+        while self.files:
+            self.files.popitem()[1].close()
@@ -17,3 +17,30 @@
 #  with this program; if not, write to the Free Software Foundation, Inc.,
 #  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
 ##
+
+import gettext
+import locale
+
+import glivesnmp.requires
+
+from glivesnmp.functions import store_message, text, _
+from glivesnmp.constants import DOMAIN_NAME, DIR_LOCALE
+
+# Load domain for translation
+for module in (gettext, locale):
+    module.bindtextdomain(DOMAIN_NAME, DIR_LOCALE)
+    module.textdomain(DOMAIN_NAME)
+
+# Import some translated messages from GTK+ domain
+store_message('_Icon:', '_%s:' % text(message='Icon', gtk30=True))
+for message in ('_OK', '_Cancel', '_Close', '_Open', '_Save', '_Connect',
+                '_Copy', '_Delete', 'Select a File', 'Services',
+                'Name', 'Value', '_Name:', '_Value:',
+                'If you delete an item, it will be permanently lost.'):
+    text(message=message, gtk30=True)
+# With domain context
+for message in ('_Add', '_Remove', '_Edit', '_New', '_Quit', '_About'):
+    text(message=message, gtk30=True, context='Stock label')
+# Remove the underscore
+for message in ('_Add', '_Remove', '_Edit', '_New', '_Connect', '_Delete'):
+    store_message(message.replace('_', ''), _(message).replace('_', ''))
@@ -21,25 +21,42 @@
 import os
 import os.path
 import json
+import sys
+import time
 
 from gi.repository import Gtk
 from gi.repository import Gdk
+from gi.repository import Gio
+from gi.repository import GLib
 
+from glivesnmp.clock import monotonic
 from glivesnmp.constants import (
     APP_NAME,
     FILE_SETTINGS, FILE_WINDOWS_POSITION, FILE_SERVICES, FILE_DEVICES,
-    DIR_HOSTS)
+    FILE_OIDS_CACHE, FILE_RTT_STATS, FILE_HOSTS_INDEX, DIR_HOSTS, DIR_RRD)
+import glivesnmp.exporter as exporter
 from glivesnmp.functions import (
     get_ui_file, get_treeview_selected_row, show_popup_menu, text, _)
+import glivesnmp.history as history
+import glivesnmp.inventory as inventory
+from glivesnmp.inventory import (
+    OPTION_SERVICE_DESCRIPTION, OPTION_SERVICE_INTERVAL,
+    OPTION_DEVICE_DESCRIPTION, OPTION_DEVICE_SERVICES)
 import glivesnmp.preferences as preferences
+import glivesnmp.scheduler as scheduler
 import glivesnmp.settings as settings
 import glivesnmp.snmp as snmp
+import glivesnmp.tsdb as tsdb
 from glivesnmp.gtkbuilder_loader import GtkBuilderLoader
+from glivesnmp.snmp_breaker import STATE_OPEN
+from glivesnmp.snmp_exception import (
+    SNMPException, SNMPCancelledException, SNMPTimeoutException,
+    SNMPUnreachableException)
+from glivesnmp.snmp_stats import PHASE_QUEUE, PHASE_DISPATCH
+import glivesnmp.worker_pool as worker_pool
 
 import glivesnmp.models.services as model_services
 import glivesnmp.models.devices as model_devices
-from glivesnmp.models.device_info import DeviceInfo
-from glivesnmp.models.service_info import ServiceInfo
 from glivesnmp.models.host_info import HostInfo
 from glivesnmp.models.hosts import ModelHosts
 from glivesnmp.models.group_info import GroupInfo
@@ -51,25 +68,16 @@ from glivesnmp.ui.devices import UIDevices
 from glivesnmp.ui.groups import UIGroups
 from glivesnmp.ui.host import UIHost
 from glivesnmp.ui.snmp_values import UISNMPValues
+from glivesnmp.ui.poller_stats import UIPollerStats
 from glivesnmp.ui.message_dialog import (
     show_message_dialog, UIMessageDialogNoYes, UIMessageDialogClose)
 
 SECTION_WINDOW_NAME = 'main'
-# Options for services
-OPTION_SERVICE_DESCRIPTION = 'description'
-# Options for devices
-OPTION_DEVICE_DESCRIPTION = 'description'
-OPTION_DEVICE_SERVICES = 'services'
-# Section and options for host
-SECTION_HOST = 'host'
-OPTION_HOST_NAME = 'name'
-OPTION_HOST_DESCRIPTION = 'description'
-OPTION_HOST_PROTOCOL = 'protocol'
-OPTION_HOST_ADDRESS = 'address'
-OPTION_HOST_PORT = 'port'
-OPTION_HOST_VERSION = 'version'
-OPTION_HOST_COMMUNITY = 'community'
-OPTION_HOST_DEVICE = 'device'
+# Values shown in the hosts list after a group poll
+MAX_KEY_VALUES = 3
+MAX_KEY_VALUE_LENGTH = 30
+# Milliseconds to wait for other changes to the hosts files
+HOSTS_MONITOR_DELAY = 500
 
 
 class UIMain(object):
@@ -82,27 +90,39 @@ class UIMain(object):
         settings.services = settings.Settings(FILE_SERVICES, False)
         settings.devices = settings.Settings(FILE_DEVICES, False)
         preferences.preferences = preferences.Preferences()
-        # Load services
-        for key in settings.services.get_sections():
-            model_services.services[key] = ServiceInfo(
-                name=key,
-                description=settings.services.get(
-                    key, OPTION_SERVICE_DESCRIPTION),
-                numeric_oid=snmp.snmp.translate(settings.services.get(
-                    key, OPTION_SERVICE_DESCRIPTION)))
+        history.history = history.History(
+            preferences.get(preferences.HISTORY_SAMPLES))
+        tsdb.store = tsdb.SeriesStore(DIR_RRD)
+        worker_pool.pool = worker_pool.WorkerPool(
+            preferences.get(preferences.WORKER_THREADS))
+        scheduler.scheduler = scheduler.Scheduler()
+        exporter.start(preferences.get(preferences.EXPORTER_PORT))
+        # Load the round trip times measured in the previous sessions
+        snmp.snmp.rtt.load(FILE_RTT_STATS)
+        # Load services translating all the OIDs at once
+        snmp.snmp.load_cache(FILE_OIDS_CACHE)
+        # Load the index of the hosts files
+        inventory.index = inventory.HostsIndex(FILE_HOSTS_INDEX)
+        inventory.index.load()
+        inventory.load_services()
         # Load devices
-        for key in settings.devices.get_sections():
-            model_devices.devices[key] = DeviceInfo(
-                name=key,
-                description=settings.devices.get(
-                    key, OPTION_DEVICE_DESCRIPTION),
-                services=settings.devices.get_list(
-                    key, OPTION_DEVICE_SERVICES))
+        inventory.load_devices()
         self.loadUI()
         self.model_hosts = ModelHosts(self.ui.store_hosts)
         self.model_groups = ModelGroups(self.ui.store_groups)
         # Load the groups and hosts list
         self.hosts = {}
+        # Loaded group folder and (mtime, size, host name) for its files
+        self.hosts_path = None
+        self.hosts_files = {}
+        self.hosts_monitor = None
+        self.hosts_reload_pending = False
+        # Status for the running group poll
+        self.poll_token = None
+        self.poll_completed = 0
+        self.poll_total = 0
+        # Names of the hosts still waiting for the group poll results
+        self.polling = set()
         self.reload_groups()
         # Sort the data in the models
         self.model_groups.model.set_sort_column_id(
@@ -189,7 +209,8 @@ class UIMain(object):
         self.ui.win_main.set_titlebar(header_bar)
         # Add buttons to the left side
         for action in (self.ui.action_new, self.ui.action_edit,
-                       self.ui.action_connect, self.ui.action_delete):
+                       self.ui.action_connect, self.ui.action_delete,
+                       self.ui.action_poll_group):
             header_bar.pack_start(create_button_from_action(action))
         # Add buttons to the right side (in reverse order)
         for action in reversed((self.ui.action_services,
@@ -210,8 +231,22 @@ class UIMain(object):
         settings.services.save()
         settings.devices.save()
         settings.settings.save()
+        snmp.snmp.save_cache(FILE_OIDS_CACHE)
+        inventory.index.save()
+        snmp.snmp.rtt.save(FILE_RTT_STATS)
+        if settings.settings.options.stats:
+            snmp.snmp.stats.dump(sys.stderr)
+        tsdb.store.close()
+        exporter.stop()
+        scheduler.scheduler.stop()
+        worker_pool.pool.stop()
         self.application.quit()
 
+    def on_action_poller_stats_activate(self, action):
+        """Show the poller statistics"""
+        dialog = UIPollerStats(self.ui.win_main)
+        dialog.show()
+
     def on_action_about_activate(self, action):
         """Show the about dialog"""
         dialog = UIAbout(self.ui.win_main)
@@ -248,6 +283,12 @@ class UIMain(object):
                 section=key,
                 option=OPTION_SERVICE_DESCRIPTION,
                 value=model_services.services[key].description)
+            # Save the interval only for the services polled on their own
+            if model_services.services[key].interval:
+                settings.services.set(
+                    section=key,
+                    option=OPTION_SERVICE_INTERVAL,
+                    value=model_services.services[key].interval)
         self.reload_hosts()
         if selected_row:
             # Automatically select again the previously selected row
@@ -291,35 +332,72 @@ class UIMain(object):
                                                start_editing=False)
 
     def reload_hosts(self):
-        """Load hosts from the settings files"""
-        self.model_hosts.clear()
-        self.hosts.clear()
+        """Load hosts from the settings files, updating only the hosts
+        whose files were added, changed or removed"""
         hosts_path = self.get_current_group_path()
+        if hosts_path != self.hosts_path:
+            # Stop any group poll for the previous hosts
+            self.ui.action_poll_group.set_active(False)
+            self.model_hosts.clear()
+            self.hosts.clear()
+            self.hosts_files.clear()
+            self.hosts_path = hosts_path
+            self.monitor_hosts()
         # Fix bug where the groups model isn't yet emptied, resulting in
         # being still used after a clear, then an invalid path
         if not os.path.isdir(hosts_path):
-            return
-        for filename in os.listdir(hosts_path):
-            # Skip folders, used for groups
-            if os.path.isdir(os.path.join(hosts_path, filename)):
-                continue
-            settings_host = settings.Settings(
-                filename=os.path.join(hosts_path, filename),
-                case_sensitive=True)
-            host = HostInfo(
-                name=settings_host.get(SECTION_HOST, OPTION_HOST_NAME),
-                description=settings_host.get(SECTION_HOST,
-                                              OPTION_HOST_DESCRIPTION),
-                protocol=settings_host.get(SECTION_HOST, OPTION_HOST_PROTOCOL),
-                address=settings_host.get(SECTION_HOST, OPTION_HOST_ADDRESS),
-                port_number=settings_host.get_int(SECTION_HOST,
-                                                  OPTION_HOST_PORT),
-                version=settings_host.get_int(SECTION_HOST,
-                                              OPTION_HOST_VERSION),
-                community=settings_host.get(SECTION_HOST,
-                                            OPTION_HOST_COMMUNITY),
-                device=settings_host.get(SECTION_HOST, OPTION_HOST_DEVICE))
-            self.add_host(host, False)
+            files = {}
+        else:
+            files = inventory.get_hosts_files(hosts_path)
+        for filename in self.hosts_files.keys():
+            if filename not in files:
+                # The host file was removed
+                mtime, size, name = self.hosts_files.pop(filename)
+                if name in self.hosts:
+                    self.hosts.pop(name)
+                    self.model_hosts.remove(self.model_hosts.get_iter(name))
+                    self.delete_host_samples(name)
+        for filename, (mtime, size, host) in files.iteritems():
+            loaded = self.hosts_files.get(filename)
+            if loaded is None:
+                self.add_host(host, False)
+            elif loaded[:2] != (mtime, size):
+                # The host file was changed
+                treeiter = self.model_hosts.get_iter(loaded[2])
+                self.hosts.pop(loaded[2], None)
+                self.hosts[host.name] = host
+                if treeiter:
+                    self.model_hosts.set_data(treeiter, host)
+                else:
+                    self.model_hosts.add_data(host)
+            self.hosts_files[filename] = (mtime, size, host.name)
+
+    def monitor_hosts(self):
+        """Watch the current group folder for the hosts files changed by
+        other programs"""
+        if self.hosts_monitor:
+            self.hosts_monitor.cancel()
+            self.hosts_monitor = None
+        if (preferences.get(preferences.HOSTS_MONITOR) and
+                os.path.isdir(self.hosts_path)):
+            self.hosts_monitor = Gio.File.new_for_path(
+                self.hosts_path).monitor_directory(
+                Gio.FileMonitorFlags.NONE, None)
+            self.hosts_monitor.connect('changed',
+                                       self.on_hosts_monitor_changed)
+
+    def on_hosts_monitor_changed(self, monitor, file, other_file, event):
+        """Reload the hosts shortly after the files were changed"""
+        if monitor is self.hosts_monitor and not self.hosts_reload_pending:
+            # Many changes are usually written together
+            self.hosts_reload_pending = True
+            GLib.timeout_add(HOSTS_MONITOR_DELAY, self.on_hosts_reload)
+
+    def on_hosts_reload(self):
+        """Reload the changed hosts files"""
+        self.hosts_reload_pending = False
+        self.reload_hosts()
+        return False
 
     def add_host(self, host, update_settings):
         """Add a new host along as with its destinations"""
@@ -328,36 +406,24 @@ class UIMain(object):
         treeiter = self.model_hosts.add_data(host)
         # Update settings file if requested
         if update_settings:
-            hosts_path = self.get_current_group_path()
-            settings_host = settings.Settings(
-                filename=os.path.join(hosts_path, '%s.conf' % host.name),
-                case_sensitive=True)
-            # Add host information
-            settings_host.set(SECTION_HOST, OPTION_HOST_NAME, host.name)
-            settings_host.set(SECTION_HOST, OPTION_HOST_DESCRIPTION,
-                              host.description)
-            settings_host.set(SECTION_HOST, OPTION_HOST_PROTOCOL,
-                              host.protocol)
-            settings_host.set(SECTION_HOST, OPTION_HOST_ADDRESS, host.address)
-            settings_host.set_int(SECTION_HOST, OPTION_HOST_PORT,
-                                  host.port_number)
-            settings_host.set_int(SECTION_HOST, OPTION_HOST_VERSION,
-                                  host.version)
-            settings_host.set(SECTION_HOST, OPTION_HOST_COMMUNITY,
-                              host.community)
-            settings_host.set(SECTION_HOST, OPTION_HOST_DEVICE, host.device)
-            # Save the settings to the file
-            settings_host.save()
+            inventory.save_host(self.get_current_group_path(), host)
 
     def remove_host(self, name):
-        """Remove a host by its name"""
-        hosts_path = self.get_current_group_path()
-        filename = os.path.join(hosts_path, '%s.conf' % name)
+        """Remove a host by its name, keeping its samples"""
+        filename = inventory.get_host_filename(
+            self.get_current_group_path(), name)
         if os.path.isfile(filename):
             os.unlink(filename)
+        self.hosts_files.pop(os.path.basename(filename), None)
         self.hosts.pop(name)
         self.model_hosts.remove(self.model_hosts.get_iter(name))
 
+    def delete_host_samples(self, name):
+        """Discard the samples for a deleted host"""
+        history.history.remove_host(name)
+        exporter.remove_host(name)
+        tsdb.store.remove_host(self.get_current_group(), name)
+
     def reload_groups(self):
         """Load groups from hosts folder"""
         self.model_groups.clear()
@@ -423,6 +489,12 @@ class UIMain(object):
                                 dialog.port_number, dialog.version,
                                 dialog.community, dialog.device)
                 self.remove_host(name)
+                if dialog.name != name:
+                    # The samples follow the renamed host
+                    history.history.rename_host(name, dialog.name)
+                    exporter.rename_host(name, dialog.name)
+                    tsdb.store.rename_host(self.get_current_group(), name,
+                                           dialog.name)
                 self.add_host(host=host,
                               update_settings=True)
                 # Get the path of the host
@@ -451,7 +523,9 @@ class UIMain(object):
                 msg1=_("Remove host"),
                 msg2=_("Remove the selected host?"),
                 is_response_id=Gtk.ResponseType.YES):
-            self.remove_host(self.model_hosts.get_key(selected_row))
+            name = self.model_hosts.get_key(selected_row)
+            self.remove_host(name)
+            self.delete_host_samples(name)
 
     def on_action_copy_activate(self, action):
         """Copy the selected host to another"""
@@ -502,6 +576,7 @@ class UIMain(object):
             model = self.model_hosts
             dialog = UISNMPValues(
                 parent=self.ui.win_main,
+                group=self.get_current_group(),
                 host=HostInfo(name=model.get_key(selected_row),
                               description=model.get_description(selected_row),
                               protocol=model.get_protocol(selected_row),
@@ -509,16 +584,148 @@ class UIMain(object):
                               port_number=model.get_port_number(selected_row),
                               version=model.get_version(selected_row),
                               community=model.get_community(selected_row),
-                              device=model.get_device(selected_row))
-            )
+                              device=model.get_device(selected_row)))
             dialog.show()
 
-    def get_current_group_path(self):
-        """Return the path of the currently selected group"""
+    def on_action_poll_group_toggled(self, action):
+        """Poll every host in the current group or stop the poll"""
+        if action.get_active():
+            self.start_poll_group()
+        else:
+            self.stop_poll_group()
+
+    def start_poll_group(self):
+        """Poll every host in the current group concurrently"""
+        if not self.hosts:
+            self.ui.action_poll_group.set_active(False)
+            return
+        # Every job and request is cancelled with the same token
+        self.poll_token = worker_pool.CancellationToken()
+        self.poll_completed = 0
+        self.poll_total = len(self.hosts)
+        group = self.get_current_group()
+        self.polling = set(self.hosts.iterkeys())
+        for host in self.hosts.itervalues():
+            self.model_hosts.set_status(self.model_hosts.get_iter(host.name),
+                                        _('Polling...'), '', '')
+            worker_pool.pool.submit(function=self.poll_group_worker,
+                                    arguments=(self.poll_token, group,
+                                               host, monotonic()),
+                                    priority=worker_pool.PRIORITY_LOW,
+                                    token=self.poll_token)
+        self.update_poll_group_progress()
+        self.ui.progress_poll_group.show()
+
+    def stop_poll_group(self):
+        """Stop the running group poll"""
+        if self.poll_token:
+            self.poll_token.cancel()
+        self.ui.progress_poll_group.hide()
+        # The hosts not yet polled are cancelled
+        for name in self.polling:
+            treeiter = self.model_hosts.get_iter(name)
+            if treeiter:
+                self.model_hosts.set_status(treeiter, _('Cancelled'), '', '')
+        self.polling.clear()
+
+    def poll_group_worker(self, token, group, host, submitted):
+        """Poll a single host and update the model, called from a thread"""
+        snmp.snmp.stats.add((host.address, host.port_number), PHASE_QUEUE,
+                            monotonic() - submitted)
+        services = inventory.get_host_oids(host)
+        values = {}
+        rates = {}
+        error = None
+        started = monotonic()
+        try:
+            if services:
+                values, rates = snmp.snmp.get_rates_from_host(
+                    host, [oid for service, oid in services], token)
+        except SNMPCancelledException:
+            # The request was abandoned
+            return
+        except SNMPException as exception:
+            error = exception
+        latency = monotonic() - started
+        GLib.idle_add(self.poll_group_completed,
+                      token, group, host, services, values, rates, error,
+                      latency, monotonic())
+
+    def poll_group_completed(self, token, group, host, services, values,
+                             rates, error, latency, dispatched):
+        """Show the results for a polled host"""
+        snmp.snmp.stats.add((host.address, host.port_number),
+                            PHASE_DISPATCH, monotonic() - dispatched)
+        if token is not self.poll_token:
+            # Skip the results of a previous group poll
+            return False
+        self.polling.discard(host.name)
+        if error is None:
+            timestamp = time.time()
+            for service, oid in services:
+                if oid in values:
+                    exporter.update(host, service, oid, values[oid],
+                                    rates.get(oid), timestamp)
+                    # Counters are stored as rates on the disk
+                    tsdb.store.add(group=group,
+                                   host=host.name,
+                                   service=service,
+                                   timestamp=timestamp,
+                                   value=rates.get(oid, values[oid]))
+        treeiter = self.model_hosts.get_iter(host.name)
+        if treeiter:
+            if error is None:
+                key_values = []
+                for service, oid in services[:MAX_KEY_VALUES]:
+                    key_values.append('%s: %s' % (
+                        service, str(values.get(oid, ''))[
+                            :MAX_KEY_VALUE_LENGTH]))
+                self.model_hosts.set_status(treeiter,
+                                            _('OK'),
+                                            _('%d ms') % (latency * 1000),
+                                            ', '.join(key_values))
+            elif isinstance(error, SNMPUnreachableException):
+                # No request was sent to the host
+                self.model_hosts.set_status(treeiter,
+                                            _('Unreachable'), '', '')
+            else:
+                if not isinstance(error, SNMPTimeoutException):
+                    status = _('Error')
+                elif snmp.snmp.get_host_state(host) == STATE_OPEN:
+                    # The next requests will be skipped for a while
+                    status = _('Unreachable')
+                else:
+                    status = _('Timeout')
+                self.model_hosts.set_status(
+                    treeiter,
+                    status,
+                    '',
+                    str(error.value).strip().split('\n')[0])
+        self.poll_completed += 1
+        if not token.cancelled:
+            self.update_poll_group_progress()
+            if self.poll_completed >= self.poll_total:
+                # Every host was polled
+                self.ui.action_poll_group.set_active(False)
+        return False
+
+    def update_poll_group_progress(self):
+        """Show the progress for the running group poll"""
+        self.ui.progress_poll_group.set_fraction(
+            float(self.poll_completed) / self.poll_total)
+        self.ui.progress_poll_group.set_text(
+            _('%d of %d hosts polled') % (self.poll_completed,
+                                          self.poll_total))
+
+    def get_current_group(self):
+        """Return the name of the currently selected group"""
         selected_row = get_treeview_selected_row(self.ui.tvw_groups)
-        group_name = self.model_groups.get_key(selected_row) if selected_row \
+        return self.model_groups.get_key(selected_row) if selected_row \
             else ''
-        return os.path.join(DIR_HOSTS, group_name) if group_name else DIR_HOSTS
+
+    def get_current_group_path(self):
+        """Return the path of the currently selected group"""
+        return inventory.get_group_path(self.get_current_group())
 
     def on_tvw_groups_cursor_changed(self, widget):
         """Set actions sensitiveness for host and connection"""
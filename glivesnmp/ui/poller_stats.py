@@ -0,0 +1,139 @@
+##
+#     Project: gLiveSNMP
+# Description: Detect information on various devices via SNMP
+#      Author: Fabio Castelli (Muflone) <muflone@vbsimple.net>
+#   Copyright: 2016 Fabio Castelli
+#     License: GPL-2+
+#  This program is free software; you can redistribute it and/or modify it
+#  under the terms of the GNU General Public License as published by the Free
+#  Software Foundation; either version 2 of the License, or (at your option)
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful, but WITHOUT
+#  ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+#  FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+#  more details.
+#  You should have received a copy of the GNU General Public License along
+#  with this program; if not, write to the Free Software Foundation, Inc.,
+#  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+##
+
+from gi.repository import Gtk
+from gi.repository import GLib
+
+from glivesnmp.gtkbuilder_loader import GtkBuilderLoader
+from glivesnmp.functions import get_ui_file, text, _
+import glivesnmp.preferences as preferences
+import glivesnmp.scheduler as scheduler
+import glivesnmp.settings as settings
+import glivesnmp.snmp as snmp
+from glivesnmp.snmp_stats import PHASES, format_latency
+import glivesnmp.worker_pool as worker_pool
+
+SECTION_WINDOW_NAME = 'poller statistics'
+# Milliseconds between the updates
+REFRESH_INTERVAL = 1000
+
+
+class UIPollerStats(object):
+    def __init__(self, parent):
+        """Prepare the poller statistics window"""
+        # Load the user interface
+        self.ui = GtkBuilderLoader(get_ui_file('poller_stats.glade'))
+        if not preferences.get(preferences.DETACHED_WINDOWS):
+            self.ui.window_stats.set_transient_for(parent)
+        # Restore the saved size and position
+        settings.positions.restore_window_position(
+            self.ui.window_stats, SECTION_WINDOW_NAME)
+        # Initialize actions
+        for widget in self.ui.get_objects_by_type(Gtk.Action):
+            # Connect the actions accelerators
+            widget.connect_accelerator()
+            # Set labels
+            widget.set_label(text(widget.get_label()))
+        # Initialize tooltips
+        for widget in self.ui.get_objects_by_type(Gtk.Button):
+            action = widget.get_related_action()
+            if action:
+                widget.set_tooltip_text(action.get_label().replace('_', ''))
+        # Initialize column headers
+        for widget in self.ui.get_objects_by_type(Gtk.TreeViewColumn):
+            widget.set_title(text(widget.get_title()))
+        self.ui.window_stats.set_title(text(self.ui.window_stats.get_title()))
+        # Rows for every host and their phases
+        self.rows = {}
+        self.timer = None
+        # Connect signals from the glade file to the module functions
+        self.ui.connect_signals(self)
+
+    def show(self):
+        """Show the poller statistics window and update it periodically"""
+        self.refresh()
+        self.ui.tvw_stats.expand_all()
+        self.ui.window_stats.show()
+        self.timer = GLib.timeout_add(REFRESH_INTERVAL, self.refresh)
+
+    def destroy(self):
+        """Destroy the poller statistics window"""
+        if self.timer:
+            GLib.source_remove(self.timer)
+            self.timer = None
+        settings.positions.save_window_position(
+            self.ui.window_stats, SECTION_WINDOW_NAME)
+        self.ui.window_stats.destroy()
+        self.ui.window_stats = None
+
+    def on_window_stats_delete_event(self, widget, event):
+        """Window closing event"""
+        self.destroy()
+
+    def on_action_reset_activate(self, action):
+        """Discard the collected statistics"""
+        snmp.snmp.stats.reset()
+        self.ui.store_stats.clear()
+        self.rows = {}
+        self.refresh()
+
+    def refresh(self):
+        """Update the statistics for every host"""
+        metrics = worker_pool.pool.get_metrics()
+        scheduler_metrics = scheduler.scheduler.get_metrics()
+        self.ui.lbl_workers.set_text(
+            _('Workers: %(busy)d busy of %(threads)d, %(queue)d queued, '
+              'scheduled services: %(scheduled)d, skipped polls: '
+              '%(skipped)d') % {
+                'busy': metrics['busy'],
+                'threads': metrics['threads'],
+                'queue': metrics['queue depth'],
+                'scheduled': scheduler_metrics['scheduled'],
+                'skipped': scheduler_metrics['skipped']})
+        self.update_host(None, _('All hosts'))
+        for key in snmp.snmp.stats.get_hosts():
+            self.update_host(key, '%s:%d' % key)
+        # Continue the timer
+        return True
+
+    def update_host(self, key, name):
+        """Update the rows for a host or for all the hosts"""
+        summary = snmp.snmp.stats.get_summary(key)
+        if summary is None:
+            return
+        store = self.ui.store_stats
+        if key not in self.rows:
+            treeiter = store.append(None, (name, ) + ('', ) * 9)
+            self.rows[key] = (treeiter, dict(
+                (phase, store.append(treeiter, (phase, ) + ('', ) * 9))
+                for phase in PHASES))
+        treeiter, phases = self.rows[key]
+        store.set(treeiter,
+                  1, str(summary['requests']),
+                  2, str(summary['in flight']),
+                  3, str(summary['timeouts']),
+                  4, str(summary['errors']))
+        for phase, histogram in summary['phases'].iteritems():
+            store.set(phases[phase],
+                      5, str(histogram['count']),
+                      6, format_latency(histogram['p50']),
+                      7, format_latency(histogram['p95']),
+                      8, format_latency(histogram['p99']),
+                      9, format_latency(histogram['max']))
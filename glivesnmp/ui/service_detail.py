@@ -61,14 +61,17 @@ class UIServiceDetail(object):
         self.selected_iter = None
         self.name = ''
         self.description = ''
+        self.interval = 0
         # Connect signals from the glade file to the module functions
         self.ui.connect_signals(self)
 
-    def show(self, name, description, numeric_oid, title, treeiter):
+    def show(self, name, description, numeric_oid, interval, title,
+             treeiter):
         """Show the Services detail dialog"""
         self.ui.txt_name.set_text(name)
         self.ui.txt_description.set_text(description)
         self.ui.txt_numeric_oid.set_text(numeric_oid)
+        self.ui.spin_interval.set_value(interval)
         self.ui.txt_name.grab_focus()
         self.ui.dialog_edit_service.set_title(title)
         self.selected_iter = treeiter
@@ -77,6 +80,7 @@ class UIServiceDetail(object):
         self.name = self.ui.txt_name.get_text().strip()
         self.description = self.ui.txt_description.get_text().strip()
         self.numeric_oid = self.ui.txt_numeric_oid.get_text().strip()
+        self.interval = self.ui.spin_interval.get_value_as_int()
         return response
 
     def destroy(self):
@@ -139,5 +143,6 @@ class UIServiceDetail(object):
         """Check the service description field"""
         check_invalid_input(widget, False, True, False)
         self.ui.txt_numeric_oid.set_text(
-            snmp.snmp.translate(widget.get_text().strip()) or
+            snmp.snmp.translate(widget.get_text().strip(),
+                                use_tools=False) or
             _('Unkown OID'))
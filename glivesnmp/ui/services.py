@@ -88,11 +88,13 @@ class UIServices(object):
         if dialog.show(name='',
                        description='',
                        numeric_oid='',
+                       interval=0,
                        title=_('Add new service'),
                        treeiter=None) == Gtk.ResponseType.OK:
             self.model.add_data(ServiceInfo(name=dialog.name,
                                             description=dialog.description,
-                                            numeric_oid=dialog.numeric_oid))
+                                            numeric_oid=dialog.numeric_oid,
+                                            interval=dialog.interval))
         dialog.destroy()
 
     def on_action_edit_activate(self, action):
@@ -102,11 +104,13 @@ class UIServices(object):
             name = self.model.get_key(selected_row)
             description = self.model.get_description(selected_row)
             numeric_oid = self.model.get_numeric_oid(selected_row)
+            interval = self.model.get_interval(selected_row)
             selected_iter = self.model.get_iter(name)
             dialog = UIServiceDetail(self.ui.dialog_services, self.model)
             if dialog.show(name=name,
                            description=description,
                            numeric_oid=numeric_oid,
+                           interval=interval,
                            title=_('Edit service'),
                            treeiter=selected_iter
                            ) == Gtk.ResponseType.OK:
@@ -114,7 +118,8 @@ class UIServices(object):
                 self.model.set_data(selected_iter, ServiceInfo(
                     name=dialog.name,
                     description=dialog.description,
-                    numeric_oid=dialog.numeric_oid))
+                    numeric_oid=dialog.numeric_oid,
+                    interval=dialog.interval))
             dialog.destroy()
 
     def on_action_remove_activate(self, action):
@@ -19,22 +19,29 @@
 #  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
 ##
 
+import collections
 import os
 import os.path
 import threading
+import time
 
 from gi.repository import Gtk
 from gi.repository import GLib
 
 from glivesnmp.gtkbuilder_loader import GtkBuilderLoader
 from glivesnmp.constants import DIR_HOSTS
+from glivesnmp.clock import monotonic
+import glivesnmp.exporter as exporter
 from glivesnmp.functions import (
     get_ui_file, get_treeview_selected_row, text, _)
+import glivesnmp.history as history
 import glivesnmp.preferences as preferences
+import glivesnmp.scheduler as scheduler
 import glivesnmp.settings as settings
 import glivesnmp.snmp as snmp
-from glivesnmp.semaphored_thread import SemaphoredThread
-from glivesnmp.snmp_exception import SNMPException
+from glivesnmp.snmp_stats import PHASE_DISPATCH
+import glivesnmp.tsdb as tsdb
+import glivesnmp.worker_pool as worker_pool
 
 from glivesnmp.ui.message_dialog import (
     show_message_dialog, UIMessageDialogNoYes)
@@ -45,10 +52,12 @@ from glivesnmp.models.snmp_values import SNMPValues
 from glivesnmp.models.snmp_value_info import SNMPValueInfo
 
 SECTION_WINDOW_NAME = 'snmp values'
+# Milliseconds between two updates of the values
+FRAME_INTERVAL = 16
 
 
 class UISNMPValues(object):
-    def __init__(self, parent, host):
+    def __init__(self, parent, group, host):
         """Prepare the snmp values dialog"""
         # Load the user interface
         self.ui = GtkBuilderLoader(get_ui_file('snmp_values.glade'))
@@ -84,10 +93,19 @@ class UISNMPValues(object):
         self.model.model.set_sort_column_id(
             self.ui.column_name.get_sort_column_id(),
             Gtk.SortType.ASCENDING)
+        self.group = group
         self.host = host
         self.ui.window_snmp.set_title(_('SNMP values for %s') % host.name)
-        self.semaphore = None
-        self.completed_threads = 0
+        self.token = None
+        # Last received values and counter rates
+        self.values = {}
+        self.rates = {}
+        self.errors = {}
+        # Results received from the workers and not yet shown
+        self.pending = []
+        self.pending_lock = threading.Lock()
+        # Services still waiting for the first reply
+        self.waiting = set()
         # Connect signals from the glade file to the module functions
         self.ui.connect_signals(self)
 
@@ -112,65 +130,164 @@ class UISNMPValues(object):
 
     def on_action_refresh_activate(self, action):
         """Update values"""
-        def update_ui(values):
-            """Update the UI in a thread-safe way using GLib"""
-            for service in self.services.keys():
-                treeiter = self.model.rows[service]
-                self.model.set_value(treeiter,
-                                     values.get(self.services[service],
-                                                _('<SNMP Error>')))
-                if values.has_key('error'):
-                    print values
-
-            # Start scan again if the timer is enabled
-            if self.ui.action_timer.get_active():
-                GLib.timeout_add(self.ui.adjustment_timer.get_value(),
-                                 self.on_action_refresh_activate,
-                                 action)
-            else:
-                # Stop the scan
-                self.ui.action_refresh.set_active(False)
-
-        def worker(host, oids):
-            """Get a reply from SNMP and update the model accordingly"""
-            try:
-                values = snmp.snmp.get_from_host(host, oids)
-            except SNMPException as error:
-                print 'Exception: %s' % error.value
-                values = {'error': 'Exception: %s' % error.value}
-            GLib.idle_add(update_ui, values)
-
         if self.ui.action_refresh.get_active():
             # Scan for new data
-            self.completed_threads = 0
             self.ui.action_refresh.set_icon_name('media-playback-stop')
-            # Set the number of maximum running threads
-            self.semaphore = threading.BoundedSemaphore(1)
-            self.semaphore.cancel = False
-            oids = []
-            for service in self.services.keys():
-                treeiter = self.model.rows[service]
-                self.model.set_value(treeiter, '')
-                oids.append(self.services[service])
-            # Create a new thread and launch it
-            thread = SemaphoredThread(semaphore=self.semaphore,
-                                      callback=worker,
-                                      arguments=(self.host, oids),
-                                      name=self.services[service],
-                                      target=worker)
-            thread.start()
+            for service in self.services.iterkeys():
+                self.model.set_value(self.model.rows[service], '')
+            self.start_polling()
         else:
             # Stop a previous scan
-            self.semaphore.cancel = True
+            self.stop_polling()
             self.ui.action_refresh.set_icon_name('media-playback-start')
             # Disable the timer when the scan is stopped
             self.ui.action_timer.set_active(False)
-        # Returning False the timer automatically ends
-        # It will be fired again after the scan is completed
+
+    def start_polling(self):
+        """Schedule the services once or repeatedly if the timer is enabled"""
+        self.token = worker_pool.CancellationToken()
+        self.waiting = set(self.services.iterkeys())
+        if self.ui.action_timer.get_active():
+            timer_interval = self.ui.adjustment_timer.get_value() / 1000.0
+        else:
+            timer_interval = 0
+        services = []
+        for service, oid in self.services.iteritems():
+            # Services with their own interval ignore the window timer
+            interval = timer_interval
+            if timer_interval and model_services.services[service].interval:
+                interval = model_services.services[service].interval
+            services.append((service, oid, interval))
+        # The interactive scans run before any other queued job
+        scheduler.scheduler.add(host=self.host,
+                                services=services,
+                                callback=self.on_values_received,
+                                token=self.token,
+                                priority=worker_pool.PRIORITY_HIGH)
+
+    def stop_polling(self):
+        """Cancel the running requests and the scheduled services"""
+        if self.token:
+            self.token.cancel()
+            scheduler.scheduler.remove(self.token)
+            self.token = None
+
+    def on_values_received(self, host, services, values, rates):
+        """Values received from the scheduler in a worker thread"""
+        if not values.has_key('error'):
+            timestamp = time.time()
+            for service, oid in services:
+                if oid in values:
+                    exporter.update(host, service, oid, values[oid],
+                                    rates.get(oid), timestamp)
+        with self.pending_lock:
+            self.pending.append((services, values, rates, monotonic()))
+            if len(self.pending) == 1:
+                # The queued results are shown together in the next frame
+                GLib.timeout_add(FRAME_INTERVAL, self.update_ui)
+
+    def update_ui(self):
+        """Update the UI with the queued results in a thread-safe way"""
+        with self.pending_lock:
+            pending = self.pending
+            self.pending = []
+        now = monotonic()
+        for services, values, rates, dispatched in pending:
+            snmp.snmp.stats.add((self.host.address, self.host.port_number),
+                                PHASE_DISPATCH, now - dispatched)
+        if not self.ui.action_refresh.get_active():
+            # Late replies after the scan was stopped
+            return False
+        changed = collections.OrderedDict()
+        timestamps = {}
+        timestamp = time.time()
+        for services, values, rates, dispatched in pending:
+            if values.has_key('error'):
+                if values.has_key('unreachable'):
+                    error = _('<Unreachable>')
+                else:
+                    error = _('<SNMP Error>')
+                for service, oid in services:
+                    self.values.pop(oid, None)
+                    self.errors[oid] = error
+                    changed[service] = oid
+                continue
+            # Keep the numeric values in the history
+            for service, oid in services:
+                self.errors.pop(oid, None)
+                changed[service] = oid
+                if oid in rates:
+                    self.rates[oid] = rates[oid]
+                if oid in values:
+                    self.values[oid] = values[oid]
+                    history.history.add(host=self.host.name,
+                                        service=service,
+                                        timestamp=timestamp,
+                                        value=values[oid])
+                    # Counters are stored as rates on the disk
+                    tsdb.store.add(group=self.group,
+                                   host=self.host.name,
+                                   service=service,
+                                   timestamp=timestamp,
+                                   value=rates.get(oid, values[oid]))
+                    timestamps[service] = timestamp
+                else:
+                    self.values.pop(oid, None)
+        # Sort the rows only once after every change
+        sort_column = self.model.freeze_sort()
+        self.show_values(changed.items())
+        for service, timestamp in timestamps.iteritems():
+            self.model.set_timestamp(self.model.rows[service], timestamp)
+        self.model.thaw_sort(sort_column)
+        self.waiting.difference_update(changed.iterkeys())
+        if not self.waiting and not self.ui.action_timer.get_active():
+            # Stop the scan after every single service was received
+            self.ui.action_refresh.set_active(False)
         return False
 
+    def show_values(self, services=None):
+        """Show the last values or the rates for the counters"""
+        show_rates = self.ui.action_rates.get_active()
+        for service, oid in services or self.services.items():
+            if oid in self.errors:
+                value = self.errors[oid]
+            elif show_rates and oid in self.rates:
+                rate = self.rates[oid]
+                # The first sample for a counter has no rate
+                value = (_('<Waiting>') if rate is None
+                         else _('%.2f/s') % rate)
+            elif oid in self.values:
+                # Values are typed and always shown as strings
+                value = str(self.values[oid])
+            elif services:
+                # The value was missing in the reply
+                value = _('<SNMP Error>')
+            else:
+                # The service was not received yet
+                continue
+            self.model.set_value(self.model.rows[service], value)
+
+    def on_action_rates_toggled(self, action):
+        """Switch between the values and the rates for the counters"""
+        self.show_values()
+
     def on_action_timer_toggled(self, action):
         """Enable the timer for the autoscan"""
         if self.ui.action_timer.get_active():
-            # Start scan when the timer is active
-            self.ui.action_refresh.set_active(True)
+            if self.ui.action_refresh.get_active():
+                # Schedule again the running scan with the timer
+                self.stop_polling()
+                self.start_polling()
+            else:
+                # Start scan when the timer is active
+                self.ui.action_refresh.set_active(True)
+        elif self.ui.action_refresh.get_active():
+            # Stop the scheduled scan
+            self.ui.action_refresh.set_active(False)
+
+    def on_adjustment_timer_value_changed(self, adjustment):
+        """Apply the new timer interval to the running scan"""
+        if (self.ui.action_timer.get_active() and
+                self.ui.action_refresh.get_active()):
+            self.stop_polling()
+            self.start_polling()
@@ -0,0 +1,168 @@
+##
+#     Project: gLiveSNMP
+# Description: Detect information on various devices via SNMP
+#      Author: Fabio Castelli (Muflone) <muflone@vbsimple.net>
+#   Copyright: 2016 Fabio Castelli
+#     License: GPL-2+
+#  This program is free software; you can redistribute it and/or modify it
+#  under the terms of the GNU General Public License as published by the Free
+#  Software Foundation; either version 2 of the License, or (at your option)
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful, but WITHOUT
+#  ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+#  FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+#  more details.
+#  You should have received a copy of the GNU General Public License along
+#  with this program; if not, write to the Free Software Foundation, Inc.,
+#  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+##
+
+import heapq
+import itertools
+import threading
+import traceback
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+pool = None
+
+
+class CancellationToken(object):
+    def __init__(self):
+        """A token shared by the jobs and requests to cancel together"""
+        self.cancelled = False
+        self.lock = threading.Lock()
+        self.callbacks = []
+
+    def cancel(self):
+        """Cancel the token calling every registered callback"""
+        with self.lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            callbacks = self.callbacks
+            self.callbacks = []
+        for callback in callbacks:
+            callback()
+
+    def register(self, callback):
+        """Register a callback to call on cancellation, it's immediately
+        called if the token was already cancelled"""
+        with self.lock:
+            if not self.cancelled:
+                self.callbacks.append(callback)
+                return
+        callback()
+
+    def unregister(self, callback):
+        """Remove a registered callback"""
+        with self.lock:
+            if callback in self.callbacks:
+                self.callbacks.remove(callback)
+
+    def wait(self, event):
+        """Wait for a private threading.Event returning False if the token
+        was cancelled in the meantime"""
+        self.register(event.set)
+        event.wait()
+        self.unregister(event.set)
+        return not self.cancelled
+
+
+class WorkerPool(object):
+    def __init__(self, workers, name='worker'):
+        """Long-lived threads executing the submitted jobs by priority"""
+        self.workers = workers
+        self.name = name
+        # Heap of (priority, sequence, function, arguments, token)
+        self.queue = []
+        self.condition = threading.Condition()
+        self.sequence = itertools.count()
+        self.threads = []
+        self.idle = 0
+        # Threads started and not yet waiting for jobs
+        self.starting = 0
+        self.busy = 0
+        self.stopped = False
+        # Metrics
+        self.submitted = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.max_queue_depth = 0
+
+    def submit(self, function, arguments=(), priority=PRIORITY_NORMAL,
+               token=None):
+        """Queue a job, it's skipped if the token is cancelled before it
+        gets started"""
+        with self.condition:
+            heapq.heappush(self.queue, (priority, next(self.sequence),
+                                        function, arguments, token))
+            self.submitted += 1
+            self.max_queue_depth = max(self.max_queue_depth,
+                                       len(self.queue))
+            # Start a new thread when the queued jobs outnumber the
+            # threads that will be ready to run them
+            if (len(self.queue) > self.idle + self.starting and
+                    len(self.threads) < self.workers):
+                self.starting += 1
+                thread = threading.Thread(
+                    target=self.run_worker,
+                    name='%s-%d' % (self.name, len(self.threads)))
+                thread.daemon = True
+                self.threads.append(thread)
+                thread.start()
+            self.condition.notify()
+
+    def run_worker(self):
+        """Execute the queued jobs until the pool is stopped"""
+        with self.condition:
+            self.starting -= 1
+        while True:
+            with self.condition:
+                self.idle += 1
+                while not self.queue and not self.stopped:
+                    self.condition.wait()
+                self.idle -= 1
+                if self.stopped:
+                    return
+                (priority, sequence, function, arguments,
+                 token) = heapq.heappop(self.queue)
+                if token and token.cancelled:
+                    self.cancelled += 1
+                    continue
+                self.busy += 1
+            try:
+                function(*arguments)
+                failed = False
+            except Exception:
+                traceback.print_exc()
+                failed = True
+            with self.condition:
+                self.busy -= 1
+                if failed:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+
+    def get_metrics(self):
+        """Return a dictionary with the pool metrics"""
+        with self.condition:
+            return {'threads': len(self.threads),
+                    'busy': self.busy,
+                    'queue depth': len(self.queue),
+                    'max queue depth': self.max_queue_depth,
+                    'submitted': self.submitted,
+                    'completed': self.completed,
+                    'cancelled': self.cancelled,
+                    'failed': self.failed}
+
+    def stop(self):
+        """Stop every thread discarding the queued jobs"""
+        with self.condition:
+            self.stopped = True
+            self.queue = []
+            self.condition.notify_all()